@@ -1,146 +1,343 @@
 #!/usr/bin/env python3
 # coding: utf-8
 
+import argparse
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
 # --- Imports des scrapers ---
 from scrapers import cgr, arena, republic_corner, parc_expo, tap, confort_moderne, m3q, emf
+from scrapers import pipeline
 
-def main():
-    all_events = []
+import calendar_index
+import delta
+import details
+import history
+import hotcold
+import postprocess
+import render
+import sandbox
+import stream
+from event_utils import event_id
 
-    # --- CGR ---
-    print("🎬 CGR...")
+# Sortie de la phase listing, reprise par la phase d'enrichissement
+LISTING_PATH = os.path.join(".cache", "listing.json")
+
+
+def scrape_tap(enrich=True):
+    tap_data = tap.scrape_tap(enrich)
+    cinema_events = tap_data.get("cinema", [])
+    spectacle_events = tap_data.get("spectacle", [])
+    print(
+        f"✅ {len(cinema_events) + len(spectacle_events)} événements récupérés depuis le TAP Poitiers "
+        f"({len(cinema_events)} cinéma, {len(spectacle_events)} spectacles)."
+    )
+    return cinema_events + spectacle_events
+
+
+# --- Sources, dans l'ordre d'exécution ---
+#   key     : identifiant court (historique, statistiques)
+#   name    : nom affiché
+#   header  : titre de la section dans les logs
+#   scrape  : fonction retournant les événements (liste, générateur ou générateur async)
+#   origin  : fin du message de succès (None si la fonction l'affiche elle-même)
+#   label   : ligne du récapitulatif
+#   enrich  : (optionnel) complète sur place les événements obtenus avec scrape(enrich=False)
+SOURCES = [
+    {"key": "cgr", "name": "CGR", "header": "🎬 CGR...", "scrape": cgr.scrape,
+     "origin": "depuis les cinémas CGR", "label": "🎬 CGR"},
+    {"key": "arena", "name": "Arena", "header": "🎤 ARENA FUTUROSCOPE...", "scrape": arena.scrape_arena,
+     "origin": "depuis l'Arena Futuroscope", "label": "🎤 Arena"},
+    {"key": "republic_corner", "name": "Republic Corner", "header": "🎭 REPUBLIC CORNER...",
+     "scrape": republic_corner.scrape_republic_corner, "enrich": republic_corner.enrich_events,
+     "origin": "depuis le Republic Corner", "label": "🎭 Republic Corner"},
+    {"key": "parc_expo", "name": "Parc Expo", "header": "🏛️ PARC EXPO GRAND POITIERS...",
+     "scrape": parc_expo.scrape_parc_expo,
+     "origin": "depuis le Parc Expo Grand Poitiers", "label": "🏛️ Parc Expo"},
+    {"key": "tap", "name": "TAP Poitiers", "header": "🎭 TAP POITIERS...", "scrape": scrape_tap, "enrich": tap.enrich_events,
+     "origin": None, "label": "🎭 TAP Poitiers"},
+    {"key": "confort_moderne", "name": "Confort Moderne", "header": "🎸 CONFORT MODERNE...",
+     "scrape": confort_moderne.scrape_confort_moderne, "enrich": confort_moderne.enrich_events,
+     "origin": "depuis le Confort Moderne", "label": "🎸 Confort Moderne"},
+    {"key": "m3q", "name": "M3Q", "header": "🏡 MAISON DES 3 QUARTIERS (M3Q)...", "scrape": m3q.scrape_m3q,
+     "origin": "depuis la M3Q", "label": "🎬 M3Q"},
+    {"key": "emf", "name": "EMF", "header": "🧪 ESPACE MENDÈS FRANCE (EMF)...", "scrape": emf.scrape_emf, "enrich": emf.add_details,
+     "origin": "depuis l'Espace Mendès France", "label": "🧪 EMF"},
+]
+
+
+def run_source(source, sink, enrich=True):
+    """
+    Exécute un scraper et passe chaque événement à sink(ev) au fil de l'eau
+    (liste, générateur ou générateur async) ; retourne les statistiques.
+    Les événements déjà produits avant une erreur sont conservés.
+    enrich=False : sans les pages détail, pour les sources qui ont un "enrich".
+    """
+    start = time.monotonic()
+    count = 0
     try:
-        cgr_events = cgr.scrape()
-        print(f"✅ {len(cgr_events)} événements récupérés depuis les cinémas CGR.")
-        all_events += cgr_events
+        result = source["scrape"](enrich=False) if source.get("enrich") and not enrich else source["scrape"]()
+        for ev in stream.iter_events(result):
+            sink(ev)
+            count += 1
+        if source["origin"]:
+            print(f"✅ {count} événements récupérés {source['origin']}.")
+        error = None
     except Exception as e:
-        print(f"❌ Erreur lors du scraping CGR : {e}")
+        print(f"❌ Erreur lors du scraping {source['name']} : {e}")
+        error = str(e)
+    return {"count": count, "duration": time.monotonic() - start, "error": error}
+
 
-    # --- ARENA FUTUROSCOPE ---
-    print("\n🎤 ARENA FUTUROSCOPE...")
+def collect(enrich=True, isolated=False):
+    """
+    Exécute toutes les sources ; retourne ({source: événements}, {source: statistiques}).
+    isolated=True : chaque source dans un processus enfant limité (sandbox.py).
+    """
+    if isolated:
+        return sandbox.collect(SOURCES, enrich)
+    listed, stats = {}, {}
     try:
-        arena_events = arena.scrape_arena()
-        print(f"✅ {len(arena_events)} événements récupérés depuis l'Arena Futuroscope.")
-        all_events += arena_events
-    except Exception as e:
-        print(f"❌ Erreur lors du scraping Arena : {e}")
+        for i, source in enumerate(SOURCES):
+            print(("\n" if i else "") + source["header"])
+            listed[source["key"]] = []
+            stats[source["key"]] = run_source(source, listed[source["key"]].append, enrich)
+    finally:
+        pipeline.shutdown()
+    return listed, stats
+
 
-    # --- REPUBLIC CORNER ---
-    print("\n🎭 REPUBLIC CORNER...")
+def enrich_all(listed, stats, isolated=False):
+    """
+    Phase 2 : enrichissement des sources en parallèle (pages détail, I/O).
+    isolated=True : chaque source dans un processus enfant limité (sandbox.py).
+    """
+    todo = [s for s in SOURCES if s.get("enrich") and listed.get(s["key"])]
+
+    def run(source):
+        start = time.monotonic()
+        usage = {}
+        try:
+            if isolated:
+                listed[source["key"]], error, usage = sandbox.enrich(source, listed[source["key"]])
+            else:
+                source["enrich"](listed[source["key"]])
+                error = None
+        except Exception as e:
+            error = str(e)
+        if error:
+            print(f"⚠️ Enrichissement {source['name']} incomplet : {error}")
+        return time.monotonic() - start, usage
+
+    with ThreadPoolExecutor(max_workers=max(1, len(todo))) as pool:
+        for source, (duration, usage) in zip(todo, pool.map(run, todo)):
+            stats[source["key"]]["duration"] += duration
+            line = f"✨ {source['name']} enrichi en {duration:.1f}s"
+            if usage:
+                line += f" (isolé, CPU {usage['cpu']:.1f}s, RSS max {usage['max_rss_mb']:.0f} Mo)"
+            print(line)
+
+
+def publish(listed, carry=False, weeks=hotcold.HOT_WEEKS, sink=None):
+    """
+    Dédoublonne, fusionne et écrit events.json (fiches légères des événements
+    des `weeks` prochaines semaines, détails dans details/) et l'archive
+    (+ delta, index calendaire, pré-rendu).
+    carry=True : les champs vides des sources non enrichies sont repris
+    de la sortie précédente. sink(ev) reçoit chaque événement publié
+    (chaud ou froid). Retourne le nombre d'événements publiés.
+    """
+    previous = delta.load_previous("events.json")
+    previous_events = details.restore((previous or {}).get("events", [])) + hotcold.load_archive() if carry else []
+    deduper = stream.Deduper()
+    runs = stream.SortedRuns()
+    seen_ids = {}
+    today, horizon = hotcold.horizon_of(weeks)
+    hot = []        # (jour de tri, fiche légère) : seule la fenêtre chaude reste en mémoire
+    buckets = {}
+    archive = None
+    total = 0
     try:
-        rc_events = republic_corner.scrape_republic_corner()
-        print(f"✅ {len(rc_events)} événements récupérés depuis le Republic Corner.")
-        all_events += rc_events
-    except Exception as e:
-        print(f"❌ Erreur lors du scraping Republic Corner : {e}")
+        for source in SOURCES:
+            events = listed.get(source["key"], [])
+            if carry and source.get("enrich") and previous_events:
+                events = postprocess.carry_over(events, previous_events)
+            collisions = postprocess.check_ids(events, seen_ids)
+            if collisions:
+                print(f"⚠️ {source['name']} : {len(collisions)} collisions d'id ({', '.join(collisions[:3])}...)")
+            for ev in events:
+                if deduper.is_new(ev):
+                    runs.add(ev)
+            runs.end_source()
+
+        # Fusion k-voies des séries triées par source, consommée au fil de l'eau :
+        # les événements froids partent dans l'archive, les chauds sont allégés
+        # (champs longs vers details/) avant d'être gardés pour le tri
+        archive = hotcold.Archive()
+        for ev in runs:
+            total += 1
+            if sink is not None:
+                sink(ev)
+            day = hotcold.next_day(ev, today, horizon)
+            if day is None:
+                archive.add(ev)
+                continue
+            card, moved = details.detach(ev)
+            if moved:
+                buckets.setdefault(card["details"], {})[event_id(ev)] = moved
+            hot.append((day, card))
+        archived = archive.close()
+    except BaseException:
+        if archive is not None:
+            archive.discard()
+        raise
+    finally:
+        runs.close()
+    if runs.spilled:
+        print(f"💽 {runs.spilled} événements triés sur disque avant fusion")
+
+    # --- Chaud (events.json) / froid (archive) ---
+    # Tri stable : à jour égal, l'ordre chronologique de la fusion est conservé
+    hot.sort(key=lambda item: item[0])
+    cards = [card for _, card in hot]
+    del hot
+    print(
+        f"🔥 {len(cards)} événements sur {weeks} semaines, {archive.count} archivés"
+        f" ({hotcold.ARCHIVE_PATH} {'mis à jour' if archived else 'inchangé'})"
+    )
+
+    # --- Champs longs (details/, chargés à la demande) ---
+    written = details.write(buckets)
+    print(f"📄 Détails de {sum(len(b) for b in buckets.values())} événements dans {details.DETAILS_DIR}/ ({len(written)} fichiers réécrits)")
+    del buckets
 
-    # --- PARC EXPO GRAND POITIERS ---
-    print("\n🏛️ PARC EXPO GRAND POITIERS...")
+    # --- Delta par rapport au run précédent ---
+    seq = None
     try:
-        expo_events = parc_expo.scrape_parc_expo()
-        print(f"✅ {len(expo_events)} événements récupérés depuis le Parc Expo Grand Poitiers.")
-        all_events += expo_events
+        seq = delta.publish(previous, cards)
+        print(f"🔁 Séquence {seq} (deltas dans {delta.DELTA_DIR}/)")
     except Exception as e:
-        print(f"❌ Erreur lors du scraping Parc Expo : {e}")
+        print(f"⚠️ Delta non calculé : {e}")
 
-    # --- TAP POITIERS ---
-    print("\n🎭 TAP POITIERS...")
+    # --- Sauvegarde (écriture incrémentale) ---
+    stream.write_events(cards, seq, "events.json")
+
+    # --- Index calendaire (jour → événements) ---
     try:
-        tap_data = tap.scrape_tap()
-        cinema_events = tap_data.get("cinema", [])
-        spectacle_events = tap_data.get("spectacle", [])
-        total_tap = len(cinema_events) + len(spectacle_events)
+        index = calendar_index.build(cards, weeks, today)
+        written = calendar_index.write(index)
         print(
-            f"✅ {total_tap} événements récupérés depuis le TAP Poitiers "
-            f"({len(cinema_events)} cinéma, {len(spectacle_events)} spectacles)."
+            f"📅 {len(index['days'])} jours indexés dans {calendar_index.CALENDAR_PATH}"
+            f" ({'mis à jour' if written else 'inchangé'})"
         )
-        all_events += cinema_events + spectacle_events
     except Exception as e:
-        print(f"❌ Erreur lors du scraping TAP Poitiers : {e}")
+        print(f"⚠️ Index calendaire non écrit : {e}")
 
-    # --- CONFORT MODERNE ---
-    print("\n🎸 CONFORT MODERNE...")
+    # --- Pré-rendu des sections d'index.html ---
     try:
-        confort_events = confort_moderne.scrape_confort_moderne()
-        print(f"✅ {len(confort_events)} événements récupérés depuis le Confort Moderne.")
-        all_events += confort_events
+        rendered = render.update_page(cards)
+        print(f"🖼️ Sections re-rendues : {', '.join(rendered) if rendered else 'aucune'}")
     except Exception as e:
-        print(f"❌ Erreur lors du scraping Confort Moderne : {e}")
+        print(f"⚠️ Pré-rendu non effectué : {e}")
+
+    return total
+
+
+def save_listing(listed, stats, started_at, path=LISTING_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"started_at": started_at, "stats": stats, "listed": listed}, f, ensure_ascii=False)
 
-    # --- MAISON DES 3 QUARTIERS ---
-    print("\n🏡 MAISON DES 3 QUARTIERS (M3Q)...")
-    try:
-        m3q_events = m3q.scrape_m3q()
-        print(f"✅ {len(m3q_events)} événements récupérés depuis la M3Q.")
-        all_events += m3q_events
-    except Exception as e:
-        print(f"❌ Erreur lors du scraping M3Q : {e}")
 
-    # --- ESPACE MENDÈS FRANCE ---
-    print("\n🧪 ESPACE MENDÈS FRANCE (EMF)...")
+def load_listing(path=LISTING_PATH):
     try:
-        emf_events = emf.scrape_emf() or []
-        print(f"✅ {len(emf_events)} événements récupérés depuis l'Espace Mendès France.")
-        all_events += emf_events
-    except Exception as e:
-        print(f"❌ Erreur lors du scraping EMF : {e}")
-
-    # --- Nettoyage des doublons ---
-    seen = set()
-    unique = []
-    for ev in all_events:
-        key = (
-            ev.get("title", "").strip().lower(),
-            ev.get("source", "").strip().lower(),
-        )
-        if key not in seen:
-            seen.add(key)
-            unique.append(ev)
-
-    # --- Tri chronologique robuste ---
-    def parse_date(value):
-        if not value:
-            return datetime.max
-        try:
-            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
-            if dt.tzinfo is not None:
-                dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
-            return dt
-        except Exception:
-            return datetime.max
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Agrège les événements de Poitiers dans events.json")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="processus de parsing HTML (défaut : PARSE_WORKERS ou nombre de cœurs)",
+    )
+    parser.add_argument(
+        "--in-process", action="store_true",
+        help="parser dans le processus courant (débogage)",
+    )
+    parser.add_argument(
+        "--phase", choices=("all", "listing", "enrich"), default="all",
+        help="listing : publication rapide sans pages détail ; enrich : enrichissement "
+             "de la dernière publication listing ; all : les deux (défaut)",
+    )
+    parser.add_argument(
+        "--sandbox", action="store_true",
+        help="chaque source (listing puis enrichissement) dans un processus isolé, limité en "
+             "mémoire, CPU et durée (SANDBOX_MEMORY_MB, SANDBOX_CPU_SECONDS, SANDBOX_TIMEOUT)",
+    )
+    parser.add_argument(
+        "--weeks", type=int, default=hotcold.HOT_WEEKS,
+        help="fenêtre d'events.json en semaines (défaut : HOT_WEEKS ou 8), le reste va dans l'archive",
+    )
+    return parser.parse_args(argv)
+
 
-    def sort_key(ev):
-        return parse_date(ev.get("release")) or parse_date(ev.get("date"))
+def main(argv=None):
+    args = parse_args(argv)
+    pipeline.configure(0 if args.in_process else args.workers)
 
-    unique.sort(key=sort_key)
+    snapshot = load_listing() if args.phase == "enrich" else None
+    if args.phase == "enrich" and snapshot is None:
+        print(f"⚠️ Pas de publication listing ({LISTING_PATH}) : scraping complet")
 
-    # --- Sauvegarde ---
-    output = {
-        "generated_at": datetime.now(timezone.utc).isoformat(),
-        "events": unique,
-    }
+    if snapshot is not None:
+        started_at, stats, listed = snapshot["started_at"], snapshot["stats"], snapshot["listed"]
+    else:
+        started_at = datetime.now(timezone.utc).isoformat()
+        enrich_inline = args.phase == "enrich"
+        listed, stats = collect(enrich=enrich_inline, isolated=args.sandbox)
 
-    with open("events.json", "w", encoding="utf-8") as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+        if not enrich_inline:
+            # --- Phase 1 : listing seul, publié sans attendre les pages détail ---
+            total = publish(listed, carry=True, weeks=args.weeks)
+            print(f"\n⚡ Phase listing : {total} événements publiés")
+            if args.phase == "listing":
+                save_listing(listed, stats, started_at)
+                return
 
+    # --- Phase 2 : enrichissement puis republication ---
+    if snapshot is not None or args.phase == "all":
+        enrich_all(listed, stats, isolated=args.sandbox)
+
+    # --- Historique SQLite (alimenté pendant la publication) ---
+    recorder = None
+    try:
+        recorder = history.RunRecorder(stats, started_at)
+    except Exception as e:
+        print(f"⚠️ Historique non enregistré : {e}")
+    total = publish(listed, weeks=args.weeks, sink=recorder.add if recorder else None)
+
+    collected = sum(s["count"] for s in stats.values())
     print(
-        f"\n💾 {len(unique)} événements sauvegardés dans events.json "
-        f"({len(all_events)} collectés avant dédoublonnage)"
+        f"\n💾 {total} événements sauvegardés (events.json + archive) "
+        f"({collected} collectés avant dédoublonnage)"
     )
+    if recorder is not None:
+        try:
+            run_id = recorder.finish(collected)
+            print(f"🗄️ Run {run_id} enregistré dans {history.DB_PATH}")
+        except Exception as e:
+            print(f"⚠️ Historique non enregistré : {e}")
 
     # --- Résumé final ---
     print("\n📊 RÉCAPITULATIF PAR SOURCE :")
-    print(f"   🎬 CGR : {len(locals().get('cgr_events', []))}")
-    print(f"   🎤 Arena : {len(locals().get('arena_events', []))}")
-    print(f"   🎭 Republic Corner : {len(locals().get('rc_events', []))}")
-    print(f"   🏛️ Parc Expo : {len(locals().get('expo_events', []))}")
-    print(f"   🎭 TAP Poitiers : {len(locals().get('cinema_events', [])) + len(locals().get('spectacle_events', []))}")
-    print(f"   🎸 Confort Moderne : {len(locals().get('confort_events', []))}")
-    print(f"   🎬 M3Q : {len(locals().get('m3q_events', []))}")
-    print(f"   🧪 EMF : {len(locals().get('emf_events', []))}")
+    for source in SOURCES:
+        print(f"   {source['label']} : {stats[source['key']]['count']}")
 
 
 if __name__ == "__main__":
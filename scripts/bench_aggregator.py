@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Banc d'essai du post-traitement de l'agrégateur sur des jeux synthétiques.
+
+Génère des événements ayant la forme des enregistrements réels (CGR, TAP,
+EMF, Arena, Confort Moderne...), puis mesure pour chaque taille la chaîne
+de publication en flux (stream.Deduper, stream.SortedRuns avec écriture
+sur disque des séries, fusion et stream.write_events), le delta, la mémoire
+de pointe, la taille du fichier et de la charge gzip servie au navigateur.
+
+    python scripts/bench_aggregator.py
+    python scripts/bench_aggregator.py --sizes 1000 10000 50000 --mix cgr=0.5,emf=0.5
+    python scripts/bench_aggregator.py --sizes 20000 50000 --spill 2000
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import delta
+import stream
+
+# Part de chaque forme d'enregistrement (≈ répartition actuelle d'events.json)
+DEFAULT_MIX = {"cgr": 0.25, "arena": 0.27, "tap": 0.25, "confort_moderne": 0.09, "expo": 0.07, "emf": 0.07}
+
+# Au-delà de cet exposant de croissance (temps ∝ taille^k), on signale
+SUPERLINEAR_EXPONENT = 1.3
+
+_WORDS = (
+    "concert spectacle exposition soirée film théâtre danse musique jazz rap humour "
+    "science enfants famille découverte atelier conférence projection rencontre festival"
+).split()
+
+
+def _text(rng, n_words):
+    return " ".join(rng.choice(_WORDS) for _ in range(n_words)).capitalize()
+
+
+def _title(rng, i):
+    return f"{_text(rng, rng.randint(1, 4))} {i}"
+
+
+def _cgr(rng, i, base):
+    release = base - timedelta(days=rng.randint(0, 15000))
+    return {
+        "title": _title(rng, i),
+        "duration": f"{rng.randint(75, 180)} min",
+        "description": _text(rng, rng.randint(30, 120)),
+        "poster": f"https://all.web.img.acsta.net/pictures/{i}.jpg",
+        "genres": "Comédie, Drame",
+        "certificate": rng.choice(["U", "12", "16"]),
+        "release": release.strftime("%Y-%m-%dT00:00:00.000Z"),
+        "cinema": rng.choice(["CGR Buxerolles", "CGR Castille", "CGR Fontaine-le-Comte"]),
+        "source": "https://www.cgrcinemas.fr/horaire-film/p0736-cgr-buxerolles-poitiers/",
+        "scraped_at": base.isoformat(),
+    }
+
+
+def _arena(rng, i, base):
+    start = base + timedelta(days=rng.randint(0, 365), hours=rng.choice([19, 20]))
+    return {
+        "title": _title(rng, i).upper(),
+        "date": f"{_text(rng, 6)} {start:%d %B %Y - %HH%M}",
+        "release": start.isoformat() + "+02:00",
+        "poster": f"https://www.arena-futuroscope.com/wp-content/uploads/{i}.png",
+        "cinema": "Arena Futuroscope",
+        "source": f"https://www.arena-futuroscope.com/arena-event/{i}/",
+        "reservation": f"https://my.weezevent.com/{i}",
+        "scraped_at": base.isoformat(),
+    }
+
+
+def _tap(rng, i, base):
+    start = base + timedelta(days=rng.randint(0, 300))
+    end = start + timedelta(days=rng.choice([0, 0, 1, 2, 9]))
+    occ = [{"start": start.date().isoformat()}]
+    if end > start:
+        occ = [{"start": start.date().isoformat(), "end": end.date().isoformat()}]
+    return {
+        "title": _title(rng, i),
+        "date": f"Du {start.day} au {end.day} {end:%B %Y}",
+        "occurrences": occ,
+        "release": None,
+        "poster": f"https://www.tap-poitiers.com/wp-content/thumbnails/{i}.jpg",
+        "cinema": "TAP Poitiers",
+        "source": f"https://www.tap-poitiers.com/spectacle/{i}/",
+        "reservation": None,
+        "scraped_at": base.isoformat(),
+    }
+
+
+def _confort_moderne(rng, i, base):
+    start = base + timedelta(days=rng.randint(0, 200))
+    return {
+        "title": _title(rng, i),
+        "date": f"{start:%B} {start:%A %d}",
+        "release": start.replace(hour=20).isoformat(),
+        "end": None,
+        "occurrences": [{"start": start.replace(hour=20).isoformat()}],
+        "poster": f"https://www.confort-moderne.fr/assets/{i}.jpg",
+        "description": _text(rng, 3),
+        "cinema": "Confort Moderne",
+        "type": rng.choice(["Concert", "Exposition"]),
+        "location": "Club",
+        "source": f"https://www.confort-moderne.fr/fr/agenda/event/{i}",
+        "scraped_at": base.isoformat(),
+    }
+
+
+def _expo(rng, i, base):
+    return {
+        "title": _title(rng, i),
+        "date": None,
+        "poster": f"https://www.parcexpo-grandpoitiers.fr/app/uploads/{i}.png",
+        "cinema": "Parc Expo Grand Poitiers",
+        "source": f"https://www.parcexpo-grandpoitiers.fr/agenda/evenement/{i}/",
+        "scraped_at": base.isoformat(),
+    }
+
+
+def _emf(rng, i, base):
+    start = base + timedelta(days=rng.randint(0, 60))
+    end = start + timedelta(days=rng.randint(0, 28))
+    return {
+        "url": f"https://emf.fr/event/{i}/",
+        "title": _title(rng, i),
+        "category": rng.choice(["Expositions", "Conférences", "Ateliers"]),
+        "excerpt": "",
+        "description": _text(rng, rng.randint(80, 400)),
+        "img": f"https://emf.fr/wp-content/uploads/{i}.jpg",
+        "reservation": None,
+        "source": "espace mendes france",
+        "occurrences": [{"start": start.date().isoformat(), "end": end.date().isoformat()}],
+    }
+
+
+SHAPES = {
+    "cgr": _cgr, "arena": _arena, "tap": _tap,
+    "confort_moderne": _confort_moderne, "expo": _expo, "emf": _emf,
+}
+
+
+def generate(size, mix=None, duplicates=0.1, seed=42):
+    """`size` événements synthétiques, dont une part `duplicates` de doublons (titre + source)."""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    shapes, weights = zip(*mix.items())
+    base = datetime(2026, 10, 1)
+
+    events = []
+    for i in range(size):
+        if events and rng.random() < duplicates:
+            events.append(dict(rng.choice(events)))
+            continue
+        events.append(SHAPES[rng.choices(shapes, weights)[0]](rng, i, base))
+    return events
+
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run_scale(size, mix=None, duplicates=0.1, threshold=stream.SPILL_THRESHOLD):
+    """
+    Exécute la chaîne de publication sur `size` événements ; retourne les mesures.
+    Le pic mémoire est celui du flux dédoublonnage → séries triées → fusion →
+    écriture (les événements d'entrée, déjà en mémoire, n'y sont pas comptés) ;
+    le delta, calculé sur la fenêtre chaude en mémoire, est mesuré à part.
+    """
+    events = generate(size, mix, duplicates)
+    previous = {"seq": 1, "events": generate(size, mix, duplicates, seed=43)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.json")
+        timings = {}
+        spilled = {}
+
+        def pipeline():
+            deduper = stream.Deduper()
+            runs = stream.SortedRuns(threshold)
+            try:
+                t = time.perf_counter()
+                for ev in events:
+                    if deduper.is_new(ev):
+                        runs.add(ev)
+                timings["dedupe"] = time.perf_counter() - t
+
+                t = time.perf_counter()
+                runs.end_source()
+                timings["sort"] = time.perf_counter() - t
+
+                t = time.perf_counter()
+                count = stream.write_events(runs, 2, path)
+                timings["dump"] = time.perf_counter() - t
+            finally:
+                runs.close()
+            spilled["count"] = runs.spilled
+            return count
+
+        unique, total, peak = _measure(pipeline)
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        written = json.loads(raw)["events"]
+        t = time.perf_counter()
+        delta.compute(previous["events"], written)
+        timings["delta"] = time.perf_counter() - t
+
+    return {
+        "size": size,
+        "unique": unique,
+        "spilled": spilled["count"],
+        "total": total,
+        **timings,
+        "peak_mb": peak / 1e6,
+        "json_mb": len(raw) / 1e6,
+        "gzip_mb": len(gzip.compress(raw)) / 1e6,
+    }
+
+
+def _exponent(a, b, field):
+    if a[field] <= 0 or b[field] <= 0:
+        return None
+    return math.log(b[field] / a[field]) / math.log(b["size"] / a["size"])
+
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SHAPES:
+            raise argparse.ArgumentTypeError(f"forme inconnue : {name} ({', '.join(SHAPES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du post-traitement de l'agrégateur")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 1000, 5000, 20000, 50000])
+    parser.add_argument("--mix", type=_parse_mix, default=None, help="ex : cgr=0.3,tap=0.3,emf=0.4")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="part de doublons (défaut 0.1)")
+    parser.add_argument(
+        "--spill", type=int, default=stream.SPILL_THRESHOLD,
+        help=f"événements par série avant écriture sur disque (défaut {stream.SPILL_THRESHOLD})",
+    )
+    args = parser.parse_args(argv)
+
+    print(f"{'taille':>8} {'uniques':>8} {'disque':>8} {'total':>8} {'dedupe':>8} {'sort':>8} {'delta':>8} {'dump':>8}"
+          f" {'pic Mo':>8} {'JSON Mo':>8} {'gzip Mo':>8}")
+    results = []
+    for size in sorted(args.sizes):
+        r = run_scale(size, args.mix, args.duplicates, args.spill)
+        results.append(r)
+        print(f"{r['size']:>8} {r['unique']:>8} {r['spilled']:>8} {r['total']:>7.3f}s {r['dedupe']:>7.3f}s {r['sort']:>7.3f}s"
+              f" {r['delta']:>7.3f}s {r['dump']:>7.3f}s {r['peak_mb']:>8.1f} {r['json_mb']:>8.2f} {r['gzip_mb']:>8.2f}")
+
+    print("\n📈 Croissance (exposant k : temps ∝ taille^k)")
+    for a, b in zip(results, results[1:]):
+        parts = []
+        for field in ("dedupe", "sort", "delta", "dump", "peak_mb"):
+            k = _exponent(a, b, field)
+            if k is None:
+                continue
+            flag = " ⚠️" if k > SUPERLINEAR_EXPONENT else ""
+            parts.append(f"{field} {k:.2f}{flag}")
+        print(f"   {a['size']:>6} → {b['size']:<6} " + ", ".join(parts))
+
+
+if __name__ == "__main__":
+    main()
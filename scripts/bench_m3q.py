@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Banc d'essai de l'extraction M3Q : parcours unique (scrapers/m3q.py) contre
+l'ancienne implémentation (find_all des sections, puis find / find_all
+sur chaque sous-arbre), sur une page enregistrée ou des pages
+synthétiques à sections Elementor imbriquées.
+
+    curl -s https://m3q.centres-sociaux.fr/saison-culturelle-2025-26/ -o m3q.html
+    python scripts/bench_m3q.py --page m3q.html
+    python scripts/bench_m3q.py --sizes 20 80 320 --depth 3
+"""
+import argparse
+import re
+import time
+
+from bs4 import BeautifulSoup
+
+from scrapers import m3q
+
+_MONTHS = ["OCTOBRE", "NOVEMBRE", "DÉCEMBRE", "JANVIER", "FÉVRIER", "MARS"]
+_DAYS = ["VENDREDI", "SAMEDI", "DIMANCHE"]
+
+
+# =========================================================
+# Ancienne implémentation (référence)
+# =========================================================
+def legacy_extract(soup):
+    events = []
+    current_date = None
+    for section in soup.find_all("section", class_="elementor-section"):
+        date_block = section.find("p")
+        if date_block:
+            txt = date_block.get_text(strip=True).upper()
+            if txt.startswith(m3q.WEEKDAYS):
+                current_date = txt
+                continue
+        image = section.find("img")
+        title = section.find("h4")
+        texts = section.find_all("div", class_="elementor-widget-container")
+        if not (image and title and current_date):
+            continue
+        event_title = title.get_text(strip=True)
+        time_info = None
+        for t in texts:
+            content = t.get_text("\n", strip=True).strip()
+            if "→" in content:
+                time_info = content.replace("→", "").strip()
+        extracted_time = None
+        if time_info:
+            m = re.search(r"(\d{1,2}h\d{2})", time_info)
+            if m:
+                extracted_time = m.group(1)
+        button = section.find("a", class_="elementor-button")
+        events.append({
+            "date": m3q.convert_to_iso(current_date, extracted_time, 2025),
+            "title": event_title,
+            "image": image["src"],
+            "ticket": button["href"] if button else None,
+        })
+    return events
+
+
+# =========================================================
+# Pages synthétiques
+# =========================================================
+def _wrap(html, depth):
+    """Imbrique `html` dans `depth` sections Elementor (colonnes comprises)."""
+    for _ in range(depth):
+        html = (
+            '<section class="elementor-section elementor-inner-section"><div class="elementor-container">'
+            f'<div class="elementor-column"><div class="elementor-widget-wrap">{html}</div></div>'
+            '</div></section>'
+        )
+    return html
+
+
+def _widget(inner):
+    return f'<div class="elementor-widget"><div class="elementor-widget-container">{inner}</div></div>'
+
+
+def synthetic_page(n_events, depth=3):
+    blocks = []
+    for i in range(n_events):
+        if i % 3 == 0:
+            day = f"{_DAYS[i % 3]} {1 + i % 28} {_MONTHS[(i // 3) % len(_MONTHS)]}"
+            blocks.append(_wrap(_widget(f"<p>{day}</p>"), 1))
+        event = "".join((
+            _widget(f'<img src="https://m3q.centres-sociaux.fr/img/{i}.jpg">'),
+            _widget(f"<h4>Spectacle {i}</h4>"),
+            _widget("<p>· Théâtre · Tout public</p>"),
+            _widget(f"<p>→ Samedi {1 + i % 28} / 20h30</p>"),
+            _widget("<p>" + "Une soirée de découverte et de rencontre. " * 8 + "</p>"),
+            _widget(f'<a class="elementor-button" href="https://billetterie.example/{i}">BILLETTERIE</a>'),
+        ))
+        blocks.append(_wrap(event, depth))
+    body = _wrap("".join(blocks), 1)
+    return f"<html><head><title>Saison culturelle 2025-2026</title></head><body>{body}</body></html>".encode("utf-8")
+
+
+# =========================================================
+# Mesure
+# =========================================================
+def _best(fn, arg, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _summary(events):
+    keys = [(ev["title"], ev["date"]) for ev in events]
+    return len(keys), len(keys) - len(set(keys))
+
+
+def bench(label, content, repeat):
+    # Le parsing HTML est commun aux deux : seule l'extraction est comparée
+    parse_time, soup = _best(lambda c: BeautifulSoup(c, "html.parser"), content, repeat)
+    legacy_time, legacy_events = _best(legacy_extract, soup, repeat)
+    new_time, new_events = _best(m3q.extract_events, soup, repeat)
+    legacy_count, legacy_dupes = _summary(legacy_events)
+    new_count, new_dupes = _summary(new_events)
+    print(
+        f"{label:>14} | parsing {parse_time * 1000:7.1f} ms"
+        f" | ancien {legacy_time * 1000:7.1f} ms ({legacy_count} év., {legacy_dupes} doublons)"
+        f" | nouveau {new_time * 1000:7.1f} ms ({new_count} év., {new_dupes} doublons)"
+        f" | ×{legacy_time / new_time:.1f}"
+    )
+    missing = {(ev["title"], ev["date"]) for ev in legacy_events} - {(ev["title"], ev["date"]) for ev in new_events}
+    if missing:
+        print(f"   ⚠️ {len(missing)} évènements de l'ancien parseur absents : {sorted(missing)[:3]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--page", help="page M3Q enregistrée (HTML)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 80, 320], help="évènements par page synthétique")
+    parser.add_argument("--depth", type=int, default=3, help="imbrication des sections autour d'un évènement")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.page:
+        with open(args.page, "rb") as f:
+            bench(args.page[-14:], f.read(), args.repeat)
+        return
+    for size in args.sizes:
+        bench(f"{size} év. × {args.depth}", synthetic_page(size, args.depth), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# coding: utf-8
+"""
+Index calendaire de la sortie : calendar.json.
+
+    {"generated_at": ..., "timezone": "Europe/Paris",
+     "from": "2026-10-19", "to": "2026-12-14",
+     "days": {"2026-10-19": [id, ...], ...},
+     "now_showing": [id, ...]}
+
+Chaque jour local (heure de Paris) de la fenêtre liste les identifiants
+(event_utils.event_id) des événements ayant une occurrence ce jour-là ;
+les périodes et séries hebdomadaires sont déroulées dans la fenêtre.
+"Aujourd'hui", "cette semaine" ou un jour choisi deviennent une simple
+lecture de "days", sans réinterpréter release / date / occurrences.
+Les films à l'affiche (sans dates) sont listés à part dans "now_showing".
+"""
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from event_utils import event_id, occurrence_runs
+from hotcold import HOT_WEEKS, PARIS, TIMEZONE, is_now_showing, local_today
+from scrapers import occurrences
+
+CALENDAR_PATH = "calendar.json"
+
+
+def local_day(value):
+    """Jour local d'une date ISO : une date-heure avec fuseau est ramenée à l'heure de Paris."""
+    if value is None:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        return occurrences.to_date(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(PARIS)
+    return dt.date()
+
+
+def _local_runs(runs):
+    """Séries dont les bornes sont des jours locaux (except et freq inchangés)."""
+    local = []
+    for occ in runs:
+        occ = dict(occ)
+        for bound in ("start", "end"):
+            if occ.get(bound):
+                day = local_day(occ[bound])
+                occ[bound] = day.isoformat() if day else None
+        local.append(occ)
+    return local
+
+
+def build(events, weeks=HOT_WEEKS, today=None):
+    """Index jour → identifiants sur `weeks` semaines à partir d'aujourd'hui (heure de Paris)."""
+    today = today or local_today()
+    last = today + timedelta(weeks=weeks)
+    days = {}
+    now_showing = []
+    for ev in events:
+        if is_now_showing(ev):
+            now_showing.append(event_id(ev))
+            continue
+        key = event_id(ev)
+        for day in occurrences.expand(_local_runs(occurrence_runs(ev)), today, last):
+            ids = days.setdefault(day.isoformat(), [])
+            # Deux séries d'un même événement peuvent couvrir le même jour
+            if not ids or ids[-1] != key:
+                ids.append(key)
+    return {
+        "timezone": TIMEZONE,
+        "from": today.isoformat(),
+        "to": last.isoformat(),
+        "days": dict(sorted(days.items())),
+        "now_showing": now_showing,
+    }
+
+
+def load(path=CALENDAR_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write(index, path=CALENDAR_PATH) -> bool:
+    """Écrit calendar.json si l'index a changé ; retourne True si le fichier a été réécrit."""
+    previous = load(path)
+    if previous and all(previous.get(k) == v for k, v in index.items()):
+        return False
+    payload = {"generated_at": datetime.now(timezone.utc).isoformat(), **index}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return True
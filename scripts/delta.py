@@ -0,0 +1,126 @@
+# coding: utf-8
+"""
+Flux de différences entre deux runs de l'agrégateur.
+
+À chaque run qui modifie les données, un fichier deltas/<seq>.json décrit
+ce qui a changé depuis le run précédent :
+    {"seq": 42, "base": 41, "generated_at": ...,
+     "added":   [événement complet, ...],
+     "removed": [id, ...],
+     "changed": [{"key": id, "set": {champ: valeur}, "unset": [champ]}, ...]}
+
+deltas/index.json liste la chaîne des derniers deltas. Un client qui
+connaît le numéro de séquence de sa copie (champ "seq" d'events.json) :
+  - ne fait rien si son seq est celui de l'index ;
+  - applique les deltas suivants si son seq figure comme "base" dans la chaîne ;
+  - sinon recharge events.json en entier.
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+from event_utils import VOLATILE_FIELDS, event_id
+
+DELTA_DIR = "deltas"
+CHAIN_LENGTH = 12  # 3 jours de runs toutes les 6 heures
+
+
+def load_previous(path="events.json"):
+    """Sortie précédente (ou None si absente / illisible)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def compute(old_events, new_events):
+    """Diff par identité d'événement, champ par champ (hors champs volatils)."""
+    old = {event_id(ev): ev for ev in old_events}
+    new = {event_id(ev): ev for ev in new_events}
+
+    added = [ev for key, ev in new.items() if key not in old]
+    removed = [key for key in old if key not in new]
+    changed = []
+    for key, ev in new.items():
+        before = old.get(key)
+        if before is None:
+            continue
+        fields = (set(before) | set(ev)) - set(VOLATILE_FIELDS)
+        set_fields = {f: ev[f] for f in sorted(fields) if f in ev and before.get(f) != ev[f]}
+        unset_fields = sorted(f for f in fields if f in before and f not in ev)
+        if set_fields or unset_fields:
+            entry = {"key": key, "set": set_fields}
+            if unset_fields:
+                entry["unset"] = unset_fields
+            changed.append(entry)
+
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def is_empty(diff) -> bool:
+    return not (diff["added"] or diff["removed"] or diff["changed"])
+
+
+def _write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def publish(previous, new_events, directory=DELTA_DIR):
+    """
+    Calcule et écrit le delta du run ; retourne le numéro de séquence à
+    inscrire dans events.json. Sans sortie précédente exploitable, la chaîne
+    repart de zéro (les clients feront un rechargement complet).
+    """
+    os.makedirs(directory, exist_ok=True)
+    index_path = os.path.join(directory, "index.json")
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {"seq": 0, "chain": []}
+
+    base = (previous or {}).get("seq")
+    if previous is None or base is None or base != index["seq"]:
+        # Pas de base commune : nouvelle chaîne
+        seq = index["seq"] + 1
+        for entry in index["chain"]:
+            _remove(os.path.join(directory, entry["file"]))
+        _write_json(index_path, {"seq": seq, "generated_at": _now(), "chain": []})
+        return seq
+
+    diff = compute(previous.get("events", []), new_events)
+    if is_empty(diff):
+        return base
+
+    seq = base + 1
+    generated_at = _now()
+    filename = f"{seq}.json"
+    _write_json(os.path.join(directory, filename), {"seq": seq, "base": base, "generated_at": generated_at, **diff})
+
+    chain = index["chain"] + [{
+        "seq": seq,
+        "base": base,
+        "file": filename,
+        "added": len(diff["added"]),
+        "removed": len(diff["removed"]),
+        "changed": len(diff["changed"]),
+    }]
+    for entry in chain[:-CHAIN_LENGTH]:
+        _remove(os.path.join(directory, entry["file"]))
+    chain = chain[-CHAIN_LENGTH:]
+
+    _write_json(index_path, {"seq": seq, "generated_at": generated_at, "chain": chain})
+    return seq
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
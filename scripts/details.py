@@ -0,0 +1,111 @@
+# coding: utf-8
+"""
+Détails chargés à la demande.
+
+events.json ne porte plus que des fiches de carte légères : les champs longs
+(DETAIL_FIELDS) sont remplacés par un extrait ("excerpt") et déplacés dans
+details/<bucket>.json, que la page ne télécharge qu'au clic sur "Voir plus" :
+    events.json         {"id": "emf-3f2a9c1b7e4d", "title": ..., "excerpt": "...", "details": "a", ...}
+    details/a.json      {"emf-3f2a9c1b7e4d": {"description": "..."}, ...}
+Le bucket est le premier caractère hexadécimal du SHA-1 de l'identifiant :
+16 fichiers au plus, stables d'un run à l'autre (seuls ceux qui changent
+sont réécrits).
+"""
+import hashlib
+import json
+import os
+import re
+
+from event_utils import event_id
+
+DETAILS_DIR = "details"
+DETAIL_FIELDS = ("description", "synopsis", "subtitle")
+EXCERPT_WORDS = 30
+
+
+def bucket_of(key) -> str:
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[0]
+
+
+def excerpt_of(ev) -> str:
+    """Texte court de la carte : extrait de la source, sinon début de la description."""
+    if ev.get("excerpt"):
+        return ev["excerpt"]
+    description = ev.get("description") or ""
+    if len(description) <= 5:
+        # M3Q : le sous-titre sans la ligne "→ ... / ..."
+        description = ev.get("synopsis") or re.sub(r"→[^\n\r]*\Z", "", ev.get("subtitle") or "", count=1).strip()
+    words = description.split(" ")
+    if len(words) <= EXCERPT_WORDS:
+        return description
+    return " ".join(words[:EXCERPT_WORDS]) + "..."
+
+
+def detach(ev):
+    """(fiche légère, champs longs) d'un événement ; champs longs None s'il n'en a pas."""
+    moved = {f: ev[f] for f in DETAIL_FIELDS if ev.get(f)}
+    if not moved:
+        return ev, None
+    card = {k: v for k, v in ev.items() if k not in DETAIL_FIELDS}
+    card["excerpt"] = excerpt_of(ev)
+    card["details"] = bucket_of(event_id(ev))
+    return card, moved
+
+
+def split(events):
+    """(fiches légères, {bucket: {id: champs longs}})."""
+    lean, buckets = [], {}
+    for ev in events:
+        card, moved = detach(ev)
+        if moved:
+            buckets.setdefault(card["details"], {})[event_id(ev)] = moved
+        lean.append(card)
+    return lean, buckets
+
+
+def _path(bucket, directory):
+    return os.path.join(directory, f"{bucket}.json")
+
+
+def _load(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write(buckets, directory=DETAILS_DIR) -> list:
+    """Écrit les buckets dont le contenu a changé (les buckets vidés deviennent {}) ; retourne leurs noms."""
+    os.makedirs(directory, exist_ok=True)
+    existing = {name[:-5] for name in os.listdir(directory) if name.endswith(".json")}
+    written = []
+    for bucket in sorted(set(buckets) | existing):
+        content = buckets.get(bucket, {})
+        path = _path(bucket, directory)
+        if _load(path) == content:
+            continue
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(content, f, ensure_ascii=False, indent=2, sort_keys=True)
+        written.append(bucket)
+    return written
+
+
+def restore(events, directory=DETAILS_DIR) -> list:
+    """Fiches complètes à partir de fiches légères (reprise de la sortie précédente)."""
+    cache = {}
+    full = []
+    for ev in events:
+        bucket = ev.get("details")
+        if not bucket:
+            full.append(ev)
+            continue
+        if bucket not in cache:
+            cache[bucket] = _load(_path(bucket, directory)) or {}
+        ev = {**ev, **cache[bucket].get(event_id(ev), {})}
+        ev.pop("details", None)
+        # Extrait calculé par split() : recalculé au prochain split, pas repris
+        if ev.get("excerpt") == excerpt_of({**ev, "excerpt": None}):
+            ev.pop("excerpt")
+        full.append(ev)
+    return full
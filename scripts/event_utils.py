@@ -0,0 +1,72 @@
+# coding: utf-8
+"""Accès uniformes aux champs des événements, quelle que soit la source."""
+from datetime import datetime
+
+from scrapers import ids, occurrences
+
+# Champs qui changent à chaque run sans que l'événement change
+VOLATILE_FIELDS = ("scraped_at",)
+
+
+def venue_of(ev: dict) -> str:
+    """Lieu de l'événement ("cinema" pour toutes les sources sauf EMF)."""
+    return (ev.get("cinema") or ev.get("etablissement") or ev.get("source") or "").strip()
+
+
+def url_of(ev: dict) -> str | None:
+    """Lien propre à l'événement (fiche, billetterie), sinon la page source."""
+    return ev.get("url") or ev.get("source") or ev.get("ticket") or ev.get("reservation")
+
+
+def _iso(value):
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return value
+    except ValueError:
+        return None
+
+
+def start_of(ev: dict) -> str | None:
+    """Début ISO : release, date (si ISO) ou première occurrence."""
+    start = _iso(ev.get("release")) or _iso(ev.get("date"))
+    if start:
+        return start
+    first, _ = occurrences.bounds(ev.get("occurrences"))
+    return first.isoformat() if first else None
+
+
+def occurrence_runs(ev: dict) -> list:
+    """Occurrences de l'événement ; à défaut, sa date de début seule."""
+    if ev.get("occurrences"):
+        return ev["occurrences"]
+    start = start_of(ev)
+    return [occurrences.single(start)] if start else []
+
+
+def event_key(ev: dict) -> str:
+    """Identité d'un événement d'un run à l'autre : lieu + lien + titre + début."""
+    return "|".join((
+        venue_of(ev).lower(),
+        (url_of(ev) or "").lower(),
+        (ev.get("title") or "").strip().lower(),
+        start_of(ev) or "",
+    ))
+
+
+def event_id(ev: dict) -> str:
+    """Identifiant stable posé par le scraper (champ "id") ; à défaut, event_key()."""
+    return ev.get("id") or event_key(ev)
+
+
+def signature(ev: dict) -> tuple:
+    """Titre et début normalisés : deux événements de même id et de signature différente sont en collision."""
+    return ids.normalize(ev.get("title")), ids.normalize_start(start_of(ev))
+
+
+def assign_id(ev: dict) -> str:
+    """Pose un id (lieu + titre + début) sur un événement qui n'en a pas."""
+    if not ev.get("id"):
+        ev["id"] = ids.make_id(venue_of(ev), title=ev.get("title"), start=start_of(ev))
+    return ev["id"]
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Historique des runs dans une base SQLite locale.
+
+Chaque exécution de l'agrégateur ajoute un run (statistiques par source),
+met à jour l'état courant des événements et de leurs occurrences, et note
+quels événements (et quelle version de leur contenu) étaient présents.
+
+Requêtes en ligne de commande :
+    python scripts/history.py upcoming [--venue TAP] [--days 14]
+    python scripts/history.py changes [--from RUN] [--to RUN]
+    python scripts/history.py trends [--source cgr] [--runs 20]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from event_utils import VOLATILE_FIELDS, event_id, occurrence_runs, start_of, url_of, venue_of
+from scrapers import occurrences
+
+DB_PATH = os.environ.get("EVENTS_HISTORY_DB", "events_history.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    collected INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_sources (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    source TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    duration REAL,
+    error TEXT,
+    PRIMARY KEY (run_id, source)
+);
+CREATE TABLE IF NOT EXISTS versions (
+    hash TEXT PRIMARY KEY,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    key TEXT PRIMARY KEY,
+    venue TEXT NOT NULL,
+    title TEXT,
+    url TEXT,
+    start TEXT,
+    hash TEXT NOT NULL REFERENCES versions(hash),
+    first_seen INTEGER NOT NULL REFERENCES runs(id),
+    last_seen INTEGER NOT NULL REFERENCES runs(id),
+    changed_in INTEGER NOT NULL REFERENCES runs(id)
+);
+CREATE INDEX IF NOT EXISTS idx_events_venue_start ON events(venue, start);
+CREATE INDEX IF NOT EXISTS idx_events_start ON events(start);
+CREATE TABLE IF NOT EXISTS occurrences (
+    event_key TEXT NOT NULL REFERENCES events(key),
+    start TEXT,
+    end TEXT,
+    spec TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_occurrences_start ON occurrences(start, end);
+CREATE INDEX IF NOT EXISTS idx_occurrences_event ON occurrences(event_key);
+CREATE TABLE IF NOT EXISTS run_events (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    event_key TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (run_id, event_key)
+);
+"""
+
+
+def connect(path: str = DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def content_hash(ev: dict) -> str:
+    stable = {k: v for k, v in ev.items() if k not in VOLATILE_FIELDS}
+    return hashlib.sha1(json.dumps(stable, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class RunRecorder:
+    """
+    Enregistrement d'un run au fil de l'eau : add(ev) pour chaque événement
+    publié, puis finish(). Une erreur SQLite pendant add() n'interrompt pas
+    la publication : le run est abandonné et l'erreur relevée par finish().
+    """
+
+    def __init__(self, stats, started_at, path: str = DB_PATH):
+        self.conn = connect(path)
+        self.count = 0
+        self.error = None
+        cur = self.conn.execute(
+            "INSERT INTO runs (started_at, finished_at, total, collected) VALUES (?, ?, 0, 0)",
+            (started_at, started_at),
+        )
+        self.run_id = cur.lastrowid
+        self.conn.executemany(
+            "INSERT INTO run_sources (run_id, source, count, duration, error) VALUES (?, ?, ?, ?, ?)",
+            [(self.run_id, name, s.get("count", 0), s.get("duration"), s.get("error")) for name, s in stats.items()],
+        )
+
+    def add(self, ev):
+        if self.error is not None:
+            return
+        try:
+            self._add(ev)
+            self.count += 1
+        except Exception as e:
+            self.error = e
+
+    def _add(self, ev):
+        conn, run_id = self.conn, self.run_id
+        key, digest = event_id(ev), content_hash(ev)
+        conn.execute(
+            "INSERT OR IGNORE INTO versions (hash, payload) VALUES (?, ?)",
+            (digest, json.dumps(ev, ensure_ascii=False)),
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO run_events (run_id, event_key, hash) VALUES (?, ?, ?)",
+            (run_id, key, digest),
+        )
+
+        row = conn.execute("SELECT hash FROM events WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            conn.execute(
+                "INSERT INTO events (key, venue, title, url, start, hash, first_seen, last_seen, changed_in) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, venue_of(ev), ev.get("title"), url_of(ev), start_of(ev), digest, run_id, run_id, run_id),
+            )
+        elif row["hash"] != digest:
+            conn.execute(
+                "UPDATE events SET venue = ?, title = ?, url = ?, start = ?, hash = ?, last_seen = ?, changed_in = ? "
+                "WHERE key = ?",
+                (venue_of(ev), ev.get("title"), url_of(ev), start_of(ev), digest, run_id, run_id, key),
+            )
+        else:
+            conn.execute("UPDATE events SET last_seen = ? WHERE key = ?", (run_id, key))
+            return
+
+        conn.execute("DELETE FROM occurrences WHERE event_key = ?", (key,))
+        conn.executemany(
+            "INSERT INTO occurrences (event_key, start, end, spec) VALUES (?, ?, ?, ?)",
+            [
+                (key, occ.get("start"), occ.get("end") or (None if occ.get("open") else occ.get("start")), json.dumps(occ))
+                for occ in occurrence_runs(ev)
+            ],
+        )
+
+    def finish(self, collected=None) -> int:
+        """Valide le run ; retourne son identifiant."""
+        try:
+            if self.error is not None:
+                raise self.error
+            self.conn.execute(
+                "UPDATE runs SET finished_at = ?, total = ?, collected = ? WHERE id = ?",
+                (
+                    datetime.now(timezone.utc).isoformat(),
+                    self.count,
+                    collected if collected is not None else self.count,
+                    self.run_id,
+                ),
+            )
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.close()
+        return self.run_id
+
+
+def record_run(events, stats, started_at, collected=None, path: str = DB_PATH) -> int:
+    """
+    Enregistre un run : stats = {source: {"count", "duration", "error"}}.
+    Retourne l'identifiant du run.
+    """
+    recorder = RunRecorder(stats, started_at, path)
+    for ev in events:
+        recorder.add(ev)
+    return recorder.finish(collected)
+
+
+# =========================================================
+# 🔎 REQUÊTES
+# =========================================================
+def upcoming(conn, days=14, venue=None, now=None):
+    """
+    Événements ayant une occurrence dans les `days` prochains jours (présents au
+    dernier run), avec leur prochain jour. Les séries sont déroulées (except, freq).
+    """
+    first = (now or datetime.now()).date()
+    last = first + timedelta(days=days)
+    # Préfiltre sur les bornes ISO (index), le déroulage tranche ensuite
+    sql = (
+        "SELECT e.key, e.venue, e.title, e.url, o.start, o.end, o.spec FROM occurrences o "
+        "JOIN events e ON e.key = o.event_key "
+        "WHERE e.last_seen = (SELECT MAX(id) FROM runs) "
+        "AND (o.start IS NULL OR o.start < ?) AND (o.end IS NULL OR o.end >= ?)"
+    )
+    params = [(last + timedelta(days=1)).isoformat(), first.isoformat()]
+    if venue:
+        sql += " AND e.venue LIKE ?"
+        params.append(f"%{venue}%")
+
+    found = {}
+    for row in conn.execute(sql, params):
+        day = next(occurrences.expand([json.loads(row["spec"])], first, last), None)
+        if day is None or (row["key"] in found and found[row["key"]]["day"] <= day):
+            continue
+        found[row["key"]] = {
+            "key": row["key"], "venue": row["venue"], "title": row["title"], "url": row["url"],
+            "day": day, "start": row["start"], "end": row["end"],
+        }
+    return sorted(found.values(), key=lambda r: (r["day"], r["venue"], r["title"] or ""))
+
+
+def _described(conn, rows):
+    """(clé, hash) → {"key", "venue", "title"} d'après la version enregistrée."""
+    out = []
+    for key, digest in rows:
+        row = conn.execute("SELECT payload FROM versions WHERE hash = ?", (digest,)).fetchone()
+        ev = json.loads(row["payload"]) if row else {}
+        out.append({"key": key, "venue": venue_of(ev), "title": ev.get("title")})
+    return sorted(out, key=lambda r: (r["venue"], r["title"] or ""))
+
+
+def changes(conn, from_run=None, to_run=None):
+    """
+    Événements ajoutés, retirés et modifiés entre deux runs (par défaut : les deux
+    derniers), avec leur titre et leur lieu.
+    """
+    if to_run is None:
+        to_run = conn.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+    if from_run is None:
+        from_run = conn.execute("SELECT MAX(id) FROM runs WHERE id < ?", (to_run,)).fetchone()[0]
+    if to_run is None or from_run is None:
+        return {"from": from_run, "to": to_run, "added": [], "removed": [], "changed": []}
+
+    added = conn.execute(
+        "SELECT b.event_key, b.hash FROM run_events b WHERE b.run_id = ? AND NOT EXISTS "
+        "(SELECT 1 FROM run_events a WHERE a.run_id = ? AND a.event_key = b.event_key)",
+        (to_run, from_run),
+    ).fetchall()
+    removed = conn.execute(
+        "SELECT a.event_key, a.hash FROM run_events a WHERE a.run_id = ? AND NOT EXISTS "
+        "(SELECT 1 FROM run_events b WHERE b.run_id = ? AND b.event_key = a.event_key)",
+        (from_run, to_run),
+    ).fetchall()
+    changed = conn.execute(
+        "SELECT a.event_key, b.hash FROM run_events a "
+        "JOIN run_events b ON b.event_key = a.event_key AND b.run_id = ? "
+        "WHERE a.run_id = ? AND a.hash != b.hash",
+        (to_run, from_run),
+    ).fetchall()
+    return {
+        "from": from_run,
+        "to": to_run,
+        "added": _described(conn, added),
+        "removed": _described(conn, removed),
+        "changed": _described(conn, changed),
+    }
+
+
+def trends(conn, source=None, runs=20):
+    """Nombre d'événements, durée et erreurs par source sur les derniers runs."""
+    sql = (
+        "SELECT r.id, r.started_at, s.source, s.count, s.duration, s.error FROM run_sources s "
+        "JOIN runs r ON r.id = s.run_id WHERE r.id > (SELECT COALESCE(MAX(id), 0) - ? FROM runs)"
+    )
+    params = [runs]
+    if source:
+        sql += " AND s.source = ?"
+        params.append(source)
+    sql += " ORDER BY s.source, r.id"
+    return conn.execute(sql, params).fetchall()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Historique des runs de l'agrégateur")
+    parser.add_argument("--db", default=DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("upcoming", help="événements à venir")
+    p.add_argument("--days", type=int, default=14)
+    p.add_argument("--venue")
+
+    p = sub.add_parser("changes", help="différences entre deux runs")
+    p.add_argument("--from", dest="from_run", type=int)
+    p.add_argument("--to", dest="to_run", type=int)
+
+    p = sub.add_parser("trends", help="évolution par source")
+    p.add_argument("--source")
+    p.add_argument("--runs", type=int, default=20)
+
+    args = parser.parse_args(argv)
+    conn = connect(args.db)
+
+    if args.command == "upcoming":
+        for row in upcoming(conn, args.days, args.venue):
+            day = row["day"].isoformat()
+            # Heure affichée seulement si la série commence ce jour-là
+            when = row["start"][:16] if (row["start"] or "")[:10] == day else day
+            print(f"{when:<17} {row['venue'][:24]:<24} {row['title']}")
+
+    elif args.command == "changes":
+        diff = changes(conn, args.from_run, args.to_run)
+        print(f"Run {diff['from']} → {diff['to']}")
+        for label, rows in (("➕ ajoutés", diff["added"]), ("➖ retirés", diff["removed"]), ("✏️ modifiés", diff["changed"])):
+            print(f"\n{label} ({len(rows)})")
+            for row in rows:
+                print(f"   {row['venue'][:24]:<24} {row['title'] or row['key']}")
+
+    elif args.command == "trends":
+        current = None
+        for row in trends(conn, args.source, args.runs):
+            if row["source"] != current:
+                current = row["source"]
+                print(f"\n📊 {current}")
+            duration = f"{row['duration']:.1f}s" if row["duration"] is not None else "-"
+            error = f" ❌ {row['error']}" if row["error"] else ""
+            print(f"   run {row['id']:>4} {row['started_at'][:16]}  {row['count']:>4} événements  {duration:>7}{error}")
+
+
+if __name__ == "__main__":
+    main()
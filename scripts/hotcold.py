@@ -0,0 +1,136 @@
+# coding: utf-8
+"""
+Séparation chaud / froid de la sortie.
+
+  - events.json (chaud) : événements ayant une occurrence dans les HOT_WEEKS
+    prochaines semaines, films à l'affiche et événements sans date connue,
+    triés par prochaine occurrence ;
+  - events-archive.json (froid) : tout le reste (passé, ou au-delà de la
+    fenêtre), réécrit seulement quand son contenu change.
+"""
+import hashlib
+import json
+import os
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import stream
+from event_utils import VOLATILE_FIELDS, occurrence_runs, venue_of
+from scrapers import occurrences
+
+HOT_WEEKS = int(os.environ.get("HOT_WEEKS", 8))
+ARCHIVE_PATH = "events-archive.json"
+# Les jours sont ceux de Poitiers, pas ceux de la machine (UTC en CI)
+TIMEZONE = "Europe/Paris"
+PARIS = ZoneInfo(TIMEZONE)
+
+# Programmation de la semaine : pas de dates, les films listés sont à l'affiche
+NOW_SHOWING_PREFIXES = ("cgr", "tap cinéma")
+
+
+def is_now_showing(ev) -> bool:
+    return venue_of(ev).lower().startswith(NOW_SHOWING_PREFIXES)
+
+
+def next_day(ev, today, horizon):
+    """Jour de tri d'un événement chaud ; None s'il va dans l'archive."""
+    if is_now_showing(ev):
+        return today
+    runs = occurrence_runs(ev)
+    if not runs:
+        # Sans date exploitable : on ne peut pas l'archiver, affiché en dernier
+        return date.max
+    upcoming = occurrences.next_occurrence(runs, today)
+    return upcoming if upcoming and upcoming <= horizon else None
+
+
+def local_today() -> date:
+    """Jour courant à l'heure de Paris (partagé avec calendar_index)."""
+    return datetime.now(PARIS).date()
+
+
+def horizon_of(weeks=HOT_WEEKS, today=None):
+    today = today or local_today()
+    return today, today + timedelta(weeks=weeks)
+
+
+def split(events, weeks=HOT_WEEKS, today=None):
+    """(chauds triés par prochaine occurrence, froids dans l'ordre d'entrée)."""
+    today, horizon = horizon_of(weeks, today)
+    hot, cold = [], []
+    for ev in events:
+        day = next_day(ev, today, horizon)
+        if day is None:
+            cold.append(ev)
+        else:
+            hot.append((day, ev))
+
+    # Tri stable : à jour égal, l'ordre chronologique de la fusion est conservé
+    hot.sort(key=lambda item: item[0])
+    return [ev for _, ev in hot], cold
+
+
+def _stable_line(ev) -> bytes:
+    """Contenu de l'événement hors champs volatils (pour l'empreinte de l'archive)."""
+    stable = {k: v for k, v in ev.items() if k not in VOLATILE_FIELDS}
+    return json.dumps(stable, sort_keys=True, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _digest(events):
+    digest = hashlib.sha1()
+    for ev in events:
+        digest.update(_stable_line(ev))
+    return digest.hexdigest()
+
+
+def load_archive(path=ARCHIVE_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("events", [])
+    except (OSError, ValueError):
+        return []
+
+
+class Archive:
+    """
+    Écriture en flux de l'archive : add(ev) pour chaque événement froid,
+    puis close(), qui ne remplace le fichier que si son contenu (hors champs
+    volatils) a changé.
+    """
+
+    def __init__(self, path=ARCHIVE_PATH):
+        self.path = path
+        self.writer = stream.EventWriter(path)
+        self.digest = hashlib.sha1()
+
+    @property
+    def count(self):
+        return self.writer.count
+
+    def add(self, ev):
+        self.writer.add(ev)
+        self.digest.update(_stable_line(ev))
+
+    def close(self) -> bool:
+        """Retourne True si le fichier a été réécrit."""
+        # L'ancienne archive n'est relue qu'une fois la nouvelle écrite sur disque
+        if os.path.exists(self.path) and _digest(load_archive(self.path)) == self.digest.hexdigest():
+            self.writer.discard()
+            return False
+        self.writer.close()
+        return True
+
+    def discard(self):
+        self.writer.discard()
+
+
+def write_archive(cold, path=ARCHIVE_PATH) -> bool:
+    """Écrit l'archive si son contenu a changé ; retourne True si le fichier a été réécrit."""
+    archive = Archive(path)
+    try:
+        for ev in cold:
+            archive.add(ev)
+    except BaseException:
+        archive.discard()
+        raise
+    return archive.close()
@@ -0,0 +1,110 @@
+# coding: utf-8
+"""Post-traitement des événements collectés : dédoublonnage, tri, écriture d'events.json."""
+import json
+from datetime import datetime, timezone
+
+from event_utils import VOLATILE_FIELDS, assign_id, event_id, signature, url_of, venue_of
+
+
+def dedupe_key(ev):
+    """Deux événements de même id (à défaut : même titre et même source) sont des doublons."""
+    if ev.get("id"):
+        return ("id", ev["id"])
+    return (
+        (ev.get("title") or "").strip().lower(),
+        (ev.get("source") or "").strip().lower(),
+    )
+
+
+def check_ids(events, seen):
+    """
+    Pose les id manquants et détecte les collisions : deux événements
+    différents (titre ou début) sous le même id. Le suivant reçoit un
+    suffixe "-2", "-3"... ; seen ({id: signature}) est partagé entre les
+    sources du run. Retourne la liste des id en collision.
+    """
+    collisions = []
+    for ev in events:
+        base = assign_id(ev)
+        sig = signature(ev)
+        n = 1
+        while ev["id"] in seen and seen[ev["id"]] != sig:
+            n += 1
+            ev["id"] = f"{base}-{n}"
+        if n > 1:
+            collisions.append(base)
+        seen.setdefault(ev["id"], sig)
+    return collisions
+
+
+def dedupe(events):
+    """Supprime les doublons (même titre, même source) en gardant le premier vu."""
+    seen = set()
+    unique = []
+    for ev in events:
+        key = dedupe_key(ev)
+        if key not in seen:
+            seen.add(key)
+            unique.append(ev)
+    return unique
+
+
+def carry_over(events, previous_events):
+    """
+    Complète les champs vides d'événements "listing seul" avec ceux du même
+    événement dans la sortie précédente (même id, sinon même lieu et même
+    lien s'il est unique). Retourne de nouveaux dicts ; les originaux sont intacts.
+    """
+    by_key = {event_id(ev): ev for ev in previous_events}
+    by_url = {}
+    for ev in previous_events:
+        by_url.setdefault((venue_of(ev), url_of(ev)), []).append(ev)
+
+    filled = []
+    for ev in events:
+        before = by_key.get(event_id(ev))
+        if before is None:
+            same_url = by_url.get((venue_of(ev), url_of(ev))) or []
+            before = same_url[0] if len(same_url) == 1 else None
+        ev = dict(ev)
+        for field, value in (before or {}).items():
+            if field not in VOLATILE_FIELDS and ev.get(field) in (None, "") and value not in (None, ""):
+                ev[field] = value
+        filled.append(ev)
+    return filled
+
+
+# --- Tri chronologique robuste ---
+def parse_date(value):
+    if not value:
+        return datetime.max
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return dt
+    except Exception:
+        return datetime.max
+
+
+def sort_key(ev):
+    return parse_date(ev.get("release")) or parse_date(ev.get("date"))
+
+
+def sort_events(events):
+    """Trie la liste sur place par date de sortie / date."""
+    events.sort(key=sort_key)
+    return events
+
+
+def build_output(events, seq=None):
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "seq": seq,
+        "events": events,
+    }
+
+
+def write_output(output, path="events.json"):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,243 @@
+# coding: utf-8
+"""
+Pré-rendu des sections lieux d'index.html au moment du build.
+
+Chaque grille (<section class="grid" id="gridXXX">) reçoit le même balisage
+que les templates de cartes du navigateur : la page s'affiche sans JavaScript
+ni chargement d'events.json. Chaque carte porte un data-id (même clé que
+eventKey() côté navigateur) : le script reprend les cartes existantes au lieu
+de les reconstruire, et ne fait plus que les masquer / afficher pour filtrer.
+
+Chaque section porte un data-hash des événements de son lieu : seules les
+sections dont les événements ont changé sont régénérées.
+"""
+import hashlib
+import json
+import re
+from html import escape
+
+from event_utils import VOLATILE_FIELDS
+
+PAGE_PATH = "index.html"
+# À incrémenter quand le balisage des cartes change : force le re-rendu de toutes les sections
+MARKUP_VERSION = 6
+
+_SECTION_RE = re.compile(
+    r'(<section class="grid" id="(?P<id>grid\w+)"(?P<attrs>[^>]*)>)(?P<body>.*?)(</section>)',
+    re.S,
+)
+_HASH_RE = re.compile(r'data-hash="([0-9a-f]*)"')
+
+
+def _e(value):
+    return escape(str(value)) if value not in (None, "") else ""
+
+
+# =========================================================
+# 🧱 CARTES (miroir des templates de cartes d'index.html)
+# =========================================================
+def _cover_img(poster):
+    # loading="lazy" : seules les affiches proches de l'écran sont téléchargées
+    if not poster:
+        return ""
+    return f'<img class="cover-img" src="{_e(poster)}" alt="" loading="lazy" decoding="async">'
+
+
+def _card(poster, title, meta, actions, badge="", synopsis=None):
+    body = ""
+    if synopsis is not None:
+        short, full = synopsis
+        body = (
+            f'\n    <p class="synopsis" data-full="{_e(full)}">{_e(short)}</p>'
+            '\n    <button class="toggle-btn">Voir plus</button>'
+        )
+    links = "".join(f'\n    <a class="{cls}" href="{_e(href)}" target="_blank">{label}</a>' for cls, href, label in actions)
+    return (
+        '<article class="card">'
+        f'\n  <div class="cover">{_cover_img(poster)}{badge}</div>'
+        f'\n  <div class="content">\n    <h3>{_e(title)}</h3>\n    <div class="meta">{meta}</div>{body}\n  </div>'
+        f'\n  <div class="actions">{links}\n  </div>'
+        '\n</article>'
+    )
+
+
+def _cgr(ev):
+    # Fiche légère : texte complet dans details/, chargé au clic sur "Voir plus"
+    full = ev.get("description") or ev.get("synopsis") or ("" if ev.get("details") else "—")
+    short = ev.get("excerpt") or " ".join(full.split(" ")[:30]) + "..."
+    meta = f"{_e(ev.get('cinema'))} · {_e(ev.get('genres') or 'Genres non précisés')} · {_e(ev.get('duration') or 'Durée inconnue')}"
+    return _card(
+        ev.get("poster") or ev.get("image"), ev.get("title"), meta,
+        [("ghost", ev.get("source"), "Site CGR"), ("btn", ev.get("source"), "Voir les horaires")],
+        badge='<div class="badge">Actuellement à l\'affiche</div>',
+        synopsis=(short, full),
+    )
+
+
+def _clean_arena_date(text):
+    if not text:
+        return ""
+    return re.sub(r"^.*?(dimanche|lundi|mardi|mercredi|jeudi|vendredi|samedi)", r"\1", text, count=1, flags=re.I)
+
+
+def _arena(ev):
+    return _card(
+        ev.get("poster") or ev.get("image"), ev.get("title"), f"Arena Futuroscope · {_e(_clean_arena_date(ev.get('date')))}",
+        [("ghost", ev.get("source"), "Plus d'infos"), ("btn", ev.get("reservation") or ev.get("source"), "Réserver")],
+    )
+
+
+def _republic(ev):
+    return _card(
+        ev.get("poster"), ev.get("title"), _e(ev.get("address") or "Espace Republic Corner, Poitiers"),
+        [("ghost", ev.get("source"), "Billetterie"), ("btn", ev.get("source"), "Réserver")],
+    )
+
+
+def _expo(ev):
+    return _card(
+        ev.get("poster"), ev.get("title"), "Parc Expo Grand Poitiers",
+        [("ghost", ev.get("source"), "Plus d'infos"), ("btn", ev.get("source"), "Voir")],
+    )
+
+
+def _with_dates(meta, ev):
+    """Ajoute la période de la première série ("Jusqu’au …" pour une expo en cours)."""
+    text = _occurrence_text((ev.get("occurrences") or [None])[0])
+    return f"{meta} · {_e(text)}" if text else meta
+
+
+def _tap(ev):
+    return _card(
+        ev.get("poster"), ev.get("title"), _with_dates(_e(ev.get("cinema")), ev),
+        [("ghost", ev.get("source"), "Plus d'infos"), ("btn", ev.get("source"), "Réserver")],
+    )
+
+
+def _confort_moderne(ev):
+    return _card(
+        ev.get("poster"), ev.get("title"), _with_dates("Confort Moderne", ev),
+        [("ghost", ev.get("source"), "Plus d'infos"), ("btn", ev.get("source"), "Réserver")],
+    )
+
+
+def _m3q(ev):
+    # Le badge J-X dépend du jour de consultation : rempli par le navigateur
+    badge = f'<div class="badge" data-until="{_e(ev["date"])}" style="display:none"></div>' if ev.get("date") else ""
+    description = ev.get("description") or ""
+    if ev.get("excerpt"):
+        summary = ev["excerpt"]
+    elif len(description) > 5:
+        summary = description
+    else:
+        summary = re.sub(r"→[^\n\r]*\Z", "", ev.get("subtitle") or "", count=1).strip()
+    meta = _e(ev.get("date_text")) + (f" · {_e(ev['time'])}" if ev.get("time") else "")
+    return _card(
+        ev.get("poster") or ev.get("image"), ev.get("title"), meta,
+        [("ghost", ev.get("source"), "Infos"), ("btn", ev.get("ticket") or ev.get("source"), "Billetterie")],
+        badge=badge,
+        synopsis=(summary, ev.get("subtitle") or description),
+    )
+
+
+def _format_day(iso):
+    if not iso:
+        return ""
+    y, m, d = iso[:10].split("-")
+    return f"{d}/{m}/{y}"
+
+
+def _occurrence_text(occ):
+    if not occ:
+        return ""
+    if occ.get("freq") == "weekly":
+        return f"Chaque semaine du {_format_day(occ['start'])} au {_format_day(occ['end'])}"
+    if occ.get("open") and not occ.get("end"):
+        return f"À partir du {_format_day(occ['start'])}"
+    if occ.get("start") and occ.get("end"):
+        return f"Du {_format_day(occ['start'])} au {_format_day(occ['end'])}"
+    if occ.get("end"):
+        return f"Jusqu’au {_format_day(occ['end'])}"
+    return _format_day(occ.get("start"))
+
+
+def _emf(ev):
+    occ = (ev.get("occurrences") or [None])[0]
+    return _card(
+        ev.get("img"), ev.get("title"), f"{_e(ev.get('category'))} · {_e(_occurrence_text(occ))}",
+        [("ghost", ev.get("url"), "Plus d'infos"), ("btn", ev.get("reservation") or ev.get("url"), "Billetterie")],
+        synopsis=(ev.get("excerpt") or ev.get("description") or "", ev.get("description") or ""),
+    )
+
+
+# Même ordre et mêmes critères que VENUES dans index.html
+VENUES = [
+    ("gridCGR", lambda ev: "CGR" in (ev.get("cinema") or ""), _cgr),
+    ("gridArena", lambda ev: "Arena" in (ev.get("cinema") or ""), _arena),
+    ("gridRC", lambda ev: "Republic" in (ev.get("cinema") or ""), _republic),
+    ("gridExpo", lambda ev: "Parc Expo" in (ev.get("cinema") or ""), _expo),
+    ("gridTAP", lambda ev: "TAP" in (ev.get("cinema") or ""), _tap),
+    ("gridCM", lambda ev: "Confort Moderne" in (ev.get("cinema") or ""), _confort_moderne),
+    ("gridM3Q", lambda ev: "Maison des 3 Quartiers" in (ev.get("cinema") or ""), _m3q),
+    ("gridEMF", lambda ev: ev.get("source") == "espace mendes france", _emf),
+]
+
+
+def venue_hash(events):
+    """Empreinte des événements d'un lieu (hors champs volatils)."""
+    stable = [{k: v for k, v in ev.items() if k not in VOLATILE_FIELDS} for ev in events]
+    payload = json.dumps([MARKUP_VERSION, stable], ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def card_key(ev):
+    """Même clé que eventKey() dans index.html."""
+    if ev.get("id"):
+        return ev["id"]
+    return "|".join(str(v or "") for v in (ev.get("cinema") or ev.get("source"), ev.get("url") or ev.get("source"), ev.get("title")))
+
+
+def render_section(events, card):
+    if not events:
+        return ""
+    cards, used = [], set()
+    for ev in events:
+        key = card_key(ev)
+        while key in used:
+            key += "+"
+        used.add(key)
+        attrs = f' data-id="{_e(key)}"' + (f' data-details="{_e(ev["details"])}"' if ev.get("details") else "")
+        cards.append(card(ev).replace('<article class="card">', f'<article class="card"{attrs}>', 1))
+    return "\n" + "\n".join(cards) + "\n"
+
+
+def update_page(events, path=PAGE_PATH):
+    """
+    Régénère dans la page les sections dont les événements ont changé.
+    Retourne la liste des grilles re-rendues (vide : fichier non réécrit).
+    """
+    with open(path, encoding="utf-8") as f:
+        page = f.read()
+
+    renderers = {grid_id: (match, card) for grid_id, match, card in VENUES}
+    rendered = []
+
+    def replace(m):
+        grid_id = m.group("id")
+        if grid_id not in renderers:
+            return m.group(0)
+        match, card = renderers[grid_id]
+        venue_events = [ev for ev in events if match(ev)]
+        digest = venue_hash(venue_events)
+        previous = _HASH_RE.search(m.group("attrs"))
+        if previous and previous.group(1) == digest:
+            return m.group(0)
+
+        rendered.append(grid_id)
+        return f'<section class="grid" id="{grid_id}" data-hash="{digest}">{render_section(venue_events, card)}</section>'
+
+    page = _SECTION_RE.sub(replace, page)
+    if rendered:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(page)
+    return rendered
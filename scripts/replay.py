@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Rejeu des scrapers contre un serveur local, avec latences et pannes injectées.
+
+1. Enregistrement (réseau réel) : toutes les réponses HTTP d'un run complet
+   (listing + enrichissement) sont écrites dans replay/<nom>/ :
+       python scripts/replay.py record
+2. Rejeu : un serveur HTTP local sert ces réponses ; les URLs des scrapers
+   sont réécrites vers lui (https://hôte/chemin → http://127.0.0.1:port/https/hôte/chemin)
+   et chaque hôte reçoit le comportement d'un profil (PROFILES ou fichier JSON) :
+       python scripts/replay.py run --profile slow-ticketing --runs 3
+
+Profil : {hôte ou suffixe d'hôte | "*": règles}, règles :
+    latency      {"median": s, "p95": s}   délai avant réponse (log-normale)
+    error_rate   part des requêtes en 5xx
+    hang_rate    part des requêtes qui s'arrêtent au milieu du corps...
+    hang         ...pendant ce nombre de secondes
+    bandwidth    débit du corps en octets/s
+
+Le rapport donne la durée de bout en bout, la durée et les erreurs de
+chaque source, et par hôte les percentiles p50 / p90 / p99 des requêtes.
+Limite : le rendu Chromium de CGR n'est pas rejoué, seule l'URL /movies
+qu'il a interceptée l'est (avec la latence de l'hôte CGR).
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urldefrag, urlsplit
+
+import requests
+
+REPLAY_DIR = "replay"
+
+_NOMINAL = {"latency": {"median": 0.08, "p95": 0.3}}
+
+PROFILES = {
+    # Comportement "sain" : sert de référence
+    "nominal": {"*": _NOMINAL},
+    # Billetteries lentes et capricieuses (pages détail Republic Corner)
+    "slow-ticketing": {
+        "*": _NOMINAL,
+        "shotgun.live": {"latency": {"median": 1.5, "p95": 6}, "error_rate": 0.1},
+        "weezevent.com": {"latency": {"median": 1.0, "p95": 4}, "error_rate": 0.1, "bandwidth": 50_000},
+    },
+    # API CGR qui décroche au milieu des réponses
+    "cgr-stall": {
+        "*": _NOMINAL,
+        "www.cgrcinemas.fr": {"latency": {"median": 0.5, "p95": 2}, "hang_rate": 0.5, "hang": 60},
+    },
+    # Un peu de tout, partout
+    "flaky": {"*": {"latency": {"median": 0.2, "p95": 2}, "error_rate": 0.05, "hang_rate": 0.02, "hang": 30}},
+}
+
+_BROWSER_PREFIX = "browser:"
+
+
+# =========================================================
+# 📼 ENREGISTREMENTS
+# =========================================================
+def recording_key(url):
+    """
+    Clé d'enregistrement d'une URL : sans fragment, qui n'est jamais envoyé
+    au serveur (les pages jour d'EMF, .../le-programme/#s=&date=..., sont
+    une seule et même requête).
+    """
+    return urldefrag(url)[0]
+
+
+class Recording:
+    """replay/<nom>/index.json : {url sans fragment: {"file", "status", "content_type"}} + corps en fichiers."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        try:
+            with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        # Enregistrements antérieurs, dont les clés gardaient le fragment
+        self.index = {}
+        for url, entry in index.items():
+            self.index.setdefault(recording_key(url), entry)
+
+    def add(self, url, status, content_type, body):
+        key = recording_key(url)
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest() + ".bin"
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name), "wb") as f:
+                f.write(body)
+            self.index[key] = {"file": name, "status": status, "content_type": content_type}
+
+    def get(self, url):
+        entry = self.index.get(recording_key(url))
+        if entry is None:
+            return None
+        with open(os.path.join(self.directory, entry["file"]), "rb") as f:
+            return entry, f.read()
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "index.json"), "w", encoding="utf-8") as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+# =========================================================
+# 🎛️ PROFILS
+# =========================================================
+def load_profile(name_or_path):
+    if name_or_path in PROFILES:
+        return PROFILES[name_or_path]
+    with open(name_or_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def rules_for(profile, host):
+    """Règles de l'hôte : entrée exacte, sinon plus long suffixe, sinon "*"."""
+    if host in profile:
+        return profile[host]
+    suffixes = [key for key in profile if key != "*" and host.endswith("." + key)]
+    if suffixes:
+        return profile[max(suffixes, key=len)]
+    return profile.get("*", {})
+
+
+def sample_latency(rules, rng):
+    latency = rules.get("latency")
+    if not latency:
+        return 0.0
+    median = latency["median"]
+    # Log-normale : médiane et p95 donnés (z(0,95) = 1,645)
+    sigma = math.log(max(latency.get("p95", median), median) / median) / 1.645 if median > 0 else 0
+    return median * math.exp(rng.gauss(0, sigma)) if sigma else median
+
+
+# =========================================================
+# 🖥️ SERVEUR
+# =========================================================
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.replay.serve(self)
+
+    def log_message(self, *args):
+        pass
+
+
+class ReplayServer:
+    def __init__(self, recording, profile, seed=0):
+        self.recording = recording
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.replay = self
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def rewrite(self, url):
+        parts = urlsplit(url)
+        query = f"?{parts.query}" if parts.query else ""
+        return f"{self.base}/{parts.scheme}/{parts.netloc}{parts.path or '/'}{query}"
+
+    def draw(self, host):
+        """Tirage du comportement d'une requête : (latence, erreur ?, blocage ?, règles)."""
+        rules = rules_for(self.profile, host)
+        with self.rng_lock:
+            return (
+                sample_latency(rules, self.rng),
+                self.rng.random() < rules.get("error_rate", 0),
+                self.rng.random() < rules.get("hang_rate", 0),
+                rules,
+            )
+
+    def serve(self, handler):
+        scheme, _, rest = handler.path.lstrip("/").partition("/")
+        url = f"{scheme}://{rest}"
+        host = urlsplit(url).hostname or ""
+        latency, error, hang, rules = self.draw(host)
+        time.sleep(latency)
+
+        found = self.recording.get(url)
+        if error or found is None:
+            body = b"injected error" if error else b"not recorded"
+            with self.rng_lock:
+                status = self.rng.choice((500, 502, 503, 504)) if error else 404
+            handler.send_response(status)
+            handler.send_header("Content-Length", str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+            return
+
+        entry, body = found
+        handler.send_response(entry["status"])
+        handler.send_header("Content-Type", entry.get("content_type") or "application/octet-stream")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        try:
+            if hang:
+                # Corps coupé en deux : le client attend la suite jusqu'à son timeout
+                handler.wfile.write(body[: len(body) // 2])
+                handler.wfile.flush()
+                time.sleep(rules.get("hang", 30))
+                handler.close_connection = True
+                return
+            bandwidth = rules.get("bandwidth")
+            if not bandwidth:
+                handler.wfile.write(body)
+                return
+            chunk = max(1024, bandwidth // 10)
+            for i in range(0, len(body), chunk):
+                handler.wfile.write(body[i:i + chunk])
+                handler.wfile.flush()
+                time.sleep(len(body[i:i + chunk]) / bandwidth)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # le client a abandonné (timeout)
+
+
+# =========================================================
+# 🔌 BRANCHEMENT DES SCRAPERS
+# =========================================================
+class Trace:
+    """Durée et issue de chaque requête, par hôte d'origine."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}  # hôte → [(durée, issue)]
+
+    def add(self, host, duration, outcome):
+        with self.lock:
+            self.requests.setdefault(host, []).append((duration, outcome))
+
+
+@contextmanager
+def patched(server=None, recording=None, trace=None):
+    """
+    Redirige requests (Session.send) vers le serveur de rejeu, ou enregistre
+    les réponses réelles ; idem pour l'URL /movies interceptée par Chromium (CGR).
+    """
+    from scrapers import cgr
+
+    original_send = requests.Session.send
+    original_discover = cgr.discover_movies_url
+    depth = threading.local()
+
+    def send(self, request, **kwargs):
+        url = request.url
+        host = urlsplit(url).hostname or ""
+        outer = not getattr(depth, "value", 0)
+        if server is not None and outer:
+            request = request.copy()
+            request.url = server.rewrite(url)
+        depth.value = getattr(depth, "value", 0) + 1
+        start = time.monotonic()
+        try:
+            response = original_send(self, request, **kwargs)
+            if outer and recording is not None:
+                # Redirections suivies : la réponse finale est servie pour l'URL demandée
+                recording.add(url, response.status_code, response.headers.get("Content-Type"), response.content)
+        except Exception as e:
+            if outer and trace is not None:
+                trace.add(host, time.monotonic() - start, type(e).__name__)
+            raise
+        finally:
+            depth.value -= 1
+        if outer and trace is not None:
+            trace.add(host, time.monotonic() - start, response.status_code)
+        return response
+
+    def discover(cinema_name, url, assets=None):
+        if server is None:
+            intercepted = original_discover(cinema_name, url, assets)
+            if recording is not None and intercepted:
+                recording.add(_BROWSER_PREFIX + url, 200, "text/plain", intercepted.encode("utf-8"))
+            return intercepted
+        start = time.monotonic()
+        latency, error, _, _ = server.draw(urlsplit(url).hostname or "")
+        time.sleep(latency)
+        found = None if error else server.recording.get(_BROWSER_PREFIX + url)
+        if trace is not None:
+            trace.add("chromium", time.monotonic() - start, 200 if found else "absent")
+        return found[1].decode("utf-8") if found else None
+
+    requests.Session.send = send
+    cgr.discover_movies_url = discover
+    try:
+        yield
+    finally:
+        requests.Session.send = original_send
+        cgr.discover_movies_url = original_discover
+
+
+def _reset_caches():
+    """Caches en mémoire et sur disque des scrapers : chaque run refait toutes ses requêtes."""
+    from scrapers import enrichment_cache, structured_data, wp_discovery
+
+    structured_data._CACHE.clear()
+    structured_data._ALIASES.clear()
+    wp_discovery._LASTMODS.clear()
+    enrichment_cache.CACHE_PATH = os.path.join(tempfile.mkdtemp(prefix="replay-"), "enrichment.json")
+
+
+def run_aggregation():
+    """Listing puis enrichissement, comme aggregator.py --phase all, sans rien publier."""
+    import aggregator
+
+    _reset_caches()
+    listed, stats = aggregator.collect(enrich=False)
+    aggregator.enrich_all(listed, stats)
+    return listed, stats
+
+
+# =========================================================
+# 📊 RAPPORT
+# =========================================================
+def percentile(values, q):
+    """Percentile au rang le plus proche (values triées)."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+
+
+def report(runs, trace):
+    import aggregator
+
+    totals = sorted(duration for duration, _ in runs)
+    print(f"\n⏱️ Bout en bout : médiane {percentile(totals, 50):.1f}s, max {totals[-1]:.1f}s ({len(totals)} runs)")
+
+    print("\n📦 Sources (dernier run) :")
+    stats = runs[-1][1]
+    for source in aggregator.SOURCES:
+        s = stats.get(source["key"], {})
+        error = f" ❌ {s['error']}" if s.get("error") else ""
+        print(f"   {source['label']} : {s.get('count', 0)} événements en {s.get('duration', 0):.1f}s{error}")
+
+    print("\n🌐 Requêtes par hôte (tous runs) :")
+    print(f"   {'hôte':<34} {'n':>5} {'p50':>7} {'p90':>7} {'p99':>7} {'max':>7}  échecs")
+    for host, entries in sorted(trace.requests.items()):
+        durations = sorted(d for d, _ in entries)
+        failures = sum(1 for _, outcome in entries if not (isinstance(outcome, int) and outcome < 400))
+        print(
+            f"   {host:<34} {len(entries):>5} {percentile(durations, 50):>6.2f}s {percentile(durations, 90):>6.2f}s"
+            f" {percentile(durations, 99):>6.2f}s {durations[-1]:>6.2f}s  {failures}"
+        )
+
+
+# =========================================================
+# CLI
+# =========================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enregistre puis rejoue les requêtes des scrapers avec pannes injectées")
+    parser.add_argument("command", choices=("record", "run"))
+    parser.add_argument("--dir", default=os.path.join(REPLAY_DIR, "default"), help="dossier des enregistrements")
+    parser.add_argument("--profile", default="nominal", help=f"profil ({', '.join(PROFILES)}) ou fichier JSON")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0, help="graine des tirages (latences, pannes)")
+    args = parser.parse_args(argv)
+
+    recording = Recording(args.dir)
+    if args.command == "record":
+        with patched(recording=recording):
+            run_aggregation()
+        recording.save()
+        print(f"\n📼 {len(recording.index)} réponses enregistrées dans {args.dir}/")
+        return
+
+    if not recording.index:
+        parser.error(f"aucun enregistrement dans {args.dir}/ (lancer d'abord : replay.py record)")
+    server = ReplayServer(recording, load_profile(args.profile), args.seed).start()
+    trace = Trace()
+    runs = []
+    try:
+        with patched(server=server, trace=trace):
+            for i in range(args.runs):
+                print(f"\n▶️ Run {i + 1}/{args.runs} (profil {args.profile})")
+                start = time.monotonic()
+                _, stats = run_aggregation()
+                runs.append((time.monotonic() - start, stats))
+    finally:
+        server.stop()
+    report(runs, trace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# coding: utf-8
+"""
+Exécution isolée des sources : un processus enfant par source.
+
+Chaque enfant applique ses limites (resource.setrlimit) avant d'importer les
+scrapers, exécute aggregator.run_source() puis renvoie au parent, par un
+pipe, un seul message compact (JSON compressé zlib) :
+    {"events": [...], "stats": {"count", "duration", "error"}, "usage": {...}}
+L'enrichissement (pages détail, source["enrich"]) passe lui aussi par un
+enfant limité, qui reçoit les fiches de listing et les renvoie complétées.
+Le parent tue l'enfant qui dépasse son délai. Un Chromium qui s'emballe,
+une regex pathologique ou une page énorme ne coûtent que leur source.
+
+Configuration (variables d'environnement, surchargées par source dans LIMITS) :
+    SANDBOX_MEMORY_MB=1024   espace d'adressage (RLIMIT_AS), 0 = illimité
+    SANDBOX_CPU_SECONDS=300  temps CPU (RLIMIT_CPU), 0 = illimité
+    SANDBOX_TIMEOUT=600      délai réel avant kill, en secondes
+    SANDBOX_PARALLEL=2       sources exécutées en même temps
+"""
+import json
+import multiprocessing
+import os
+import signal
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource  # POSIX uniquement
+except ImportError:
+    resource = None
+
+DEFAULTS = {
+    "memory_mb": int(os.environ.get("SANDBOX_MEMORY_MB", 1024)),
+    "cpu_seconds": int(os.environ.get("SANDBOX_CPU_SECONDS", 300)),
+    "timeout": float(os.environ.get("SANDBOX_TIMEOUT", 600)),
+}
+PARALLEL = int(os.environ.get("SANDBOX_PARALLEL", 2))
+
+# Chromium réserve des dizaines de Go d'espace d'adressage virtuel sans les
+# utiliser : RLIMIT_AS l'empêcherait de démarrer, seul le délai borne CGR.
+LIMITS = {
+    "cgr": {"memory_mb": 0},
+}
+
+
+def limits_for(key) -> dict:
+    return {**DEFAULTS, **LIMITS.get(key, {})}
+
+
+def _apply_limits(limits):
+    if resource is None:
+        return
+    if limits["memory_mb"]:
+        size = limits["memory_mb"] * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (size, size))
+    if limits["cpu_seconds"]:
+        # SIGXCPU à la limite douce, SIGKILL 5 s plus tard
+        resource.setrlimit(resource.RLIMIT_CPU, (limits["cpu_seconds"], limits["cpu_seconds"] + 5))
+
+
+def _usage():
+    """Ressources consommées par l'enfant et ses propres enfants (navigateur)."""
+    if resource is None:
+        return {}
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "cpu": round(own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime, 2),
+        # ru_maxrss est en Ko sous Linux
+        "max_rss_mb": round(max(own.ru_maxrss, children.ru_maxrss) / 1024, 1),
+    }
+
+
+def _pack(payload) -> bytes:
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data))
+
+
+def _reply(conn, payload, fallback):
+    """Envoie la réponse de l'enfant ; fallback si elle ne tient pas en mémoire."""
+    try:
+        data = _pack(payload)
+    except MemoryError:
+        data = _pack(fallback)
+    conn.send_bytes(data)
+    conn.close()
+
+
+def _load_source(key):
+    import aggregator  # importe tous les scrapers (Playwright compris)
+    from scrapers import pipeline
+
+    # Parsing dans l'enfant lui-même : ses limites couvrent tout le travail
+    pipeline.configure(0)
+    return next(s for s in aggregator.SOURCES if s["key"] == key)
+
+
+def _child(key, enrich, limits, conn):
+    """Point d'entrée de l'enfant de listing (niveau module : démarrage en "spawn")."""
+    _apply_limits(limits)
+    events, stats = [], {"count": 0, "duration": 0.0, "error": None}
+    try:
+        import aggregator
+
+        stats = aggregator.run_source(_load_source(key), events.append, enrich)
+    except MemoryError:
+        stats["error"] = "mémoire épuisée"
+    except Exception as e:
+        stats["error"] = str(e)
+
+    _reply(
+        conn,
+        {"events": events, "stats": stats, "usage": _usage()},
+        {"events": [], "stats": dict(stats, error="mémoire épuisée"), "usage": {}},
+    )
+
+
+def _enrich_child(key, limits, conn):
+    """Point d'entrée de l'enfant d'enrichissement : reçoit les fiches, les complète, les renvoie."""
+    _apply_limits(limits)
+    events, error = [], None
+    try:
+        events = _unpack(conn.recv_bytes())
+        _load_source(key)["enrich"](events)
+    except MemoryError:
+        error = "mémoire épuisée"
+    except Exception as e:
+        error = str(e)
+
+    # Fiches éventuellement enrichies en partie avant l'erreur, comme en processus unique
+    _reply(conn, {"events": events, "error": error, "usage": _usage()}, {"events": None, "error": "mémoire épuisée", "usage": {}})
+
+
+def _exit_reason(exitcode):
+    if exitcode is None or exitcode >= 0:
+        return f"code de sortie {exitcode}"
+    try:
+        return f"signal {signal.Signals(-exitcode).name}"
+    except ValueError:
+        return f"signal {-exitcode}"
+
+
+def _exchange(name, target, args, limits, payload=None):
+    """
+    Exécute target(*args, limits, conn) dans un enfant "spawn", lui envoie
+    payload s'il y en a un, puis attend sa réponse au plus limits["timeout"]
+    secondes ; retourne (réponse, erreur), réponse None en cas d'échec.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe(duplex=payload is not None)
+    process = ctx.Process(target=target, args=(*args, limits, child_conn), name=name, daemon=True)
+    process.start()
+    child_conn.close()
+
+    result = None
+    error = None
+    try:
+        if payload is not None:
+            parent_conn.send_bytes(_pack(payload))
+        # Lecture avant join() : un gros message bloquerait l'enfant sur le pipe
+        if parent_conn.poll(limits["timeout"]):
+            result = _unpack(parent_conn.recv_bytes())
+        elif process.is_alive():
+            error = f"délai de {limits['timeout']:.0f}s dépassé, processus tué"
+    except (EOFError, ConnectionError):
+        pass  # l'enfant est mort sans rien envoyer (ou sans tout lire)
+    finally:
+        if error is None:
+            process.join(1)  # enfant en train de se terminer : on garde son vrai code de sortie
+        if process.is_alive():
+            process.kill()
+        process.join()
+        parent_conn.close()
+
+    if result is None:
+        error = error or f"processus interrompu ({_exit_reason(process.exitcode)})"
+    return result, error
+
+
+def run(source, enrich=True, limits=None):
+    """
+    Exécute une source dans un processus enfant limité ;
+    retourne (événements, statistiques). Les statistiques ont en plus
+    "usage" (cpu, max_rss_mb) quand l'enfant a pu les envoyer.
+    """
+    limits = limits or limits_for(source["key"])
+    start = time.monotonic()
+    result, error = _exchange(f"source-{source['key']}", _child, (source["key"], enrich), limits)
+    duration = time.monotonic() - start
+    if result is None:
+        print(f"❌ {source['name']} : {error}")
+        return [], {"count": 0, "duration": duration, "error": error, "usage": {}}
+
+    stats = dict(result["stats"], duration=duration, usage=result["usage"])
+    return result["events"], stats
+
+
+def enrich(source, events, limits=None):
+    """
+    Enrichit les fiches d'une source (source["enrich"], pages détail) dans un
+    processus enfant limité ; retourne (fiches, erreur, usage). En cas
+    d'échec de l'enfant, les fiches de listing sont rendues telles quelles.
+    """
+    limits = limits or limits_for(source["key"])
+    result, error = _exchange(f"enrich-{source['key']}", _enrich_child, (source["key"],), limits, payload=events)
+    if result is None or result["events"] is None:
+        return events, error or result["error"], {}
+    return result["events"], result["error"], result["usage"]
+
+
+def collect(sources, enrich=True, parallel=PARALLEL):
+    """Exécute les sources dans des enfants isolés ; retourne ({source: événements}, {source: statistiques})."""
+    listed, stats = {}, {}
+
+    def run_one(source):
+        return source, run(source, enrich)
+
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        for source, (events, source_stats) in pool.map(run_one, sources):
+            listed[source["key"]] = events
+            stats[source["key"]] = source_stats
+
+    print("\n🧱 RESSOURCES PAR SOURCE (processus isolés) :")
+    for source in sources:
+        s = stats[source["key"]]
+        usage = s.get("usage") or {}
+        line = f"   {source['label']} : {s['duration']:.1f}s"
+        if usage:
+            line += f", CPU {usage['cpu']:.1f}s, RSS max {usage['max_rss_mb']:.0f} Mo"
+        if s.get("error"):
+            line += f" ❌ {s['error']}"
+        print(line)
+    return listed, stats
@@ -1,8 +1,24 @@
 import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
 import json
 
+from scrapers import ids, listing
+
+SPEC = {
+    "region": {"name": "div", "class": "main-card"},
+    "card": "div.card.main-card",
+    "fields": {
+        "title": {"select": ".card__title", "default": "Sans titre"},
+        "date": {"select": ".card__meta"},
+        "datetime": {"select": "time", "attr": "datetime"},
+        "poster": {"select": ".card__block-image img", "attr": "src"},
+        # Lien “plus d’infos”
+        "source": {"select": "a.stretch-link", "attr": "href"},
+        # Lien “réserver”
+        "reservation": {"select": "a.btn-resa-meeting, a.btn-resa-manifestation", "attr": "href"},
+    },
+}
+
 def scrape_arena():
     url = "https://www.arena-futuroscope.com/la-programmation/"
     print(f"🎤 Scraping {url} ...")
@@ -16,50 +32,32 @@ def scrape_arena():
         print(f"❌ Erreur HTTP {response.status_code}")
         return []
 
-    soup = BeautifulSoup(response.text, "html.parser")
     events = []
 
-    cards = soup.select("div.card.main-card")
+    cards = listing.extract(response.content, SPEC)
     print(f"✅ {len(cards)} événements trouvés")
 
     for card in cards:
         try:
-            title = card.select_one(".card__title")
-            title = title.get_text(strip=True) if title else "Sans titre"
-
             # Date et heure
-            meta = card.select_one(".card__meta")
-            date_text = meta.get_text(strip=True) if meta else ""
-            date_iso = None
-            if meta and "datetime" in card.select_one("time", default={}).attrs:
-                date_iso = card.select_one("time")["datetime"]
-            else:
+            date_text = card["date"] or ""
+            date_iso = card["datetime"]
+            if not date_iso:
                 # Tentative de parsing manuel
                 try:
                     date_iso = datetime.strptime(date_text.split("-")[0].strip(), "%d %B %Y").isoformat()
                 except Exception:
                     date_iso = None
 
-            # Image
-            img_tag = card.select_one(".card__block-image img")
-            img = img_tag["src"] if img_tag else None
-
-            # Lien “plus d’infos”
-            info_link = card.select_one("a.stretch-link")
-            info_link = info_link["href"] if info_link else None
-
-            # Lien “réserver”
-            reserve_btn = card.select_one("a.btn-resa-meeting, a.btn-resa-manifestation")
-            reserve_link = reserve_btn["href"] if reserve_btn else None
-
             events.append({
-                "title": title,
+                "id": ids.make_id("Arena Futuroscope", ref=card["source"], title=card["title"], start=date_iso),
+                "title": card["title"],
                 "date": date_text,
                 "release": date_iso,
-                "poster": img,
+                "poster": card["poster"],
                 "cinema": "Arena Futuroscope",
-                "source": info_link,
-                "reservation": reserve_link,
+                "source": card["source"],
+                "reservation": card["reservation"],
                 "scraped_at": datetime.now().isoformat()
             })
 
@@ -0,0 +1,177 @@
+# scrapers/asset_cache.py
+"""
+Cache disque des ressources statiques pour les chargements Playwright.
+
+    cache = AssetCache("cgrcinemas.fr")
+    context.route("**/*", cache.handle)
+    ...
+    cache.save()
+
+Pour chaque requête du navigateur :
+  - document et appels d'API du site : réseau, sans changement ;
+  - ressources statiques du site (scripts, CSS, page-data/app-data JSON) :
+    servies depuis .cache/assets/ (stockage par empreinte SHA-256) ;
+    les fichiers à empreinte dans le nom (chunks Gatsby) sont immuables,
+    les autres sont revalidés une fois par run (If-None-Match / If-Modified-Since) ;
+  - tout le reste (images, polices, médias, domaines tiers) : bloqué.
+
+À la fin du run, save() ne garde que les ressources demandées pendant ce
+run : les chunks d'un ancien déploiement ne s'accumulent pas dans le cache.
+
+CGR_ASSET_CACHE=0 désactive le cache (chargement complet, débogage).
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from urllib.parse import urlsplit
+
+CACHE_DIR = os.environ.get("ASSET_CACHE_DIR", os.path.join(".cache", "assets"))
+ENABLED = os.environ.get("CGR_ASSET_CACHE", "1") != "0"
+
+STATIC_TYPES = ("script", "stylesheet")
+BLOCKED_TYPES = ("image", "media", "font", "texttrack", "manifest", "websocket", "eventsource", "other")
+# Nom de fichier avec empreinte : app-3f2a9c1b7e4d.js, 123-4f5e6d7c8b9a.css, styles.0a1b2c3d.css
+_HASHED_RE = re.compile(r"[-.][0-9a-f]{8,}\.(?:js|css|mjs)$")
+_DATA_RE = re.compile(r"/(?:page-data/.*\.json|app-data\.json)$")
+
+
+class AssetCache:
+    def __init__(self, site, directory=CACHE_DIR):
+        self.site = site
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock = threading.Lock()
+        self.validated = set()   # URLs revalidées pendant ce run
+        self.requested = set()   # ressources statiques demandées pendant ce run
+        self.stats = {"hit": 0, "fetched": 0, "network": 0, "blocked": 0}
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    # --- Stockage par empreinte ---
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _read(self, entry):
+        """Corps en cache, None s'il manque ou ne correspond plus à son empreinte."""
+        try:
+            with open(self._blob_path(entry["sha256"]), "rb") as f:
+                body = f.read()
+        except OSError:
+            return None
+        return body if hashlib.sha256(body).hexdigest() == entry["sha256"] else None
+
+    def _store(self, url, body, headers):
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        with self.lock:
+            self.index[url] = {
+                "sha256": digest,
+                "content_type": headers.get("content-type"),
+                "etag": headers.get("etag"),
+                "last_modified": headers.get("last-modified"),
+            }
+
+    # --- Classement des requêtes ---
+    def _first_party(self, url):
+        host = urlsplit(url).hostname or ""
+        return host == self.site or host.endswith("." + self.site)
+
+    def is_static(self, request):
+        if not self._first_party(request.url):
+            return False
+        path = urlsplit(request.url).path
+        return request.resource_type in STATIC_TYPES or bool(_DATA_RE.search(path))
+
+    def is_blocked(self, request):
+        if request.resource_type == "document":
+            return False
+        return request.resource_type in BLOCKED_TYPES or not self._first_party(request.url)
+
+    # --- Gestionnaire de route Playwright ---
+    def handle(self, route, request):
+        try:
+            if self.is_blocked(request):
+                self.stats["blocked"] += 1
+                return route.abort()
+            if not self.is_static(request):
+                self.stats["network"] += 1
+                return route.continue_()
+            self._serve_static(route, request)
+        except Exception as e:
+            print(f"⚠️ Cache d'assets ({request.url}) : {e}")
+            try:
+                route.continue_()
+            except Exception:
+                pass
+
+    def _fulfill(self, route, entry, body):
+        headers = {"content-type": entry["content_type"]} if entry.get("content_type") else {}
+        route.fulfill(status=200, headers=headers, body=body)
+
+    def _serve_static(self, route, request):
+        url = request.url
+        with self.lock:
+            self.requested.add(url)
+        entry = self.index.get(url)
+        body = self._read(entry) if entry else None
+        immutable = bool(_HASHED_RE.search(urlsplit(url).path))
+
+        if body is not None and (immutable or url in self.validated):
+            self.stats["hit"] += 1
+            return self._fulfill(route, entry, body)
+
+        # Revalidation (ou premier téléchargement)
+        headers = dict(request.headers)
+        if body is not None:
+            if entry.get("etag"):
+                headers["if-none-match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["if-modified-since"] = entry["last_modified"]
+        response = route.fetch(headers=headers)
+        self.validated.add(url)
+
+        if response.status == 304 and body is not None:
+            self.stats["hit"] += 1
+            return self._fulfill(route, entry, body)
+
+        self.stats["fetched"] += 1
+        if response.ok:
+            self._store(url, response.body(), response.headers)
+        route.fulfill(response=response)
+
+    # --- Fin de run ---
+    def save(self):
+        """
+        Écrit l'index, limité aux ressources demandées pendant ce run (les
+        chunks des déploiements précédents en sortent), et supprime les
+        fichiers qu'il ne référence plus. Un run sans aucune ressource
+        demandée (site en maintenance, navigation en échec) ne purge rien.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock:
+            if self.requested:
+                self.index = {url: entry for url, entry in self.index.items() if url in self.requested}
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.index, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.index_path)
+            referenced = {entry["sha256"] for entry in self.index.values()}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if len(name) == 64 and name not in referenced:
+                    os.remove(os.path.join(root, name))
+
+    def summary(self):
+        s = self.stats
+        return f"{s['hit']} en cache, {s['fetched']} téléchargés, {s['network']} vers le réseau, {s['blocked']} bloqués"
@@ -1,8 +1,10 @@
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 import requests
 import re
 from datetime import datetime
 
+from scrapers import asset_cache, ids
+
 
 CGR_CINEMAS = {
     "CGR Buxerolles": "https://www.cgrcinemas.fr/horaire-film/p0736-cgr-buxerolles-poitiers/",
@@ -11,104 +13,126 @@ CGR_CINEMAS = {
 }
 
 
+MOVIES_API = "/api/gatsby-source-boxofficeapi/movies"
+# Délai maximal (navigation comprise) avant l'apparition de la requête /movies
+MOVIES_TIMEOUT_MS = 30000
+
+
 def extract_movie_ids_from_request(url: str):
     """Extrait tous les ids= depuis l'URL de la requête /movies"""
     return re.findall(r"ids=(\d+)", url)
 
 
-def scrape_cinema(cinema_name, url):
-    """Intercepte la requête /movies pour récupérer les IDs dynamiques"""
-    print(f"\n🎬 {cinema_name}...")
+def discover_movies_url(cinema_name, url, assets=None):
+    """
+    Ouvre la page horaires dans Chromium et retourne l'URL de la requête /movies (None si absente).
+    assets : AssetCache servant les bundles Gatsby depuis le disque (le reste est bloqué).
+    """
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        context = browser.new_context()
+        if assets is not None:
+            context.route("**/*", assets.handle)
+        page = context.new_page()
+
+        intercepted_url = None
+        try:
+            # ✅ on rend la main dès que la requête /movies part (plus d'attente fixe)
+            with page.expect_request(lambda request: MOVIES_API in request.url, timeout=MOVIES_TIMEOUT_MS) as request_info:
+                try:
+                    # on attend seulement que le DOM soit prêt (pas le réseau complet)
+                    page.goto(url, wait_until="domcontentloaded", timeout=45000)
+                except Exception as e:
+                    print(f"⚠️ Erreur de navigation ({cinema_name}) : {e}")
+            intercepted_url = request_info.value.url
+        except PlaywrightTimeoutError:
+            pass  # pas de requête /movies dans le délai : signalé par scrape_cinema()
 
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context()
-            page = context.new_page()
+        # On vérifie la page obtenue pour déboguer au besoin
+        current_url = page.url
+        if "maintenance" in current_url.lower():
+            print(f"⚠️ {cinema_name} redirigé vers maintenance ({current_url})")
 
-            movie_ids = []
-            intercepted_url = None
+        browser.close()
+        return intercepted_url
 
-            def on_request(request):
-                nonlocal movie_ids, intercepted_url
-                if "/api/gatsby-source-boxofficeapi/movies" in request.url:
-                    intercepted_url = request.url
-                    movie_ids = extract_movie_ids_from_request(request.url)
 
-            page.on("request", on_request)
+def scrape_cinema(cinema_name, url, assets=None):
+    """Intercepte la requête /movies pour récupérer les IDs dynamiques"""
+    print(f"\n🎬 {cinema_name}...")
 
+    try:
+        intercepted_url = discover_movies_url(cinema_name, url, assets)
+        movie_ids = extract_movie_ids_from_request(intercepted_url) if intercepted_url else []
+        if not movie_ids:
+            print(f"⚠️ Aucune requête /movies interceptée pour {cinema_name}")
+            return []
+
+        print(f"✅ {len(movie_ids)} IDs détectés → {movie_ids[:5]}...")
+
+        # --- Requête API directe ---
+        params = [("ids", mid) for mid in movie_ids]
+        res = requests.get(
+            "https://www.cgrcinemas.fr/api/gatsby-source-boxofficeapi/movies",
+            params=[("basic", "false"), ("castingLimit", "3")] + params,
+            headers={"User-Agent": "Mozilla/5.0"},
+            timeout=30
+        )
+
+        if res.status_code != 200:
+            print(f"❌ Erreur API ({res.status_code}) pour {cinema_name}")
+            return []
+
+        data = res.json()
+        movies = []
+
+        for m in data:
             try:
-                # ✅ on attend seulement que le DOM soit prêt (pas le réseau complet)
-                page.goto(url, wait_until="domcontentloaded", timeout=45000)
+                duration_seconds = m.get("runtime") or 0
+                duration = f"{int(duration_seconds)//60} min" if duration_seconds else "Inconnue"
+
+                movies.append({
+                    # Identifiant boxoffice du film (le même film a un id par cinéma)
+                    "id": ids.make_id(cinema_name, ref=f"cgr:{m['id']}" if m.get("id") else None,
+                                      title=m.get("title"), start=m.get("release")),
+                    "title": m.get("title"),
+                    "duration": duration,
+                    "description": m.get("synopsis") or m.get("locale", {}).get("synopsis"),
+                    "poster": m.get("poster"),
+                    "genres": m.get("genres"),
+                    "certificate": m.get("certificate"),
+                    "release": m.get("release"),
+                    "cinema": cinema_name,
+                    "source": url,
+                    "scraped_at": datetime.now().isoformat()
+                })
             except Exception as e:
-                print(f"⚠️ Erreur de navigation ({cinema_name}) : {e}")
-
-            print("⏳ Attente du rendu dynamique (8s)...")
-            page.wait_for_timeout(8000)
+                print(f"⚠️ Erreur sur un film ({cinema_name}): {e}")
+                continue
 
-            # On capture le contenu pour déboguer au besoin
-            current_url = page.url
-            if "maintenance" in current_url.lower():
-                print(f"⚠️ {cinema_name} redirigé vers maintenance ({current_url})")
-
-            browser.close()
-
-            if not intercepted_url or not movie_ids:
-                print(f"⚠️ Aucune requête /movies interceptée pour {cinema_name}")
-                return []
-
-            print(f"✅ {len(movie_ids)} IDs détectés → {movie_ids[:5]}...")
-
-            # --- Requête API directe ---
-            params = [("ids", mid) for mid in movie_ids]
-            res = requests.get(
-                "https://www.cgrcinemas.fr/api/gatsby-source-boxofficeapi/movies",
-                params=[("basic", "false"), ("castingLimit", "3")] + params,
-                headers={"User-Agent": "Mozilla/5.0"},
-                timeout=30
-            )
-
-            if res.status_code != 200:
-                print(f"❌ Erreur API ({res.status_code}) pour {cinema_name}")
-                return []
-
-            data = res.json()
-            movies = []
-
-            for m in data:
-                try:
-                    duration_seconds = m.get("runtime") or 0
-                    duration = f"{int(duration_seconds)//60} min" if duration_seconds else "Inconnue"
-
-                    movies.append({
-                        "title": m.get("title"),
-                        "duration": duration,
-                        "description": m.get("synopsis") or m.get("locale", {}).get("synopsis"),
-                        "poster": m.get("poster"),
-                        "genres": m.get("genres"),
-                        "certificate": m.get("certificate"),
-                        "release": m.get("release"),
-                        "cinema": cinema_name,
-                        "source": url,
-                        "scraped_at": datetime.now().isoformat()
-                    })
-                except Exception as e:
-                    print(f"⚠️ Erreur sur un film ({cinema_name}): {e}")
-                    continue
-
-            print(f"🎞️ {len(movies)} films récupérés pour {cinema_name}")
-            return movies
+        print(f"🎞️ {len(movies)} films récupérés pour {cinema_name}")
+        return movies
 
     except Exception as e:
         print(f"❌ Erreur sur {cinema_name}: {e}")
         return []
 
 
-def scrape():
-    """Scrape tous les cinémas CGR avec interception dynamique"""
+def scrape(cinemas=None):
+    """
+    Scrape tous les cinémas CGR avec interception dynamique.
+    cinemas : {nom: URL de la page horaires} (défaut : CGR_CINEMAS, Poitiers)
+    """
+    # Bundles Gatsby identiques d'un cinéma à l'autre : un seul cache pour le run
+    assets = asset_cache.AssetCache("cgrcinemas.fr") if asset_cache.ENABLED else None
     all_movies = []
-    for cinema_name, url in CGR_CINEMAS.items():
-        all_movies += scrape_cinema(cinema_name, url)
+    try:
+        for cinema_name, url in (cinemas or CGR_CINEMAS).items():
+            all_movies += scrape_cinema(cinema_name, url, assets)
+    finally:
+        if assets is not None:
+            print(f"📦 Assets CGR : {assets.summary()}")
+            assets.save()
     return all_movies
 
 
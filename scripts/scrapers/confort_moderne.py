@@ -1,10 +1,12 @@
-import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
 import json
 import re
 import locale
 
+from scrapers import enrichment_cache, ids, listing, occurrences, pipeline, structured_data
+from scrapers.french_dates import SeasonClock, is_open_ended, month_number, parse_date_range, to_iso
+
 # Force locale française (si dispo)
 try:
     locale.setlocale(locale.LC_TIME, "fr_FR.UTF-8")
@@ -39,139 +41,188 @@ def normalize_date_from_text(date_text: str):
         return None
 
 
-def normalize_date(day_text: str, month_text: str):
-    """Convertit un jour et un mois français en date ISO (page principale)."""
-    if not day_text or not month_text:
-        return None
-
-    months = {
-        "janvier": 1, "février": 2, "mars": 3, "avril": 4,
-        "mai": 5, "juin": 6, "juillet": 7, "août": 8,
-        "septembre": 9, "octobre": 10, "novembre": 11, "décembre": 12
-    }
-
-    if "jusqu" in day_text.lower() or "partir" in day_text.lower():
-        return None
+WEEKDAYS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+MONTH_NAMES = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet",
+               "août", "septembre", "octobre", "novembre", "décembre"]
 
-    m = re.search(r"(\d{1,2})", day_text)
-    if not m:
-        return None
 
-    day = int(m.group(1))
-    month = months.get(month_text.lower())
-    if not month:
+def format_date_text(iso_date: str):
+    """Date ISO → texte comme sur la page détail (ex: "vendredi 14 novembre 2025")."""
+    day = occurrences.to_date(iso_date)
+    if not day:
         return None
+    return f"{WEEKDAYS[day.weekday()]} {day.day} {MONTH_NAMES[day.month - 1]} {day.year}"
 
-    now = datetime.now()
-    year = now.year
-    if month < now.month - 3:
-        year += 1
 
+def fetch_date_from_detail_page(url):
+    """(date complète, début ISO, fin ISO) lus sur la page d’un événement."""
     try:
-        dt = datetime(year, month, day, 20, 0, 0)
-        return dt.isoformat()
-    except Exception:
-        return None
+        page = structured_data.fetch(url, timeout=10)
+        if not page:
+            return None, None, None
 
+        # JSON-LD Event si la page en expose un
+        event = structured_data.first_event(page)
+        start = event.get("startDate")
+        if start:
+            return format_date_text(start) or start, start, event.get("endDate")
 
-def fetch_date_from_detail_page(url):
-    """Va chercher la date complète sur la page d’un événement."""
-    try:
-        r = requests.get(url, timeout=10)
-        if not r.ok:
-            return None
-        soup = BeautifulSoup(r.text, "html.parser")
+        soup = BeautifulSoup(structured_data.html_of(page), "html.parser")
         date_cell = soup.select_one("table.nano_01 td.nano_01_:nth-of-type(2)")
         if date_cell:
             full_date = date_cell.get_text(strip=True)
             iso_date = normalize_date_from_text(full_date)
-            return full_date, iso_date
+            return full_date, iso_date, None
     except Exception:
-        return None, None
-    return None, None
-
-
-def scrape_confort_moderne():
-    url = "https://www.confort-moderne.fr/fr/agenda/details"
+        return None, None, None
+    return None, None, None
+
+
+def _occurrences(iso_start, iso_end, open_end=False):
+    """Date unique (avec heure), période d'exposition (jours) ou exposition "à partir du"."""
+    if iso_start and not iso_end and not open_end:
+        return [occurrences.single(iso_start)]
+    return occurrences.span(iso_start, iso_end, open_end=open_end)
+
+
+def _partial(ev) -> bool:
+    """Début ou fin manquant dans la liste ("Jusqu'au ...", "À partir du ...")."""
+    text = (ev.get("date") or "").lower().replace("’", "'")
+    return "jusqu" in text or is_open_ended(text)
+
+
+# Une ligne de l'agenda par événement (le mois n'est renseigné qu'à sa première ligne)
+SPEC = {
+    "region": {"name": "tr", "class": "tr-table"},
+    "card": "tr.tr-table",
+    "fields": {
+        "cells": {"select": "td", "all": True, "text": " "},
+        # --- Image (fond de div.img_filter)
+        "poster": {
+            "select": "td.img-table .img_filter",
+            "attr": "style",
+            "regex": r"background-image.*?url\(['\"]?(.*?)['\"]?\)",
+        },
+        # --- Titre et description (artistes)
+        "title": {"select": "td a.clic", "default": "Sans titre"},
+        "description": {"select": "td span span"},
+        # --- Lien source (onclick ou <a>)
+        "onclick": {"attr": "onclick", "regex": r"location\.href='(.*?)'"},
+        "link": {"select": "a.clic", "attr": "href"},
+    },
+}
+
+
+def parse_agenda(content: bytes, url: str):
+    """Lignes de l'agenda (octets HTML → liste de dicts, dates lues dans la liste)."""
     events = []
+    current_month = None
+    season = SeasonClock()
+
+    for row in listing.extract(content, SPEC):
+        cols = row["cells"]
+        if not cols:
+            continue
+
+        # --- Mois (souvent 1ère colonne, ex: NOVEMBRE, DÉCEMBRE)
+        if cols[0]:
+            current_month = cols[0]
+            if month_number(current_month):
+                season.advance(month_number(current_month))
+
+        # --- Date / période
+        date_text = (cols[1] if len(cols) > 1 else None) or ""
+
+        # --- Type (Concert, Expo...)
+        type_event = cols[-2] if len(cols) >= 5 else None
+
+        # --- Lieu (dernière colonne souvent)
+        location = (cols[-1] if len(cols) >= 6 else None) or "Confort Moderne, Poitiers"
+
+        title = row["title"]
+        description = row["description"]
+        poster = row["poster"]
+        source = row["onclick"] or row["link"] or url
+
+        # --- Concatène mois + jour
+        full_date = f"{current_month or ''} {date_text}".strip()
+
+        # --- Période (début / fin) lue directement dans la liste
+        start, end = parse_date_range(date_text, month_number(current_month))
+        if start and start[2] and start[1] == season.month:
+            season.resync(start[1], start[2])
+        iso_date = to_iso(start, season.year_for)
+        iso_end = to_iso(end, season.year_for)
+        listed_start = iso_date
+        if not iso_date and iso_end and season.month:
+            # "Jusqu'au ..." : en cours depuis au moins le mois de l'intertitre
+            # (la page détail précise le début)
+            iso_date = to_iso((1, season.month, season.year), hour=0)
+
+        # --- Enregistrement
+        events.append({
+            # Sans lien propre (repli sur la page agenda) : titre + début
+            "id": ids.make_id("Confort Moderne", ref=row["onclick"] or row["link"], title=title, start=listed_start),
+            "title": title,
+            "date": full_date,
+            "release": iso_date,
+            "end": iso_end,
+            "occurrences": _occurrences(iso_date, iso_end, is_open_ended(date_text)),
+            "poster": poster,
+            "description": description,
+            "cinema": "Confort Moderne",
+            "type": type_event,
+            "location": location,
+            "source": source,
+            "scraped_at": datetime.now().isoformat()
+        })
+
+    return events
+
+
+AGENDA_URL = "https://www.confort-moderne.fr/fr/agenda/details"
+
+
+def _detail_date(url):
+    """[date complète, début ISO, fin ISO] de la page détail, None si illisible (pas mis en cache)."""
+    full_date, iso_date, iso_end = fetch_date_from_detail_page(url)
+    return [full_date, iso_date, iso_end] if iso_date else None
+
+
+def enrich_events(events):
+    """
+    Repli rare vers la page détail (en parallèle) : date illisible dans la liste,
+    ou période incomplète ("Jusqu'au ...", "À partir du ...") dont elle donne les bornes.
+    """
+    missing = [
+        ev for ev in events
+        if ev["source"] != AGENDA_URL and (not (ev["release"] or ev["end"]) or _partial(ev))
+    ]
+    if missing:
+        details = enrichment_cache.enrich("confort_moderne", missing, _detail_date, fields=("source", "title", "date"))
+        for ev in missing:
+            found = details.get(ev["source"])
+            if not found:
+                continue
+            full_date_detail, iso_date_detail, *rest = found
+            iso_end_detail = (rest[0] if rest else None) or ev["end"]
+            if not (ev["release"] or ev["end"]):
+                ev["date"] = full_date_detail
+            ev["release"] = iso_date_detail
+            ev["end"] = iso_end_detail
+            ev["occurrences"] = _occurrences(iso_date_detail, iso_end_detail, is_open_ended(ev["date"]))
+    return events
 
-    try:
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
 
-        rows = soup.select("tr.tr-table")
-        current_month = None
+def scrape_confort_moderne(enrich=True):
+    url = AGENDA_URL
 
-        for row in rows:
-            cols = row.find_all("td")
-            if not cols:
-                continue
+    try:
+        content = pipeline.fetch(url, timeout=15)
+        events = pipeline.parse(parse_agenda, content, url)
 
-            # --- Mois (souvent 1ère colonne, ex: NOVEMBRE, DÉCEMBRE)
-            month_td = cols[0]
-            if month_td and month_td.get_text(strip=True):
-                current_month = month_td.get_text(strip=True)
-
-            # --- Date / période
-            date_td = cols[1] if len(cols) > 1 else None
-            date_text = date_td.get_text(" ", strip=True) if date_td else ""
-
-            # --- Image (fond de div.img_filter)
-            img_td = row.select_one("td.img-table .img_filter")
-            poster = None
-            if img_td and "background-image" in img_td.get("style", ""):
-                match = re.search(r"url\(['\"]?(.*?)['\"]?\)", img_td["style"])
-                if match:
-                    poster = match.group(1)
-
-            # --- Titre et description (artistes)
-            title_td = row.select_one("td a.clic")
-            title = title_td.get_text(strip=True) if title_td else "Sans titre"
-            description_span = row.select_one("td span span")
-            description = description_span.get_text(strip=True) if description_span else None
-
-            # --- Type (Concert, Expo...)
-            type_td = cols[-2] if len(cols) >= 5 else None
-            type_event = type_td.get_text(strip=True) if type_td else None
-
-            # --- Lieu (dernière colonne souvent)
-            location_td = cols[-1] if len(cols) >= 6 else None
-            location = location_td.get_text(strip=True) if location_td else "Confort Moderne, Poitiers"
-
-            # --- Lien source (onclick ou <a>)
-            onclick = row.get("onclick")
-            if onclick and "location.href=" in onclick:
-                match = re.search(r"location\.href='(.*?)'", onclick)
-                source = match.group(1) if match else url
-            else:
-                link_tag = row.select_one("a.clic")
-                source = link_tag["href"] if link_tag and "href" in link_tag.attrs else url
-
-            # --- Concatène mois + jour
-            full_date = f"{current_month or ''} {date_text}".strip()
-            iso_date = normalize_date(date_text, current_month or "")
-
-            # --- Si la date n’est pas exploitable, on va sur la page détail
-            if not iso_date:
-                full_date_detail, iso_date_detail = fetch_date_from_detail_page(source)
-                if iso_date_detail:
-                    full_date = full_date_detail
-                    iso_date = iso_date_detail
-
-            # --- Enregistrement
-            events.append({
-                "title": title,
-                "date": full_date,
-                "release": iso_date,
-                "poster": poster,
-                "description": description,
-                "cinema": "Confort Moderne",
-                "type": type_event,
-                "location": location,
-                "source": source,
-                "scraped_at": datetime.now().isoformat()
-            })
+        if enrich:
+            enrich_events(events)
 
         # ✅ Supprime les doublons sans changer l’ordre
         seen = set()
@@ -1,11 +1,16 @@
-import requests
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
+import hashlib
+import html
 import json
 import re
 
+from scrapers import enrichment_cache, ids, occurrences, pipeline, structured_data, wp_discovery
+
 
 BASE_URL = "https://emf.fr/le-programme/#s=&date={}&tax="
+# Champs de la carte dont un changement relance la page interne
+CARD_FIELDS = ("url", "title", "category", "excerpt", "img")
 
 
 def generate_dates(start="2025-11-16", end="2025-12-14"):
@@ -26,40 +31,168 @@ def clean(text):
 
 
 # ---------------------------------------------------------
-# 🔥 Scrape le CSS inline et construit un dictionnaire :
+# 🔥 Index des images du CSS inline :
 #    { "91225": "https://....jpg" }
+# Un seul passage par bloc <style> : découpage en règles (commentaires,
+# chaînes, url(...) et blocs @media compris), puis pour chaque règle dont
+# un sélecteur cite .e-loop-item-N, l'image de fond de CETTE règle.
 # ---------------------------------------------------------
-def extract_images_from_inline_css(soup):
-    image_map = {}
+_CSS_TOKEN_RE = re.compile(
+    r"""/\*.*?(?:\*/|\Z)"""           # commentaire
+    r"""|url\((?:\\.|[^)\\])*\)"""      # url(...) (peut contenir ; ou ")
+    r"""|"(?:\\.|[^"\\])*"?|'(?:\\.|[^'\\])*'?"""  # chaînes
+    r"""|[{};]"""
+    r"""|[^{};/"'u]+|.""",
+    re.S | re.I,
+)
+# Corps de règle sans chaîne, commentaire ni accolade : sauté d'un coup
+_PLAIN_BODY_RE = re.compile(r"""[^{}"'/]*\}""")
+_LOOP_ITEM_RE = re.compile(r"\.e-loop-item-(\d+)(?![\w-])")
+_URL_RE = re.compile(r"""url\(\s*(['"]?)(.*?)\1\s*\)""", re.I | re.S)
+_BACKGROUND_PROPS = ("background-image", "background")
+
+# Empreinte d'un bloc <style> → index ; les feuilles communes aux pages
+# programme ne sont découpées qu'une fois par processus
+_STYLE_INDEX_CACHE = {}
+_STYLE_INDEX_CACHE_SIZE = 256
+
+
+def iter_css_rules(css):
+    """
+    Génère (sélecteur, [(propriété, valeur)]) pour chaque règle citant
+    .e-loop-item-, y compris dans les @media ; le corps des autres règles
+    est sauté d'un bloc quand il ne contient ni chaîne ni commentaire.
+    """
+    depth_rules = []   # pour chaque "{" ouvert : le sélecteur si règle, False si @bloc
+    buf = []
+    declarations = []
+    pos, end = 0, len(css)
+    while pos < end:
+        m = _CSS_TOKEN_RE.match(css, pos)
+        token, pos = m.group(0), m.end()
+        if token.startswith("/*"):
+            continue
+        if token == "{":
+            prelude = "".join(buf).strip()
+            buf = []
+            in_rule = bool(depth_rules) and depth_rules[-1] is not False
+            if prelude.startswith("@") or in_rule:
+                depth_rules.append(False)
+                continue
+            if "e-loop-item-" not in prelude:
+                skip = _PLAIN_BODY_RE.match(css, pos)
+                if skip:
+                    pos = skip.end()
+                    continue
+            depth_rules.append(prelude)
+            declarations = []
+        elif token == ";":
+            if depth_rules and depth_rules[-1] is not False:
+                declarations.append("".join(buf))
+            buf = []
+        elif token == "}":
+            if not depth_rules:
+                buf = []
+                continue
+            selector = depth_rules.pop()
+            if selector is not False:
+                declarations.append("".join(buf))
+                parsed = []
+                for decl in declarations:
+                    prop, sep, value = decl.partition(":")
+                    if sep:
+                        parsed.append((prop.strip().lower(), value.strip()))
+                if "e-loop-item-" in selector:
+                    yield selector, parsed
+                declarations = []
+            buf = []
+        else:
+            buf.append(token)
+
+
+def _background_url(declarations):
+    url = None
+    for prop, value in declarations:
+        if prop in _BACKGROUND_PROPS:
+            m = _URL_RE.search(value)
+            if m:
+                url = m.group(2).strip()  # la dernière déclaration l'emporte
+    return url
+
+
+def style_index(css):
+    """{id de e-loop-item: image de fond} d'un bloc CSS (mis en cache par empreinte)."""
+    if "e-loop-item-" not in css:
+        return {}
+    key = hashlib.sha1(css.encode("utf-8", "surrogatepass")).hexdigest()
+    index = _STYLE_INDEX_CACHE.get(key)
+    if index is None:
+        index = {}
+        for selector, declarations in iter_css_rules(css):
+            loop_ids = _LOOP_ITEM_RE.findall(selector)
+            if not loop_ids:
+                continue
+            url = _background_url(declarations)
+            if url:
+                for loop_id in loop_ids:
+                    index[loop_id] = url
+        if len(_STYLE_INDEX_CACHE) >= _STYLE_INDEX_CACHE_SIZE:
+            _STYLE_INDEX_CACHE.pop(next(iter(_STYLE_INDEX_CACHE)))
+        _STYLE_INDEX_CACHE[key] = index
+    return index
 
-    styles = soup.find_all("style")
 
-    pattern = r"\.e-loop-item-(\d+).*?background-image:\s*url\((.*?)\)"
+def extract_images_from_inline_css(soup):
+    image_map = {}
+    for style in soup.find_all("style"):
+        image_map.update(style_index(style.text))
+    return image_map
 
-    for style in styles:
-        css = style.text
-        matches = re.findall(pattern, css, re.DOTALL)
-        for loop_id, img in matches:
-            image_map[loop_id] = img.strip('"\' ')
 
-    return image_map
+def loop_item_id(item):
+    """Identifiant N de la classe e-loop-item-N d'une carte (None si absente)."""
+    for c in item.get("class", []):
+        if c.startswith("e-loop-item-") and c[12:].isdigit():
+            return c[12:]
+    return None
 
 
 # ---------------------------------------------------------
 # Scraper la page interne
 # ---------------------------------------------------------
+_RESERVATION_RE = re.compile(
+    r"<a\b[^>]*href=[\"']([^\"']+)[\"'][^>]*>(?:(?!</a>).)*?réserv",
+    re.I | re.S,
+)
+
+
 def scrape_event_page(url):
+    """Description et lien de réservation d'une page événement (None si inaccessible)."""
     try:
-        r = requests.get(url, timeout=10)
-        soup = BeautifulSoup(r.text, "html.parser")
+        page = structured_data.fetch(url, timeout=10)
     except:
-        return {"description": "", "reservation": None}
-
-    desc_block = soup.select_one(".elementor-widget-theme-post-content")
-    description = clean(desc_block.get_text(" ", strip=True)) if desc_block else ""
-
-    reservation_btn = soup.find("a", string=lambda t: t and "réserv" in t.lower())
-    reservation_link = reservation_btn["href"] if reservation_btn else None
+        return None
+    if not page:
+        return None
+
+    # Données structurées d'abord (JSON-LD Event)
+    event = structured_data.first_event(page)
+    description = clean(event.get("description"))
+    offers = event.get("offers") or {}
+    if isinstance(offers, list):
+        offers = offers[0] if offers else {}
+    reservation_link = offers.get("url") if isinstance(offers, dict) else None
+
+    page_html = structured_data.html_of(page) if not (reservation_link and description) else ""
+    if not reservation_link:
+        match = _RESERVATION_RE.search(page_html)
+        reservation_link = html.unescape(match.group(1)) if match else None
+
+    # Repli DOM : contenu Elementor de l'article
+    if not description:
+        soup = BeautifulSoup(page_html, "html.parser")
+        desc_block = soup.select_one(".elementor-widget-theme-post-content")
+        description = clean(desc_block.get_text(" ", strip=True)) if desc_block else ""
 
     return {
         "description": description,
@@ -75,11 +208,21 @@ def scrape_day(date_str):
     print(f"Scraping : {url}")
 
     try:
-        r = requests.get(url, timeout=10)
+        content = pipeline.fetch(url, timeout=10)
     except:
         return []
 
-    soup = BeautifulSoup(r.text, "html.parser")
+    results = pipeline.parse(parse_day, content, date_str)
+    add_details(results)
+    return results
+
+
+def parse_day(content, date_str):
+    """Extrait les cartes d'une page programme (octets HTML → liste de dicts, sans détails)."""
+    if not content:
+        return []
+
+    soup = BeautifulSoup(content, "html.parser")
 
     # 🔥 Extraire les images à partir des styles inline
     image_map = extract_images_from_inline_css(soup)
@@ -89,11 +232,7 @@ def scrape_day(date_str):
     for item in soup.select(".e-loop-item"):
         try:
             # Trouver l'ID e-loop-item-XXXXX
-            loop_id = None
-            for c in item.get("class", []):
-                match = re.match(r"e-loop-item-(\d+)", c)
-                if match:
-                    loop_id = match.group(1)
+            loop_id = loop_item_id(item)
 
             # URL
             link_tag = item.select_one("a[href*='/event/']")
@@ -115,17 +254,16 @@ def scrape_day(date_str):
             # 🔥 Image via CSS inline
             image = image_map.get(loop_id)
 
-            # Contenu interne
-            details = scrape_event_page(event_url)
-
             results.append({
+                # e-loop-item-<id> : identifiant WordPress de l'événement
+                "id": ids.make_id("Espace Mendès France", ref=f"emf:{loop_id}" if loop_id else event_url),
                 "url": event_url,
                 "title": title,
                 "category": category,
                 "excerpt": excerpt,
-                "description": details["description"],
+                "description": "",
                 "img": image,
-                "reservation": details["reservation"],
+                "reservation": None,
                 "source": "espace mendes france",
                 "occurrence": {"date": date_str}
             })
@@ -137,16 +275,32 @@ def scrape_day(date_str):
     return results
 
 
+def add_details(results):
+    """
+    Complète description et réservation (cartes par jour ou fusionnées) depuis
+    les pages internes : une fois par URL, et seulement pour les pages
+    nouvelles ou modifiées (lastmod WordPress).
+    """
+    fingerprints = {ev["url"]: enrichment_cache.fingerprint(ev, CARD_FIELDS) for ev in results}
+    details = wp_discovery.enrich("emf", (ev["url"] for ev in results), scrape_event_page, fingerprints=fingerprints)
+    for ev in results:
+        detail = details.get(ev["url"]) or {"description": "", "reservation": None}
+        ev["description"] = detail["description"]
+        ev["reservation"] = detail["reservation"]
+
+
 # ---------------------------------------------------------
 # Fusion
 # ---------------------------------------------------------
 def merge_events(events):
     merged = {}
+    days = {}
 
     for ev in events:
         url = ev["url"]
         if url not in merged:
             merged[url] = {
+                "id": ev["id"],
                 "url": ev["url"],
                 "title": ev["title"],
                 "category": ev["category"],
@@ -157,8 +311,13 @@ def merge_events(events):
                 "source": ev["source"],
                 "occurrences": []
             }
+            days[url] = []
+
+        days[url].append(ev["occurrence"]["date"])
 
-        merged[url]["occurrences"].append(ev["occurrence"])
+    # Un jour par page programme → séries compactes ("du X au Y sauf Z")
+    for url, event in merged.items():
+        event["occurrences"] = occurrences.compress(days[url])
 
     return list(merged.values())
 
@@ -166,13 +325,17 @@ def merge_events(events):
 # ---------------------------------------------------------
 # Main
 # ---------------------------------------------------------
-def scrape_emf():
-    all_events = []
+def scrape_emf(enrich=True):
+    """enrich=False : cartes des pages programme seules (sans description ni réservation)."""
+    dates = generate_dates("2025-11-16", "2025-12-14")
 
-    for date in generate_dates("2025-11-16", "2025-12-14"):
-        all_events.extend(scrape_day(date))
+    # Étage I/O : toutes les journées en parallèle ; étage CPU : parsing dans le pool
+    pages = pipeline.fetch_many([BASE_URL.format(d) for d in dates], timeout=10)
+    all_events = [ev for day in pipeline.parse_many(parse_day, pages, dates) for ev in day]
 
     cleaned = merge_events(all_events)
+    if enrich:
+        add_details(cleaned)
 
     with open("emf_events.json", "w", encoding="utf-8") as f:
         json.dump(cleaned, f, indent=2, ensure_ascii=False)
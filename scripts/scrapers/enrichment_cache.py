@@ -0,0 +1,188 @@
+# scrapers/enrichment_cache.py
+"""
+Enrichissement incrémental : une page détail n'est retéléchargée que si sa
+carte de listing a changé.
+
+Chaque carte est réduite à une empreinte (SHA-1 des champs choisis, après
+normalisation : espaces compactés, URLs canoniques). Les détails extraits
+sont conservés dans .cache/enrichment.json avec l'empreinte de la carte :
+
+    details = enrichment_cache.enrich("republic_corner", cards, get_event_details,
+                                      key="source", fields=("source", "poster"))
+
+Enricher permet de soumettre les cartes au fil du listing (voir tap.py).
+
+Une carte nouvelle ou modifiée est retéléchargée ; les autres réutilisent
+le cache. Tous les FULL_SWEEP_DAYS jours (ENRICHMENT_FULL_SWEEP_DAYS, 7 par
+défaut), un passage complet retélécharge tout pour rattraper les
+modifications silencieuses des pages détail ; un échec pendant ce passage
+garde les détails connus. Un résultat vide ou None n'est jamais mis en cache.
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+try:
+    import fcntl  # POSIX uniquement
+except ImportError:
+    fcntl = None
+
+from scrapers.structured_data import canonical_url
+
+CACHE_PATH = os.environ.get("ENRICHMENT_CACHE", os.path.join(".cache", "enrichment.json"))
+FULL_SWEEP_DAYS = float(os.environ.get("ENRICHMENT_FULL_SWEEP_DAYS", 7))
+
+# Le fichier cache est partagé par les sources enrichies en parallèle (threads),
+# et par les processus isolés de sandbox.py (verrou fichier, voir _locked)
+_CACHE_LOCK = threading.Lock()
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        value = " ".join(value.split())
+        return canonical_url(value) if value.startswith(("http://", "https://")) else value
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def fingerprint(card, fields) -> str:
+    """Empreinte des champs `fields` de la carte, après normalisation."""
+    payload = json.dumps([_normalize(card.get(f)) for f in fields], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def _locked():
+    """Accès exclusif au fichier cache : entre threads, puis entre processus (flock sur <cache>.lock)."""
+    with _CACHE_LOCK:
+        if fcntl is None:
+            yield
+            return
+        lock_path = CACHE_PATH + ".lock"
+        os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+        with open(lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _load_cache(path=None):
+    try:
+        with open(path or CACHE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache, path=None):
+    path = path or CACHE_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def _sweep_due(swept_at, now):
+    if not swept_at:
+        return True
+    try:
+        return now - datetime.fromisoformat(swept_at) >= timedelta(days=FULL_SWEEP_DAYS)
+    except ValueError:
+        return True
+
+
+class Enricher:
+    """
+    Enrichissement au fil de l'eau : submit(clé, empreinte) dès qu'une carte
+    est connue (retourne un Future), puis close() pour attendre les pages
+    détail, enregistrer le cache et obtenir {clé: détails}.
+    L'empreinte peut être une fonction sans argument, évaluée dans le worker
+    (par exemple quand elle dépend d'une découverte encore en cours).
+    """
+
+    def __init__(self, namespace, fetch_detail, max_workers=4, now=None):
+        self.namespace = namespace
+        self.fetch_detail = fetch_detail
+        self.now = now or datetime.now(timezone.utc)
+        with _locked():
+            self.stored = _load_cache().get(namespace, {})
+        self.entries = self.stored.get("entries", {})
+        self.sweep = _sweep_due(self.stored.get("swept_at"), self.now)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.futures = {}
+        self.kept = {}      # clé → {"fingerprint", "details"} : cartes encore listées, résultat exploitable
+        self.fetched = 0
+
+    def submit(self, key, fp=None):
+        with self.lock:
+            if key not in self.futures:
+                self.futures[key] = self.pool.submit(self._resolve, key, fp)
+            return self.futures[key]
+
+    def _resolve(self, key, fp):
+        if callable(fp):
+            fp = fp()
+        cached = self.entries.get(key)
+        if not self.sweep and fp is not None and cached and cached["fingerprint"] == fp:
+            result = cached["details"]
+        else:
+            try:
+                result = self.fetch_detail(key)
+            except Exception as e:
+                print(f"⚠️ Page détail {key} : {e}")
+                result = None
+            with self.lock:
+                self.fetched += 1
+            if not result and cached and cached["fingerprint"] == fp:
+                result = cached["details"]  # échec : on garde les détails connus
+        if result:
+            with self.lock:
+                self.kept[key] = {"fingerprint": fp, "details": result}
+        return result
+
+    def close(self) -> dict:
+        self.pool.shutdown(wait=True)
+        details = {key: future.result() for key, future in self.futures.items()}
+        with _locked():
+            cache = _load_cache()
+            cache[self.namespace] = {
+                "swept_at": self.now.isoformat() if self.sweep else self.stored.get("swept_at"),
+                "entries": self.kept,
+            }
+            _save_cache(cache)
+
+        label = "passage complet" if self.sweep else f"{len(details) - self.fetched} inchangées"
+        print(f"♻️ {self.namespace} : {label}, {self.fetched} pages détail téléchargées")
+        return details
+
+
+def enrich_keys(namespace, fingerprints, fetch_detail, max_workers=4, now=None) -> dict:
+    """
+    {clé: détails} pour chaque clé de fingerprints ({clé: empreinte}), en
+    n'appelant fetch_detail(clé) que pour les clés nouvelles, dont l'empreinte
+    a changé ou sans empreinte (None), et pour toutes lors d'un passage complet.
+    """
+    enricher = Enricher(namespace, fetch_detail, max_workers, now)
+    for key, fp in fingerprints.items():
+        enricher.submit(key, fp)
+    return enricher.close()
+
+
+def enrich(namespace, cards, fetch_detail, key="source", fields=("source",), max_workers=4, now=None) -> dict:
+    """{card[key]: détails} : enrich_keys() avec l'empreinte des champs `fields` de chaque carte."""
+    fingerprints = {}
+    for card in cards:
+        if card.get(key):
+            fingerprints.setdefault(card[key], fingerprint(card, fields))
+    return enrich_keys(namespace, fingerprints, fetch_detail, max_workers, now)
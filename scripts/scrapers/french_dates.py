@@ -0,0 +1,130 @@
+# scrapers/french_dates.py
+"""Parsing des dates et périodes en français ("Du 17 au 19 septembre 2026", "Jusqu'au 3 janvier"...)."""
+import re
+from datetime import datetime
+
+MONTHS = {
+    "janvier": 1, "février": 2, "fevrier": 2, "mars": 3, "avril": 4,
+    "mai": 5, "juin": 6, "juillet": 7, "août": 8, "aout": 8,
+    "septembre": 9, "octobre": 10, "novembre": 11, "décembre": 12, "decembre": 12,
+}
+
+_PART_RE = re.compile(r"\b(\d{1,2})(?:er)?\b(?:\s+([a-zéèêëûôîçà]+))?(?:\s+(\d{4}))?")
+
+
+def month_number(text: str | None) -> int | None:
+    """'NOVEMBRE', 'décembre' → 11, 12."""
+    if not text:
+        return None
+    return MONTHS.get(text.strip().lower())
+
+
+def closest_year(month: int, ref_year: int, ref_month: int) -> int:
+    """Année du mois `month` la plus proche de (ref_year, ref_month)."""
+    ref = ref_year * 12 + ref_month
+    return min(
+        (ref_year - 1, ref_year, ref_year + 1),
+        key=lambda y: abs(y * 12 + month - ref),
+    )
+
+
+class SeasonClock:
+    """
+    Déduit l'année des intertitres de mois d'un agenda trié chronologiquement.
+    Le premier mois est rattaché à l'année la plus proche d'aujourd'hui,
+    chaque retour en arrière (décembre → janvier) passe à l'année suivante.
+    """
+
+    def __init__(self, now: datetime | None = None):
+        self.now = now or datetime.now()
+        self.year = None
+        self.month = None
+
+    def advance(self, month: int) -> int:
+        if self.year is None:
+            self.year = closest_year(month, self.now.year, self.now.month)
+        elif month < self.month:
+            self.year += 1
+        self.month = month
+        return self.year
+
+    def resync(self, month: int, year: int):
+        """Recale l'horloge sur une date dont l'année est explicite."""
+        self.month, self.year = month, year
+
+    def year_for(self, month: int) -> int:
+        if self.year is None:
+            return closest_year(month, self.now.year, self.now.month)
+        return closest_year(month, self.year, self.month)
+
+
+def parse_date_range(text: str, default_month: int | None = None):
+    """
+    Découpe un texte de date en (start, end), chacun étant un tuple
+    (jour, mois, année|None) ou None.
+      "jeudi 1"                          → ((1, m, None), None)  avec m = default_month
+      "Du 17 au 19 septembre 2026"       → ((17, 9, 2026), (19, 9, 2026))
+      "Du 31 mars au 1 avril 2027"       → ((31, 3, 2027), (1, 4, 2027))
+      "Jusqu'au 3 janvier"               → (None, (3, 1, None))
+      "À partir du 5 décembre"           → ((5, 12, None), None)
+    Retourne (None, None) si aucun jour n'est reconnu.
+    """
+    if not text:
+        return None, None
+    low = text.lower().replace("’", "'")
+
+    parts = []
+    for m in _PART_RE.finditer(low):
+        month = month_number(m.group(2))
+        year = int(m.group(3)) if m.group(3) and month else None
+        parts.append([int(m.group(1)), month, year])
+    if not parts:
+        return None, None
+
+    # Le mois et l'année se lisent de droite à gauche : "du 17 au 19 septembre 2026"
+    month, year = default_month, None
+    for part in reversed(parts):
+        if part[1] is None:
+            part[1] = month
+        elif month is not None and year is not None and part[1] > month:
+            year -= 1  # "du 20 décembre au 4 janvier 2027"
+        month = part[1]
+        if part[2] is None:
+            part[2] = year
+        else:
+            year = part[2]
+
+    if any(p[1] is None for p in parts):
+        return None, None
+
+    first, last = tuple(parts[0]), tuple(parts[-1])
+    if "jusqu" in low:
+        return None, last
+    if "partir" in low:
+        return first, None
+    if len(parts) == 1:
+        return first, None
+    return first, last
+
+
+def is_open_ended(text: str | None) -> bool:
+    """"À partir du 3 octobre", "Dès le 5" : période sans fin annoncée."""
+    low = (text or "").lower()
+    return "partir d" in low or "dès le" in low
+
+
+def to_iso(part, year_for=None, hour=20):
+    """(jour, mois, année|None) → ISO 8601 ; year_for(mois) complète l'année manquante."""
+    if not part:
+        return None
+    day, month, year = part
+    if year is None:
+        if year_for is None:
+            now = datetime.now()
+            year = closest_year(month, now.year, now.month)
+        else:
+            year = year_for(month)
+    try:
+        return datetime(year, month, day, hour, 0, 0).isoformat()
+    except ValueError:
+        return None
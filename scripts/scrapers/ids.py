@@ -0,0 +1,54 @@
+# scrapers/ids.py
+"""
+Identifiants stables des événements, dérivés de leur contenu.
+
+    make_id("CGR Castille", ref="cgr:12345")                 # identifiant plateforme
+    make_id("TAP Poitiers", ref="https://www.tap-poitiers.com/spectacle/x/")
+    make_id("Maison des 3 Quartiers", title="Concert", start="2025-10-10T20:30:00Z")
+
+`ref` doit désigner l'événement à lui seul dans le lieu (id plateforme ou
+URL propre à l'événement) : titre et début ne sont alors pas utilisés, et
+l'identifiant survit à une correction de titre ou d'horaire. Sans `ref`,
+l'identifiant repose sur le titre et le début normalisés.
+"""
+import hashlib
+import re
+import unicodedata
+
+from scrapers.structured_data import canonical_url
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text) -> str:
+    """Minuscules, sans accents ni ponctuation : "Soirée  Jazz !" → "soiree jazz"."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
+    return _NON_ALNUM_RE.sub(" ", text.lower()).strip()
+
+
+def slug(text) -> str:
+    return normalize(text).replace(" ", "-")
+
+
+def normalize_start(value) -> str:
+    """Début ISO ramené à la minute ("2025-10-10T20:30"), ou la date seule."""
+    if not value:
+        return ""
+    value = str(value).strip()
+    if re.match(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}", value):
+        return value[:16]
+    return value[:10]
+
+
+def make_id(venue, ref=None, title=None, start=None) -> str:
+    """Identifiant "<lieu>-<empreinte>" (ex : "cgr-castille-3f2a9c1b7e4d")."""
+    if ref:
+        ref = str(ref).strip()
+        key = canonical_url(ref) if ref.startswith(("http://", "https://")) else ref
+        parts = (normalize(venue), "ref", key)
+    else:
+        parts = (normalize(venue), "title", normalize(title), normalize_start(start))
+    digest = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:12]
+    return f"{slug(venue)}-{digest}"
@@ -0,0 +1,135 @@
+# scrapers/listing.py
+"""
+Moteur d'extraction déclaratif pour les pages "liste de cartes".
+
+Chaque site est décrit par une spec (simple dict) :
+
+    SPEC = {
+        "base_url": "https://www.exemple.fr",            # pour les URLs relatives
+        "region": {"name": "div", "class": "main-card"},  # optionnel : ne parser que ces éléments
+        "card": "div.card.main-card",                     # sélecteur CSS des cartes
+        "required": ["title"],                            # champs obligatoires (sinon carte ignorée)
+        "required_any": ["title", "poster"],              # au moins un de ces champs
+        "fields": {
+            "title":  {"select": ".card__title"},                         # texte
+            "date":   {"select": ["h2", "h3", "strong"], "text": " "},    # 1er sélecteur qui trouve
+            "poster": {"select": "img", "attr": "src", "url": True},      # attribut + urljoin
+            "style":  {"attr": "style", "regex": r"url\\((.*?)\\)"},        # la carte elle-même
+            "cells":  {"select": ":scope > td", "all": True},             # liste de valeurs
+        },
+    }
+
+Les sélecteurs sont compilés une seule fois (soupsieve). Les cartes sont
+trouvées en un seul parcours du document ; seules les cartes les plus
+internes sont retenues : un conteneur qui correspond aussi au sélecteur
+n'est extrait que si aucune carte valide n'a été trouvée à l'intérieur.
+"""
+import re
+from functools import lru_cache
+from urllib.parse import urljoin
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.element import Tag
+
+
+@lru_cache(maxsize=None)
+def _selector(css: str):
+    return soupsieve.compile(css)
+
+
+@lru_cache(maxsize=None)
+def _regex(pattern: str):
+    return re.compile(pattern, re.I | re.S)
+
+
+def _strainer(region):
+    """SoupStrainer limitant le parsing aux éléments de la région (None = page entière)."""
+    if not region:
+        return None
+    attrs = {}
+    if region.get("class"):
+        wanted = region["class"]
+        # selon la version de bs4, la fonction reçoit une classe ou toute la valeur de l'attribut
+        attrs["class"] = lambda value: value is not None and wanted in str(value).split()
+    return SoupStrainer(region.get("name"), attrs=attrs)
+
+
+def parse(content, spec):
+    """Parse la page (restreinte à spec["region"] si présente)."""
+    return BeautifulSoup(content, "html.parser", parse_only=_strainer(spec.get("region")))
+
+
+def _value(node, rule, base_url):
+    if rule.get("attr"):
+        value = node.get(rule["attr"])
+        if isinstance(value, list):
+            value = " ".join(value)
+    else:
+        value = node.get_text(rule.get("text", ""), strip=True)
+    if value and rule.get("regex"):
+        m = _regex(rule["regex"]).search(value)
+        value = m.group(1) if m else None
+    if value and rule.get("url") and base_url:
+        value = urljoin(base_url, value.strip())
+    return value if value not in ("", None) else rule.get("default")
+
+
+def _field(card, rule, base_url):
+    selectors = rule.get("select")
+    if selectors is None:
+        return _value(card, rule, base_url)
+    if isinstance(selectors, str):
+        selectors = [selectors]
+
+    if rule.get("all"):
+        nodes = [n for css in selectors for n in _selector(css).select(card)]
+        return [_value(n, rule, base_url) for n in nodes]
+
+    for css in selectors:
+        node = _selector(css).select_one(card)
+        if node is not None:
+            return _value(node, rule, base_url)
+    return rule.get("default")
+
+
+def extract_card(card, spec):
+    """Champs d'une carte selon la spec, ou None si un champ obligatoire manque."""
+    base_url = spec.get("base_url")
+    record = {name: _field(card, rule, base_url) for name, rule in spec["fields"].items()}
+    if any(not record.get(name) for name in spec.get("required", ())):
+        return None
+    if spec.get("required_any") and not any(record.get(name) for name in spec["required_any"]):
+        return None
+    return record
+
+
+def iter_cards(root, spec):
+    """
+    Parcours unique en ordre du document : génère (carte, champs) pour chaque
+    carte correspondant à spec["card"] qui ne contient aucune autre carte
+    retenue (un conteneur qui correspond aussi au sélecteur, par exemple un
+    `article` ou une colonne regroupant d'autres colonnes, n'est retenu que si
+    aucun de ses descendants ne l'est).
+    """
+    pattern = _selector(spec["card"])
+    emitted = 0
+    # (nœud, None) : à visiter ; (nœud, n) : sortie d'un nœud candidat, n cartes émises à l'entrée
+    stack = [(c, None) for c in reversed(root.contents) if isinstance(c, Tag)]
+    while stack:
+        node, entered = stack.pop()
+        if entered is not None:
+            if emitted == entered:
+                record = extract_card(node, spec)
+                if record is not None:
+                    emitted += 1
+                    yield node, record
+            continue
+        if pattern.match(node):
+            stack.append((node, emitted))
+        stack.extend((c, None) for c in reversed(node.contents) if isinstance(c, Tag))
+
+
+def extract(content, spec):
+    """Octets/texte HTML → liste des enregistrements bruts des cartes."""
+    return [record for _, record in iter_cards(parse(content, spec), spec)]
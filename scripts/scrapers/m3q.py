@@ -1,13 +1,32 @@
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
 from datetime import datetime
 import re
 
+from scrapers import ids, pipeline
+
 URL = "https://m3q.centres-sociaux.fr/saison-culturelle-2025-26/"
 
 
+WEEKDAYS = ("LUNDI", "MARDI", "MERCREDI", "JEUDI", "VENDREDI", "SAMEDI", "DIMANCHE")
+
+# Saison culturelle : de septembre (année de début) à l'été suivant
+SEASON_RE = re.compile(r"saison\D{0,20}(20\d{2})\s*[-–/]\s*(?:20)?\d{2}", re.I)
+SEASON_START_MONTH = 9
+
+
+def season_start_year(*texts, today=None) -> int:
+    """Année de début de saison lue dans l'URL ou le titre ("saison-culturelle-2025-26" → 2025)."""
+    for text in texts:
+        m = SEASON_RE.search(text or "")
+        if m:
+            return int(m.group(1))
+    # À défaut : la saison en cours
+    today = today or datetime.now()
+    return today.year if today.month >= SEASON_START_MONTH else today.year - 1
+
+
 # --- Convertit une date FR en ISO ---
-def convert_to_iso(text_date, text_time=None):
+def convert_to_iso(text_date, text_time=None, season=None):
     # Exemple d'entrée :
     # "VENDREDI 10 OCTOBRE"
     # "Samedi 14 mars / 20h30"
@@ -35,7 +54,9 @@ def convert_to_iso(text_date, text_time=None):
 
     mois_num = mois[mois_txt]
 
-    année = "2025"  # saison 2025-2026
+    # Septembre → décembre : année de début de saison ; janvier → août : la suivante
+    season = season or season_start_year(URL)
+    année = season if int(mois_num) >= SEASON_START_MONTH else season + 1
 
     # Heure
     if text_time:
@@ -54,99 +75,143 @@ def convert_to_iso(text_date, text_time=None):
 
 
 def scrape_m3q():
-    response = requests.get(URL, timeout=20)
-    response.raise_for_status()
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    events = []
-    sections = soup.find_all("section", class_="elementor-section")
-
-    current_date = None
-
-    for section in sections:
-
-        # --- TITRE DE DATE ---
-        date_block = section.find("p")
-        if date_block:
-            txt = date_block.get_text(strip=True).upper()
-            if txt.startswith(("LUNDI", "MARDI", "MERCREDI", "JEUDI", "VENDREDI", "SAMEDI", "DIMANCHE")):
-                current_date = txt
+    content = pipeline.fetch(URL, timeout=20)
+    return pipeline.parse(parse_m3q, content)
+
+
+def _new_block():
+    return {"first_p": None, "date": False, "img": None, "h4": None, "texts": [], "button": None, "emitted": False}
+
+
+def _is_section(node):
+    return node.name == "section" and "elementor-section" in (node.get("class") or ())
+
+
+def iter_blocks(root):
+    """
+    Parcours unique en ordre du document des sections Elementor (imbriquées).
+    Génère ("date", texte) dès le premier paragraphe d'une section s'il
+    commence par un jour de la semaine (titre de date), et ("event", bloc) à
+    la fermeture de la section la plus interne qui contient image et titre :
+    une section dont une sous-section a déjà produit un évènement n'en
+    produit pas d'autre. Le contenu d'une section sans évènement remonte
+    dans sa section parente.
+    """
+    stack = [c for c in reversed(root.contents) if isinstance(c, Tag)]
+    blocks = []
+    while stack:
+        node = stack.pop()
+        if node is None:
+            # Fermeture de la section du haut de pile
+            block = blocks.pop()
+            parent = blocks[-1] if blocks else None
+            if block["date"]:
                 continue
+            if block["img"] and block["h4"] and not block["emitted"]:
+                yield "event", block
+                if parent:
+                    parent["emitted"] = True
+            elif parent:
+                parent["emitted"] = parent["emitted"] or block["emitted"]
+                for key in ("img", "h4", "button"):
+                    parent[key] = parent[key] or block[key]
+                parent["texts"].extend(block["texts"])
+            continue
 
-        # --- BLOC ÉVÈNEMENT ---
-        image = section.find("img")
-        title = section.find("h4")
-        texts = section.find_all("div", class_="elementor-widget-container")
-
-        if not (image and title and current_date):
+        if _is_section(node):
+            blocks.append(_new_block())
+            stack.append(None)  # marqueur de fin de section
+        elif blocks:
+            block = blocks[-1]
+            classes = node.get("class") or ()
+            if node.name == "p" and block["first_p"] is None:
+                block["first_p"] = node.get_text(strip=True)
+                if block["first_p"].upper().startswith(WEEKDAYS):
+                    block["date"] = True
+                    yield "date", block["first_p"].upper()
+            elif node.name == "img" and block["img"] is None:
+                block["img"] = node.get("src")
+            elif node.name == "h4" and block["h4"] is None:
+                block["h4"] = node.get_text(strip=True)
+            elif node.name == "a" and "elementor-button" in classes and block["button"] is None:
+                block["button"] = node.get("href")
+            if node.name == "div" and "elementor-widget-container" in classes:
+                block["texts"].append(node.get_text("\n", strip=True).strip())
+        stack.extend(c for c in reversed(node.contents) if isinstance(c, Tag))
+
+
+def _event(block, current_date, season):
+    event_title = block["h4"]
+    subtitle = None
+    description_parts = []
+    time_info = None
+
+    # Extraction des blocs texte
+    for content in block["texts"]:
+        # Sous-titre
+        if content.startswith("·"):
+            subtitle = content.replace("·", "").strip()
             continue
 
-        image_url = image["src"]
-        event_title = title.get_text(strip=True)
+        # Heure ("→ Samedi 14 mars / 20h30")
+        if "→" in content:
+            time_info = content.replace("→", "").strip()
+            continue
 
-        subtitle = None
-        description_parts = []
-        time_info = None
+        # Description brute, on filtre :
+        if (
+            len(content) > 8
+            and event_title.lower() not in content.lower()
+            and "BILLETTERIE" not in content.upper()
+            and not content.upper().startswith(("AGENDA", "TÉLÉCHARGEZ"))
+            and not content.upper().startswith(WEEKDAYS)
+        ):
+            description_parts.append(content)
+
+    # Description nette (sans les affreux "1\ner")
+    description = "\n".join(description_parts).strip().replace("1\ner", "1er")
+
+    # Récupération heure depuis time_info
+    extracted_time = None
+    if time_info:
+        m = re.search(r"(\d{1,2}h\d{2})", time_info)
+        if m:
+            extracted_time = m.group(1)
+
+    iso_date = convert_to_iso(current_date, extracted_time, season)
+
+    return {
+        # Une seule page pour toute la saison : titre + date
+        "id": ids.make_id("Maison des 3 Quartiers", title=event_title, start=iso_date),
+        "cinema": "Maison des 3 Quartiers",
+        "etablissement": "Maison des 3 Quartiers",
+        "date_text": current_date,
+        "date": iso_date,                # 🔥 ISO
+        "title": event_title,
+        "subtitle": subtitle,
+        "description": description,
+        "time": extracted_time,
+        "image": block["img"],
+        "ticket": block["button"],
+        "source": URL
+    }
 
-        # Extraction des blocs texte
-        for t in texts:
-            content = t.get_text("\n", strip=True).strip()
 
-            # Sous-titre
-            if content.startswith("·"):
-                subtitle = content.replace("·", "").strip()
-                continue
+def parse_m3q(content: bytes):
+    """Extrait les événements de la page saison (octets HTML → liste de dicts)."""
+    return extract_events(BeautifulSoup(content, "html.parser"))
 
-            # Heure ("→ Samedi 14 mars / 20h30")
-            if "→" in content:
-                cleaned = content.replace("→", "").strip()
-                time_info = cleaned
-                continue
 
-            # Description brute, on filtre :
-            if (
-                len(content) > 8
-                and event_title.lower() not in content.lower()
-                and "BILLETTERIE" not in content.upper()
-                and not content.upper().startswith(("AGENDA", "TÉLÉCHARGEZ"))
-                and not content.upper().startswith(("LUNDI", "MARDI", "MERCREDI", "JEUDI", "VENDREDI", "SAMEDI", "DIMANCHE"))
-            ):
-                description_parts.append(content)
-
-        # Description nette
-        description = "\n".join(description_parts).strip()
-
-        # Nettoyage des affreux "1\ner"
-        description = description.replace("1\ner", "1er")
-
-        # Récupération heure depuis time_info
-        extracted_time = None
-        if time_info:
-            m = re.search(r"(\d{1,2}h\d{2})", time_info)
-            if m:
-                extracted_time = m.group(1)
-
-        # Date ISO
-        iso_date = convert_to_iso(current_date, extracted_time)
-
-        # Billetterie
-        button = section.find("a", class_="elementor-button")
-        booking_url = button["href"] if button else None
-
-        events.append({
-            "cinema": "Maison des 3 Quartiers",
-            "etablissement": "Maison des 3 Quartiers",
-            "date_text": current_date,
-            "date": iso_date,                # 🔥 ISO
-            "title": event_title,
-            "subtitle": subtitle,
-            "description": description,
-            "time": extracted_time,
-            "image": image_url,
-            "ticket": booking_url,
-            "source": URL
-        })
+def extract_events(soup):
+    season = season_start_year(URL, soup.title.get_text() if soup.title else "")
 
+    events = []
+    current_date = None
+    for kind, value in iter_blocks(soup):
+        if kind == "date":
+            current_date = value
+        elif current_date:
+            events.append(_event(value, current_date, season))
     return events
 
 
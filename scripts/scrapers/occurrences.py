@@ -0,0 +1,192 @@
+# scrapers/occurrences.py
+"""
+Représentation compacte des occurrences d'un événement.
+
+Un événement porte une liste "occurrences" de séries :
+    {"start": "2026-11-04T20:00:00"}                       → date unique
+    {"start": "2026-09-17", "end": "2026-12-19"}           → tous les jours de la période
+    {"start": "2025-11-16", "end": "2025-12-14",
+     "except": ["2025-11-17", "2025-11-24"]}               → tous les jours sauf ...
+    {"start": "2026-10-07", "end": "2026-12-16",
+     "freq": "weekly"}                                      → chaque semaine (même jour)
+    {"end": "2027-01-03"}                                  → en cours, jusqu'au ...
+    {"start": "2026-10-03", "open": true}                  → tous les jours à partir du ...
+Les dates sont en ISO 8601 (triables). Les consommateurs déroulent les séries
+à la demande avec expand() ou cherchent la prochaine date avec next_occurrence().
+Une série ouverte ne se déroule que dans une fenêtre bornée.
+compress() produit les séries quotidiennes et hebdomadaires à partir d'une
+liste de jours (EMF).
+"""
+from datetime import date, datetime, timedelta
+
+# Nombre maximal de jours consécutifs sans occurrence absorbés dans "except"
+MAX_GAP = 2
+# Jours isolés espacés d'une semaine à partir desquels on écrit une série "weekly"
+MIN_WEEKLY = 3
+
+
+def to_date(value) -> date | None:
+    """'2026-11-04', '2026-11-04T20:00:00', '04-11-2026', date ou datetime → date."""
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).date()
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(text, "%d-%m-%Y").date()
+    except ValueError:
+        return None
+
+
+def single(start) -> dict:
+    """Occurrence unique (date ou date-heure ISO)."""
+    return {"start": start.isoformat() if isinstance(start, date) else start}
+
+
+def span(start=None, end=None, open_end=False) -> list:
+    """
+    Période continue ; start ou end peuvent être ouverts. Sans end, start seul
+    est une date unique, sauf si open_end ("à partir du ..."). Liste vide si rien n'est connu.
+    """
+    start, end = to_date(start), to_date(end)
+    if start and end and start > end:
+        start, end = end, start
+    if start and not end and open_end:
+        return [{"start": start.isoformat(), "open": True}]
+    if start and (not end or end == start):
+        return [single(start)]
+    if end:
+        run = {"end": end.isoformat()}
+        if start:
+            run = {"start": start.isoformat(), **run}
+        return [run]
+    return []
+
+
+def _weekly(runs):
+    """Regroupe les jours isolés espacés d'exactement une semaine (au moins MIN_WEEKLY) en séries hebdomadaires."""
+    out, streak = [], []
+
+    def flush():
+        if len(streak) >= MIN_WEEKLY:
+            out.append({"first": streak[0]["first"], "last": streak[-1]["last"], "except": [], "weekly": True})
+        else:
+            out.extend(streak)
+        streak.clear()
+
+    for run in runs:
+        if run["first"] != run["last"]:
+            flush()
+            out.append(run)
+            continue
+        if streak and (run["first"] - streak[-1]["first"]).days != 7:
+            flush()
+        streak.append(run)
+    flush()
+    return out
+
+
+def compress(days) -> list:
+    """
+    Transforme une liste de jours (dates ou chaînes) en séries : quotidiennes
+    (les trous d'au plus MAX_GAP jours sont gardés comme exceptions) ou
+    hebdomadaires (au moins MIN_WEEKLY jours isolés à une semaine d'écart).
+    """
+    days = sorted({d for d in (to_date(x) for x in days) if d})
+    runs = []
+    for day in days:
+        if runs and (day - runs[-1]["last"]).days <= MAX_GAP + 1:
+            run = runs[-1]
+            gap = run["last"] + timedelta(days=1)
+            while gap < day:
+                run["except"].append(gap)
+                gap += timedelta(days=1)
+            run["last"] = day
+        else:
+            runs.append({"first": day, "last": day, "except": []})
+
+    out = []
+    for run in _weekly(runs):
+        if run["first"] == run["last"]:
+            out.append(single(run["first"]))
+            continue
+        entry = {"start": run["first"].isoformat(), "end": run["last"].isoformat()}
+        if run.get("weekly"):
+            entry["freq"] = "weekly"
+        if run["except"]:
+            entry["except"] = [d.isoformat() for d in run["except"]]
+        out.append(entry)
+    return out
+
+
+def _end_of(occ, start):
+    """Dernier jour d'une série (None si elle est ouverte)."""
+    end = to_date(occ.get("end"))
+    if end or occ.get("open"):
+        return end
+    return start
+
+
+def bounds(occurrences):
+    """(premier jour, dernier jour) couverts ; None pour une borne ouverte."""
+    starts, ends = [], []
+    for occ in occurrences or []:
+        start = to_date(occ.get("start"))
+        end = _end_of(occ, start)
+        starts.append(start)
+        ends.append(end)
+    if not starts:
+        return None, None
+    first = None if None in starts else min(starts)
+    last = None if None in ends else max(ends)
+    return first, last
+
+
+def _run_days(occ, window_start=None, window_end=None):
+    start = to_date(occ.get("start"))
+    end = _end_of(occ, start)
+    if start is None:
+        start = window_start
+    if end is None and occ.get("open"):
+        end = window_end
+    if start is None or end is None:
+        return
+    step = timedelta(days=7 if occ.get("freq") == "weekly" else 1)
+    excluded = set(occ.get("except") or ())
+
+    day = start
+    if window_start and day < window_start:
+        skip = (window_start - day).days
+        day += step * (-(-skip // step.days))
+    last = min(end, window_end) if window_end else end
+    while day <= last:
+        if day.isoformat() not in excluded:
+            yield day
+        day += step
+
+
+def expand(occurrences, window_start=None, window_end=None):
+    """Déroule paresseusement les jours couverts (dans la fenêtre si elle est donnée)."""
+    window_start, window_end = to_date(window_start), to_date(window_end)
+    for occ in occurrences or []:
+        yield from _run_days(occ, window_start, window_end)
+
+
+def _next_day(occ, after):
+    if occ.get("open") and not occ.get("end"):
+        # Série ouverte : tous les jours à partir de son début
+        start = to_date(occ.get("start"))
+        return max(start, after) if start else None
+    return next(_run_days(occ, after, None), None)
+
+
+def next_occurrence(occurrences, after) -> date | None:
+    """Premier jour couvert à partir de `after` (inclus)."""
+    after = to_date(after)
+    found = [_next_day(occ, after) for occ in occurrences or []]
+    found = [d for d in found if d]
+    return min(found) if found else None
@@ -2,12 +2,30 @@
 # coding: utf-8
 
 import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
 
+from scrapers import ids, listing
+
 BASE_URL = "https://www.parcexpo-grandpoitiers.fr/les-prochains-evenements/"
 HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
 
+SPEC = {
+    "base_url": "https://www.parcexpo-grandpoitiers.fr",
+    "card": ".event-item, .wp-block-columns, article",  # tolérance large
+    # Vérifie qu'on a un minimum d'infos (sinon on cherche les cartes à l'intérieur)
+    "required_any": ["title", "poster"],
+    "fields": {
+        # 🔗 Lien de redirection
+        "source": {"select": "a[href]", "attr": "href", "url": True},
+        # 🖼️ Image
+        "poster": {"select": "img", "attr": "src"},
+        # 🗓️ Date
+        "date": {"select": [".event-date", "time"]},
+        # 🎫 Nom de l'événement
+        "title": {"select": ["h2", "h3", "strong"]},
+    },
+}
+
 
 def scrape_parc_expo():
     print("🏛️ Parc Expo Grand Poitiers...")
@@ -16,51 +34,23 @@ def scrape_parc_expo():
         print(f"❌ Erreur de chargement ({res.status_code})")
         return []
 
-    soup = BeautifulSoup(res.text, "html.parser")
-
     events = []
-    cards = soup.select(".event-item, .wp-block-columns, article")  # tolérance large
+    # Sélecteur large : une carte imbriquée dans une autre n'est extraite qu'une fois
+    cards = listing.extract(res.content, SPEC)
     if not cards:
         print("⚠️ Aucun événement détecté sur la page.")
         return []
 
     for card in cards:
-        try:
-            # 🔗 Lien de redirection
-            link_tag = card.find("a", href=True)
-            link = link_tag["href"] if link_tag else None
-            if link and not link.startswith("http"):
-                link = "https://www.parcexpo-grandpoitiers.fr" + link
-
-            # 🖼️ Image
-            img_tag = card.find("img")
-            poster = img_tag["src"] if img_tag else None
-
-            # 🗓️ Date
-            date_tag = card.find(class_="event-date") or card.find("time")
-            date = date_tag.get_text(strip=True) if date_tag else None
-
-            # 🎫 Nom de l'événement
-            title_tag = card.find("h2") or card.find("h3") or card.find("strong")
-            title = title_tag.get_text(strip=True) if title_tag else None
-
-            # Vérifie qu’on a un minimum d’infos
-            if not title and not poster:
-                continue
-
-            event = {
-                "title": title or "Événement",
-                "date": date,
-                "poster": poster,
-                "cinema": "Parc Expo Grand Poitiers",
-                "source": link,
-                "scraped_at": datetime.now().isoformat(),
-            }
-
-            events.append(event)
-        except Exception as e:
-            print(f"⚠️ Erreur sur un bloc événement : {e}")
-            continue
+        events.append({
+            "id": ids.make_id("Parc Expo Grand Poitiers", ref=card["source"], title=card["title"], start=card["date"]),
+            "title": card["title"] or "Événement",
+            "date": card["date"],
+            "poster": card["poster"],
+            "cinema": "Parc Expo Grand Poitiers",
+            "source": card["source"],
+            "scraped_at": datetime.now().isoformat(),
+        })
 
     print(f"✅ {len(events)} événements récupérés depuis le Parc Expo.")
     return events
@@ -0,0 +1,107 @@
+# scrapers/pipeline.py
+"""
+Pipeline de scraping en deux étages :
+  - fetch : téléchargements (I/O) dans des threads, renvoie des octets bruts ;
+  - parse : fonctions d'extraction (BeautifulSoup, CPU) dans un pool de processus,
+            octets en entrée, enregistrements simples (dict/list) en sortie.
+
+Les fonctions de parsing passées à parse()/parse_many() doivent être définies
+au niveau module (sérialisables par pickle).
+
+Configuration :
+    PARSE_WORKERS=4   nombre de processus de parsing (défaut : nombre de cœurs)
+    PARSE_WORKERS=0   parsing dans le processus courant (débogage, pdb, profilage)
+"""
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import requests
+
+FETCH_WORKERS = 8
+
+_workers = int(os.environ.get("PARSE_WORKERS", os.cpu_count() or 1))
+_pool = None
+
+
+def configure(workers=None):
+    """Fixe le nombre de processus de parsing (0 = dans le processus courant)."""
+    global _workers
+    shutdown()
+    if workers is not None:
+        _workers = max(0, int(workers))
+
+
+def workers() -> int:
+    return _workers
+
+
+def _get_pool():
+    global _pool
+    if _pool is None and _workers > 0:
+        # "spawn" : pas de fork d'un processus qui a déjà des threads de téléchargement
+        _pool = ProcessPoolExecutor(max_workers=_workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+# =========================================================
+# 🌐 FETCH
+# =========================================================
+def fetch(url, headers=None, timeout=15) -> bytes:
+    """Télécharge une page ; lève une exception sur un code HTTP d'erreur."""
+    r = requests.get(url, headers=headers, timeout=timeout)
+    r.raise_for_status()
+    return r.content
+
+
+def _fetch_or_none(url, headers, timeout):
+    try:
+        return fetch(url, headers=headers, timeout=timeout)
+    except Exception as e:
+        print(f"⚠️ Téléchargement impossible {url} : {e}")
+        return None
+
+
+def fetch_many(urls, headers=None, timeout=15, max_workers=FETCH_WORKERS) -> list:
+    """Télécharge plusieurs pages en parallèle ; None pour celles en échec (ordre conservé)."""
+    urls = list(urls)
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as pool:
+        return list(pool.map(lambda u: _fetch_or_none(u, headers, timeout), urls))
+
+
+# =========================================================
+# 🧩 PARSE
+# =========================================================
+def submit(fn, *args) -> Future:
+    """Lance fn(*args) dans le pool de parsing (ou immédiatement si désactivé)."""
+    pool = _get_pool()
+    if pool is not None:
+        return pool.submit(fn, *args)
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def parse(fn, *args):
+    """Exécute une fonction d'extraction dans le pool et attend son résultat."""
+    return submit(fn, *args).result()
+
+
+def parse_many(fn, *iterables) -> list:
+    """map() de la fonction d'extraction sur le pool (ordre conservé)."""
+    pool = _get_pool()
+    if pool is None:
+        return list(map(fn, *iterables))
+    return list(pool.map(fn, *iterables))
@@ -4,56 +4,71 @@
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
-import json
-import re
+
+from scrapers import enrichment_cache, ids, listing, structured_data
 
 BASE_URL = "https://republic-corner.fr/espace-republic-corner/"
 HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
 
+# Chaque événement est une colonne contenant une image et un bouton Billetterie
+SPEC = {
+    "region": {"name": "div", "class": "et_pb_column"},
+    "card": ".et_pb_column",
+    "required": ["poster", "ticket"],
+    "fields": {
+        "poster": {"select": "img", "attr": "src"},
+        "ticket": {"select": "a.et_pb_button", "attr": "href"},
+    },
+}
+
 
 def get_event_details(ticket_url):
     """Récupère les informations depuis la page billetterie (Shotgun, Weezevent, Fnac...)."""
     try:
-        res = requests.get(ticket_url, headers=HEADERS, timeout=30)
-        if res.status_code != 200:
+        page = structured_data.fetch(ticket_url, headers=HEADERS, timeout=30)
+        if not page:
             return {}
 
-        soup = BeautifulSoup(res.text, "html.parser")
+        event = structured_data.first_event(page)
+        desc = page["meta"].get("description")
 
         # --- SHOTGUN ---
         if "shotgun.live" in ticket_url:
-            # Extraire le JSON-LD contenant les infos de l'événement
-            ld_json = soup.find("script", type="application/ld+json")
-            if ld_json:
-                data = json.loads(ld_json.string)
-                title = data.get("name")
-                date = data.get("startDate")
-                image = data.get("image")
-                address = (
-                    data.get("location", {})
-                    .get("address", {})
-                    .get("streetAddress", "Espace Republic Corner, Poitiers")
-                )
-                desc = soup.find("meta", {"name": "description"})
+            # Le JSON-LD contient les infos de l'événement
+            if event:
+                location = event.get("location") or {}
+                address = location.get("address") if isinstance(location, dict) else None
+                address = address.get("streetAddress") if isinstance(address, dict) else None
                 return {
-                    "title": title,
-                    "date": date,
-                    "description": desc["content"] if desc else None,
-                    "address": address,
-                    "poster": image,
+                    "title": event.get("name"),
+                    "date": event.get("startDate"),
+                    "description": desc,
+                    "address": address or "Espace Republic Corner, Poitiers",
+                    "poster": structured_data.image_url(event.get("image")),
                 }
 
         # --- WEEZEVENT ---
         if "weezevent.com" in ticket_url:
+            details = {
+                "title": event.get("name") or page["og"].get("title"),
+                "date": event.get("startDate"),
+                "description": desc,
+                "poster": structured_data.image_url(event.get("image")) or page["og"].get("image"),
+                "address": "Espace Republic Corner, Poitiers",
+            }
+            if details["title"] and details["date"]:
+                return details
+
+            # Repli DOM : bandeau gemino de Weezevent
+            soup = BeautifulSoup(structured_data.html_of(page, headers=HEADERS, timeout=30), "html.parser")
             title = soup.select_one(".gemino-data-event-title")
             date = soup.select_one(".gemino-data-event-date")
-            desc = soup.find("meta", {"name": "description"})
             image = soup.select_one("#gemino-img-banner")
             return {
-                "title": title.get_text(strip=True) if title else None,
-                "date": date.get_text(strip=True) if date else None,
-                "description": desc["content"] if desc else None,
-                "poster": image["src"] if image else None,
+                "title": title.get_text(strip=True) if title else details["title"],
+                "date": date.get_text(strip=True) if date else details["date"],
+                "description": desc,
+                "poster": image["src"] if image else details["poster"],
                 "address": "Espace Republic Corner, Poitiers",
             }
 
@@ -63,46 +78,59 @@ def get_event_details(ticket_url):
         return {}
 
 
-def scrape_republic_corner():
+def _apply_details(event, details):
+    title = details.get("title") or "Événement Republic Corner"
+    date = details.get("date")
+    event.update({
+        "title": title.strip(),
+        "date": date.strip() if isinstance(date, str) else date,
+        "description": details.get("description"),
+        "poster": details.get("poster") or event["poster"],
+        "address": details.get("address", "Espace Republic Corner, Poitiers"),
+    })
+
+
+def enrich_events(events):
+    """
+    Complète titre, date, description et affiche depuis les pages billetterie
+    (seulement pour les cartes nouvelles ou modifiées, voir enrichment_cache).
+    """
+    details = enrichment_cache.enrich("republic_corner", events, get_event_details, fields=("source", "poster"))
+    for event in events:
+        _apply_details(event, details.get(event["source"]) or {})
+    return events
+
+
+def scrape_republic_corner(enrich=True):
+    """
+    enrich=False : cartes de la page seule (affiche + billetterie, sans titre),
+    à compléter plus tard avec enrich_events().
+    """
     print("🎭 Republic Corner...")
     res = requests.get(BASE_URL, headers=HEADERS, timeout=30)
     if res.status_code != 200:
         print(f"❌ Erreur de chargement ({res.status_code})")
         return []
 
-    soup = BeautifulSoup(res.text, "html.parser")
     events = []
 
-    # Chaque événement est une colonne contenant une image et un bouton Billetterie
-    for col in soup.select(".et_pb_column"):
-        img_tag = col.select_one("img")
-        btn_tag = col.select_one("a.et_pb_button")
-
-        if not img_tag or not btn_tag:
-            continue
-
-        poster = img_tag.get("src")
-        ticket_link = btn_tag.get("href")
-
-        # Détails via page billetterie
-        details = get_event_details(ticket_link)
-        title = details.get("title") or "Événement Republic Corner"
-        date = details.get("date")
-        description = details.get("description")
-        address = details.get("address", "Espace Republic Corner, Poitiers")
-
-        event = {
-            "title": title.strip(),
-            "date": date.strip() if isinstance(date, str) else date,
-            "description": description,
-            "poster": details.get("poster") or poster,
-            "address": address,
+    for card in listing.extract(res.content, SPEC):
+        events.append({
+            # Le lien billetterie identifie l'événement (titre inconnu avant enrichissement)
+            "id": ids.make_id("Republic Corner", ref=card["ticket"]),
+            "title": None,
+            "date": None,
+            "description": None,
+            "poster": card["poster"],
+            "address": "Espace Republic Corner, Poitiers",
             "cinema": "Republic Corner",
-            "source": ticket_link,
+            "source": card["ticket"],
             "scraped_at": datetime.now().isoformat()
-        }
+        })
 
-        events.append(event)
+    # Détails via page billetterie
+    if enrich:
+        enrich_events(events)
 
     print(f"✅ {len(events)} événements récupérés depuis Republic Corner.")
     return events
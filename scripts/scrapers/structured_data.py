@@ -0,0 +1,165 @@
+# scrapers/structured_data.py
+"""
+Extraction légère des données structurées d'une page (JSON-LD, OpenGraph, meta description).
+Un simple scan des balises <meta>/<link>/<script> suffit : pas de BeautifulSoup complet.
+Les données extraites (pas le HTML) sont mises en cache par URL canonique pour toute la durée du run.
+"""
+import html
+import json
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+
+_TAG_RE = re.compile(r"<(meta|link)\b([^>]*)>", re.I)
+_ATTR_RE = re.compile(r'([a-zA-Z_:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+_LD_RE = re.compile(
+    r"<script\b[^>]*type\s*=\s*[\"']?application/ld\+json[\"']?[^>]*>(.*?)</script>",
+    re.I | re.S,
+)
+_HEAD_END_RE = re.compile(r"</head\s*>", re.I)
+
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+
+# URL canonique → données extraites (sans le HTML) ; URL demandée → URL canonique
+_CACHE = {}
+_ALIASES = {}
+
+
+def canonical_url(url: str) -> str:
+    """Normalise une URL : schéma/hôte en minuscules, sans fragment ni paramètres de tracking."""
+    parts = urlsplit(url.strip())
+    query = [(k, v) for k, v in parse_qsl(parts.query) if not k.startswith(_TRACKING_PARAMS)]
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+
+def _attrs(raw: str) -> dict:
+    out = {}
+    for m in _ATTR_RE.finditer(raw):
+        value = m.group(2) if m.group(2) is not None else m.group(3) if m.group(3) is not None else m.group(4)
+        out[m.group(1).lower()] = html.unescape(value)
+    return out
+
+
+def _flatten_ld(node, out):
+    """Aplatit les blocs JSON-LD (listes, @graph) en une liste d'objets."""
+    if isinstance(node, list):
+        for item in node:
+            _flatten_ld(item, out)
+    elif isinstance(node, dict):
+        if "@graph" in node:
+            _flatten_ld(node["@graph"], out)
+        else:
+            out.append(node)
+
+
+def _is_event(obj: dict) -> bool:
+    types = obj.get("@type") or []
+    if isinstance(types, str):
+        types = [types]
+    return any(t.endswith("Event") for t in types)
+
+
+def extract(page_html: str) -> dict:
+    """
+    Retourne {"canonical", "og", "meta", "jsonld", "events"} :
+      - og     : propriétés OpenGraph ({"image": ..., "title": ...})
+      - meta   : balises <meta name=...> (description...)
+      - jsonld : tous les objets JSON-LD de la page
+      - events : les objets JSON-LD de type *Event
+    Les <meta>/<link> ne sont lus que dans le <head>, les <script> JSON-LD partout.
+    """
+    head_end = _HEAD_END_RE.search(page_html)
+    head = page_html[: head_end.start()] if head_end else page_html
+
+    og, meta, canonical = {}, {}, None
+    for m in _TAG_RE.finditer(head):
+        attrs = _attrs(m.group(2))
+        if m.group(1).lower() == "link":
+            if "canonical" in attrs.get("rel", "").lower().split() and attrs.get("href"):
+                canonical = attrs["href"]
+            continue
+        content = attrs.get("content")
+        if content is None:
+            continue
+        prop = attrs.get("property", "")
+        if prop.startswith("og:"):
+            og.setdefault(prop[3:], content)
+        elif attrs.get("name"):
+            meta.setdefault(attrs["name"].lower(), content)
+
+    jsonld = []
+    for m in _LD_RE.finditer(page_html):
+        try:
+            _flatten_ld(json.loads(m.group(1).strip()), jsonld)
+        except ValueError:
+            continue
+
+    return {
+        "canonical": canonical,
+        "og": og,
+        "meta": meta,
+        "jsonld": jsonld,
+        "events": [obj for obj in jsonld if _is_event(obj)],
+    }
+
+
+def first_event(data: dict) -> dict:
+    """Premier objet JSON-LD de type Event, ou {}."""
+    events = data.get("events") or []
+    return events[0] if events else {}
+
+
+def image_url(value):
+    """Normalise le champ image JSON-LD (chaîne, liste ou ImageObject)."""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get("url")
+    return value or None
+
+
+def description(data: dict):
+    """Description JSON-LD, sinon og:description, sinon meta description."""
+    return (
+        first_event(data).get("description")
+        or data.get("og", {}).get("description")
+        or data.get("meta", {}).get("description")
+    )
+
+
+def fetch(url: str, headers=None, timeout=10) -> dict:
+    """
+    Télécharge une page et en extrait les données structurées (voir extract()).
+    Le résultat contient aussi "url" et "status", plus "html" quand la page vient
+    d'être téléchargée (voir html_of() pour un repli DOM).
+    Mis en cache par URL canonique ; retourne {} si la page est inaccessible.
+    """
+    key = _ALIASES.get(canonical_url(url), canonical_url(url))
+    if key in _CACHE:
+        return dict(_CACHE[key])
+
+    res = requests.get(url, headers=headers, timeout=timeout)
+    if res.status_code != 200:
+        return {}
+
+    data = extract(res.text)
+    data.update({"url": url, "status": res.status_code})
+
+    _CACHE[key] = data
+    if data["canonical"]:
+        canonical = canonical_url(data["canonical"])
+        _ALIASES[key] = canonical
+        _CACHE.setdefault(canonical, data)
+    return {**data, "html": res.text}
+
+
+def html_of(page: dict, headers=None, timeout=10) -> str:
+    """HTML brut d'une page de fetch() ; retéléchargé si elle vient du cache ("" si inaccessible)."""
+    if page.get("html") is not None:
+        return page["html"]
+    res = requests.get(page["url"], headers=headers, timeout=timeout)
+    return res.text if res.status_code == 200 else ""
@@ -1,22 +1,29 @@
 # scrapers/tap.py
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from datetime import datetime
 import re, html
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
 
+from scrapers import enrichment_cache, ids, occurrences, pipeline, structured_data, wp_discovery
+from scrapers.french_dates import is_open_ended, parse_date_range, to_iso
+
 BASE_URL = "https://www.tap-poitiers.com"
+CINEMA_NAME = "TAP Cinéma Poitiers"
+
+_DURATION_RE = re.compile(r"Durée\s*:?\s*(?:<[^>]+>\s*)*(\d+h\d+|\d+h|\d+\s?min)")
+# Seul le bloc de contenu de la fiche est parsé pour le synopsis
+# (au parsing, "class" est encore une chaîne brute : on la découpe soi-même)
+_CONTENT_CLASSES = {"entry-content", "article-content"}
+_CONTENT_STRAINER = SoupStrainer(class_=lambda c: bool(c) and not _CONTENT_CLASSES.isdisjoint(c.split()))
 
 # =========================================================
 # 🎬 CINÉMA
 # =========================================================
-def scrape_cinema():
-    """Scrape la liste des films TAP Cinéma + détail pour durée et description"""
-    url = f"{BASE_URL}/cinema/"
-    r = requests.get(url)
-    r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
-    films = []
+def parse_cinema_listing(content: bytes):
+    """Liste des films (octets HTML → [{"title", "source", "poster"}])."""
+    soup = BeautifulSoup(content, "html.parser")
+    listed = []
 
     for film in soup.select("article"):
         title_el = film.select_one("h2, h3, .title")
@@ -38,42 +45,73 @@ def scrape_cinema():
             src = img["src"]
             poster = src if src.startswith("http") else BASE_URL + src
 
-        # --- Aller dans la fiche du film pour extraire durée et description ---
-        duration = None
-        description = None
-        if source:
-            try:
-                detail_res = requests.get(source, timeout=10)
-                if detail_res.ok:
-                    detail_soup = BeautifulSoup(detail_res.text, "html.parser")
-
-                    # Durée (ex : "Durée : 1h47")
-                    dur_el = detail_soup.find(text=re.compile(r"Durée\s*:?"))
-                    if dur_el:
-                        match = re.search(r"(\d+h\d+|\d+h|\d+\s?min)", dur_el)
-                        if match:
-                            duration = match.group(1).replace(" ", "") + " min" if "min" not in match.group(1) else match.group(1)
-
-                    # Description / synopsis
-                    desc_el = detail_soup.select_one(".entry-content p, .article-content p")
-                    if desc_el:
-                        description = desc_el.get_text(strip=True)
-            except Exception:
-                pass
+        listed.append({"title": title, "source": source, "poster": poster})
+
+    return listed
+
+
+def _film_details(source):
+    """Durée et description depuis la fiche du film (None si inaccessible)."""
+    try:
+        page = structured_data.fetch(source, timeout=10)
+    except Exception:
+        return None
+    if not page:
+        return None
+
+    # Durée (ex : "Durée : 1h47"), lue directement dans le HTML brut
+    duration = None
+    page_html = structured_data.html_of(page)
+    match = _DURATION_RE.search(page_html)
+    if match:
+        duration = match.group(1).replace(" ", "") + " min" if "min" not in match.group(1) else match.group(1)
+
+    # Synopsis de la fiche d'abord (seul le bloc de contenu est parsé) ;
+    # la description générique (og/meta) en repli
+    description = None
+    content = BeautifulSoup(page_html, "html.parser", parse_only=_CONTENT_STRAINER)
+    desc_el = content.select_one("p")
+    if desc_el:
+        description = desc_el.get_text(strip=True)
+    if not description:
+        description = structured_data.description(page)
+
+    return {"duration": duration, "description": description}
+
 
+def enrich_cinema(films):
+    """Durée et description depuis les fiches (seulement celles nouvelles ou modifiées)."""
+    fingerprints = {f["source"]: enrichment_cache.fingerprint(f, ("source", "title", "poster")) for f in films}
+    details = wp_discovery.enrich("tap_cinema", (f["source"] for f in films), _film_details, fingerprints=fingerprints)
+    for film in films:
+        detail = details.get(film["source"]) or {}
+        film["duration"] = detail.get("duration")
+        film["description"] = detail.get("description")
+    return films
+
+
+def scrape_cinema(enrich=True):
+    """Scrape la liste des films TAP Cinéma + détail pour durée et description"""
+    content = pipeline.fetch(f"{BASE_URL}/cinema/")
+
+    films = []
+    for listed in pipeline.parse(parse_cinema_listing, content):
         films.append({
-            "title": title,
-            "duration": duration,
-            "description": description,
-            "poster": poster,
+            "id": ids.make_id(CINEMA_NAME, ref=listed["source"], title=listed["title"]),
+            "title": listed["title"],
+            "duration": None,
+            "description": None,
+            "poster": listed["poster"],
             "genres": None,
             "certificate": None,
             "release": None,
-            "cinema": "TAP Cinéma Poitiers",
-            "source": source,
+            "cinema": CINEMA_NAME,
+            "source": listed["source"],
             "scraped_at": datetime.utcnow().isoformat()
         })
 
+    if enrich:
+        enrich_cinema(films)
     return films
 
 
@@ -92,21 +130,23 @@ def _extract_bg_url(style_value: str) -> str | None:
     return urljoin(BASE_URL, raw)
 
 def _fallback_detail_image(detail_url: str) -> str | None:
-    """Va sur la page détail pour récupérer og:image (fallback propre)."""
+    """
+    Va sur la page détail pour récupérer og:image (fallback propre).
+    "" si la page n'a pas d'image, None si elle est inaccessible.
+    """
     try:
-        r = requests.get(detail_url, timeout=10)
-        if not r.ok:
+        page = structured_data.fetch(detail_url, timeout=10)
+        if not page:
             return None
-        s = BeautifulSoup(r.text, "html.parser")
-        og = s.select_one('meta[property="og:image"]')
-        if og and og.get("content"):
-            return urljoin(BASE_URL, og["content"])
+        if page["og"].get("image"):
+            return urljoin(BASE_URL, page["og"]["image"])
+        s = BeautifulSoup(structured_data.html_of(page), "html.parser")
         img = s.select_one(".entry-content img, article img")
         if img and img.get("src"):
             return urljoin(BASE_URL, img["src"])
+        return ""
     except Exception:
-        pass
-    return None
+        return None
 
 def _is_placeholder(url: str | None) -> bool:
     if not url:
@@ -114,81 +154,183 @@ def _is_placeholder(url: str | None) -> bool:
     return "themes/tap/images/template/default-image" in url
 
 
-def scrape_spectacles():
+# --- Pagination : data-next du bouton "Voir plus" ---
+MAX_SPECTACLE_PAGES = 20
+# Champs de la carte dont un changement relance la page détail
+SPECTACLE_CARD_FIELDS = ("source", "title", "date", "poster", "reservation")
+
+# Balise portant la classe "bt-more" (pas "bt-more-link", ni "bt-more" dans un href)
+_NEXT_TAG_RE = re.compile(r"""<[^>]*(?<![\w-])class\s*=\s*["'][^"']*(?<![\w-])bt-more(?![\w-])[^>]*>""", re.I)
+_DATA_NEXT_RE = re.compile(r'data-next\s*=\s*["\']([^"\']+)["\']', re.I)
+
+
+def _find_next_url(page_html: str) -> str | None:
+    """Repère l'URL de la page suivante par un simple scan du HTML brut (sans soup)."""
+    for tag in _NEXT_TAG_RE.finditer(page_html):
+        m = _DATA_NEXT_RE.search(tag.group(0))
+        if m:
+            return urljoin(BASE_URL, html.unescape(m.group(1)))
+    return None
+
+
+def _iter_listing_pages(start_url: str, max_pages: int = MAX_SPECTACLE_PAGES):
+    """
+    Génère les pages de la liste des spectacles en pipeline :
+    dès que l'URL de la page N+1 est connue, son téléchargement démarre
+    pendant que l'appelant parse la page N.
+    S'arrête sur un cycle (data-next déjà vu) ou au-delà de max_pages.
+    """
+    seen = {start_url}
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(pipeline.fetch, start_url)
+        count = 0
+        while pending is not None:
+            page = pending.result()
+            count += 1
+            pending = None
+
+            next_url = _find_next_url(page.decode("utf-8", "replace"))
+            if next_url and next_url in seen:
+                print(f"⚠️  Pagination TAP : cycle détecté sur {next_url}")
+            elif next_url and count >= max_pages:
+                print(f"⚠️  Pagination TAP : limite de {max_pages} pages atteinte")
+            elif next_url:
+                seen.add(next_url)
+                pending = pool.submit(pipeline.fetch, next_url)
+
+            yield page
+
+
+def _parse_spectacle_card(block) -> dict | None:
+    """Extrait un spectacle depuis un bloc .col-item de la liste."""
+    # Image principale dans .grid-block__picture
+    poster = None
+    pic = block.select_one(".grid-block__picture")
+    if pic and pic.get("style"):
+        poster = _extract_bg_url(pic.get("style"))
+
+    # Article lié
+    article = block.select_one("article")
+    if not article:
+        return None
+
+    # Titre + lien source
+    title_el = article.select_one(".grid-block__title a, h2 a, h3 a")
+    title = title_el.get_text(strip=True) if title_el else "Sans titre"
+    href = title_el.get("href") if title_el else None
+    source = urljoin(BASE_URL, href) if href else None
+
+    # Date
+    date_el = article.select_one("time.grid-block__date, .grid-block__date, time")
+    date_text = date_el.get_text(" ", strip=True) if date_el else "Date à venir"
+
+    # Reservation
+    reservation = None
+    res_a = article.select_one("a[href*='billet'], a[href*='ticket'], a[href*='resa']")
+    if res_a and res_a.get("href"):
+        reservation = urljoin(BASE_URL, res_a["href"])
+
+    # Occurrences : "Du 4 au 13 septembre 2026", "2 octobre 2026"
+    start, end = parse_date_range(date_text)
+
+    return {
+        "id": ids.make_id("TAP Poitiers", ref=source, title=title, start=to_iso(start)),
+        "title": title,
+        "date": date_text,
+        "occurrences": occurrences.span(to_iso(start), to_iso(end), open_end=is_open_ended(date_text)),
+        "release": None,
+        "poster": poster,
+        "cinema": "TAP Poitiers",
+        "source": source,
+        "reservation": reservation,
+        "scraped_at": datetime.utcnow().isoformat()
+    }
+
+
+def parse_spectacle_page(content: bytes):
+    """Cartes d'une page de la liste (octets HTML → liste de dicts)."""
+    soup = BeautifulSoup(content, "html.parser")
+    cards = (_parse_spectacle_card(block) for block in soup.select(".grid-list .col-item"))
+    return [card for card in cards if card]
+
+
+def iter_spectacle_cards(max_pages: int = MAX_SPECTACLE_PAGES):
+    """Générateur des cartes spectacles, page après page, sans enrichissement."""
+    for page in _iter_listing_pages(f"{BASE_URL}/spectacle/", max_pages):
+        yield from pipeline.parse(parse_spectacle_page, page)
+
+
+def _needs_fallback(card) -> bool:
+    return _is_placeholder(card["poster"]) and bool(card["source"])
+
+
+def _fallback_session():
+    return wp_discovery.Session("tap_spectacle", _fallback_detail_image, max_workers=4)
+
+
+def _submit_fallback(session, card):
+    return session.submit(card["source"], enrichment_cache.fingerprint(card, SPECTACLE_CARD_FIELDS))
+
+
+def enrich_spectacles(spectacles):
+    """
+    Fallback og:image pour les affiches par défaut, sans retélécharger les
+    pages détail inchangées depuis le run précédent.
+    """
+    missing = [card for card in spectacles if _needs_fallback(card)]
+    if missing:
+        session = _fallback_session()
+        for card in missing:
+            _submit_fallback(session, card)
+        images = session.close()
+        for card in missing:
+            card["poster"] = images.get(card["source"]) or None
+    return spectacles
+
+
+def scrape_spectacles(enrich=True):
     """Scrape la page des spectacles TAP avec images CSS + fallback og:image"""
-    spectacles = []
-    next_url = f"{BASE_URL}/spectacle/"
-
-    while next_url:
-        r = requests.get(next_url, timeout=15)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-
-        for block in soup.select(".grid-list .col-item"):
-            # Image principale dans .grid-block__picture
-            poster = None
-            pic = block.select_one(".grid-block__picture")
-            if pic and pic.get("style"):
-                poster = _extract_bg_url(pic.get("style"))
-
-            # Article lié
-            article = block.select_one("article")
-            if not article:
-                continue
-
-            # Titre + lien source
-            title_el = article.select_one(".grid-block__title a, h2 a, h3 a")
-            title = title_el.get_text(strip=True) if title_el else "Sans titre"
-            href = title_el.get("href") if title_el else None
-            source = urljoin(BASE_URL, href) if href else None
-
-            # Date
-            date_el = article.select_one("time.grid-block__date, .grid-block__date, time")
-            date_text = date_el.get_text(" ", strip=True) if date_el else "Date à venir"
-
-            # Reservation
-            reservation = None
-            res_a = article.select_one("a[href*='billet'], a[href*='ticket'], a[href*='resa']")
-            if res_a and res_a.get("href"):
-                reservation = urljoin(BASE_URL, res_a["href"])
-
-            # Fallback si placeholder ou pas d'image
-            if _is_placeholder(poster) and source:
-                poster = _fallback_detail_image(source)
-
-            spectacles.append({
-                "title": title,
-                "date": date_text,
-                "release": None,
-                "poster": poster,
-                "cinema": "TAP Poitiers",
-                "source": source,
-                "reservation": reservation,
-                "scraped_at": datetime.utcnow().isoformat()
-            })
-
-        # Pagination (si bouton "Voir plus")
-        more_btn = soup.select_one(".load-more .bt-more[data-next]")
-        next_url = more_btn.get("data-next") if more_btn else None
+    if not enrich:
+        return list(iter_spectacle_cards())
 
+    # Le fallback (cache compris) démarre dès qu'une carte sort du générateur,
+    # sans attendre la dernière page de la liste.
+    spectacles, fallbacks = [], []
+    session = _fallback_session()
+    try:
+        for card in iter_spectacle_cards():
+            spectacles.append(card)
+            if _needs_fallback(card):
+                fallbacks.append((card, _submit_fallback(session, card)))
+    finally:
+        session.close()
+    for card, future in fallbacks:
+        card["poster"] = future.result() or None
     return spectacles
 
 
 # =========================================================
 # 🔗 EXPORT PRINCIPAL
 # =========================================================
-def scrape_tap():
-    """Combine cinéma + spectacle"""
+def scrape_tap(enrich=True):
+    """Combine cinéma + spectacle (enrich=False : sans les pages détail)"""
     try:
-        cinema = scrape_cinema()
+        cinema = scrape_cinema(enrich)
     except Exception as e:
         print(f"⚠️  Erreur cinéma TAP : {e}")
         cinema = []
 
     try:
-        spectacle = scrape_spectacles()
+        spectacle = scrape_spectacles(enrich)
     except Exception as e:
         print(f"⚠️  Erreur spectacle TAP : {e}")
         spectacle = []
 
     return {"cinema": cinema, "spectacle": spectacle}
+
+
+def enrich_events(events):
+    """Enrichit une liste mêlant films et spectacles TAP (voir scrape_tap(enrich=False))."""
+    enrich_cinema([ev for ev in events if ev.get("cinema") == CINEMA_NAME])
+    enrich_spectacles([ev for ev in events if ev.get("cinema") != CINEMA_NAME])
+    return events
@@ -0,0 +1,167 @@
+# scrapers/wp_discovery.py
+"""
+Découverte des changements sur les sites WordPress (EMF, TAP...).
+
+Plutôt que de retélécharger chaque page détail à chaque run, on récupère
+la date de dernière modification de chaque URL :
+  1. via l'API REST (wp-json/wp/v2/<type>?_fields=link,modified_gmt) si exposée ;
+  2. sinon via les sitemaps (wp-sitemap.xml, sitemap_index.xml, sitemap.xml) et leur <lastmod>.
+
+Les détails déjà extraits sont conservés par enrichment_cache avec le
+lastmod correspondant : seules les pages nouvelles ou modifiées sont
+retéléchargées. Une URL sans lastmod connu (découverte indisponible, page
+absente du sitemap) se rabat sur l'empreinte de sa carte de listing.
+
+    details = wp_discovery.enrich("emf", urls, scrape_event_page)
+
+    session = wp_discovery.Session("tap_spectacle", fetch_image)   # au fil du listing
+    future = session.submit(url, card_fingerprint)
+    images = session.close()
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from scrapers import enrichment_cache, pipeline
+from scrapers.structured_data import canonical_url
+
+# base_url : racine WordPress ; types : types de contenu REST / fragments des sitemaps à lire
+SITES = {
+    "emf": {"base_url": "https://emf.fr", "types": ["event"]},
+    "tap_cinema": {"base_url": "https://www.tap-poitiers.com", "types": ["cinema", "film"]},
+    "tap_spectacle": {"base_url": "https://www.tap-poitiers.com", "types": ["spectacle"]},
+}
+
+SITEMAPS = ("/wp-sitemap.xml", "/sitemap_index.xml", "/sitemap.xml")
+MAX_REST_PAGES = 20
+MAX_SITEMAPS = 30
+
+_LOC_RE = re.compile(r"<(url|sitemap)>(.*?)</\1>", re.I | re.S)
+_FIELD_RE = re.compile(r"<(loc|lastmod)>\s*(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?\s*</\1>", re.I | re.S)
+
+# site → {url canonique: lastmod} (une seule découverte par run)
+_LASTMODS = {}
+
+
+# =========================================================
+# 🔎 DÉCOUVERTE
+# =========================================================
+def _rest_lastmods(base_url, post_type, timeout):
+    found = {}
+    page = 1
+    while page <= MAX_REST_PAGES:
+        res = requests.get(
+            f"{base_url}/wp-json/wp/v2/{post_type}",
+            params={"per_page": 100, "page": page, "_fields": "link,modified_gmt"},
+            timeout=timeout,
+        )
+        if res.status_code != 200:
+            break
+        items = res.json()
+        if not isinstance(items, list):
+            break
+        for item in items:
+            if item.get("link") and item.get("modified_gmt"):
+                found[canonical_url(item["link"])] = item["modified_gmt"]
+        if page >= int(res.headers.get("X-WP-TotalPages", page)):
+            break
+        page += 1
+    return found
+
+
+def _sitemap_entries(xml):
+    """[(balise, loc, lastmod)] d'un sitemap ou d'un index de sitemaps."""
+    entries = []
+    for m in _LOC_RE.finditer(xml):
+        fields = {name.lower(): value.strip() for name, value in _FIELD_RE.findall(m.group(2))}
+        if fields.get("loc"):
+            entries.append((m.group(1).lower(), fields["loc"], fields.get("lastmod")))
+    return entries
+
+
+def _sitemap_lastmods(base_url, types, timeout):
+    for path in SITEMAPS:
+        res = requests.get(base_url + path, timeout=timeout)
+        if res.status_code != 200 or "<" not in res.text:
+            continue
+
+        entries = _sitemap_entries(res.text)
+        children = [loc for tag, loc, _ in entries if tag == "sitemap"]
+        if children:
+            # Index : seulement les sitemaps des types suivis (s'il y en a)
+            wanted = [loc for loc in children if any(t in loc for t in types)] or children
+            entries = []
+            for loc in wanted[:MAX_SITEMAPS]:
+                child = requests.get(loc, timeout=timeout)
+                if child.status_code == 200:
+                    entries.extend(_sitemap_entries(child.text))
+
+        found = {canonical_url(loc): lastmod for tag, loc, lastmod in entries if tag == "url" and lastmod}
+        if found:
+            return found
+    return {}
+
+
+def lastmods(site, timeout=10) -> dict:
+    """{url canonique: lastmod} pour un site de SITES ({} si rien n'est exposé)."""
+    if site in _LASTMODS:
+        return _LASTMODS[site]
+
+    config = SITES[site]
+    found = {}
+    try:
+        for post_type in config["types"]:
+            found.update(_rest_lastmods(config["base_url"], post_type, timeout))
+        if not found:
+            found = _sitemap_lastmods(config["base_url"], config["types"], timeout)
+    except Exception as e:
+        print(f"⚠️ Découverte WordPress impossible ({site}) : {e}")
+
+    _LASTMODS[site] = found
+    return found
+
+
+# =========================================================
+# 💾 CACHE DES DÉTAILS (enrichment_cache)
+# =========================================================
+class Session:
+    """
+    enrich() au fil de l'eau : la découverte des lastmod démarre à la
+    création de la session, submit(url, empreinte de carte) retourne un
+    Future dès que la carte est connue, close() enregistre le cache et
+    retourne {url: détails}.
+    """
+
+    def __init__(self, site, fetch_detail, max_workers=pipeline.FETCH_WORKERS):
+        self.enricher = enrichment_cache.Enricher(site, fetch_detail, max_workers)
+        self._discovery = ThreadPoolExecutor(max_workers=1)
+        self._lastmods = self._discovery.submit(lastmods, site)
+
+    def _key(self, url, card):
+        lastmod = self._lastmods.result().get(canonical_url(url))
+        return f"{lastmod}|{card or ''}" if lastmod else card
+
+    def submit(self, url, card=None):
+        return self.enricher.submit(url, lambda: self._key(url, card))
+
+    def close(self) -> dict:
+        try:
+            return self.enricher.close()
+        finally:
+            self._discovery.shutdown(wait=False)
+
+
+def enrich(site, urls, fetch_detail, max_workers=pipeline.FETCH_WORKERS, fingerprints=None) -> dict:
+    """
+    {url: détails} pour chaque URL, en n'appelant fetch_detail(url) que pour
+    les pages nouvelles ou modifiées depuis le run précédent : lastmod
+    WordPress changé, ou, sans lastmod connu, empreinte de la carte de
+    listing changée (fingerprints = {url: empreinte}, voir enrichment_cache).
+    Une URL sans lastmod ni empreinte est toujours retéléchargée.
+    """
+    fingerprints = fingerprints or {}
+    session = Session(site, fetch_detail, max_workers)
+    for url in dict.fromkeys(u for u in urls if u):
+        session.submit(url, fingerprints.get(url))
+    return session.close()
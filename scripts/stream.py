@@ -0,0 +1,185 @@
+# coding: utf-8
+"""
+Protocole de streaming des scrapers et fusion à mémoire bornée.
+
+Un scraper peut retourner une liste, un générateur ou un générateur
+asynchrone d'événements : iter_events() les parcourt tous de la même façon.
+Les événements traversent ensuite :
+  - Deduper    : dédoublonnage incrémental (même clé que postprocess.dedupe) ;
+  - SortedRuns : tri par source puis fusion k-voies (heapq.merge), les
+                 séries dépassant SPILL_THRESHOLD événements étant écrites
+                 sur disque (JSON lines) ;
+  - EventWriter / write_events : écriture incrémentale d'events.json
+                   (json.JSONEncoder.iterencode), même format que postprocess.write_output.
+"""
+import asyncio
+import heapq
+import inspect
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import postprocess
+
+SPILL_THRESHOLD = int(os.environ.get("STREAM_SPILL_THRESHOLD", 5000))
+
+
+def _iter_async(agen):
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
+
+
+def iter_events(result):
+    """Parcourt le résultat d'un scraper (liste, générateur, générateur async ou coroutine)."""
+    if result is None:
+        return
+    if inspect.iscoroutine(result):
+        result = asyncio.run(result)
+        if result is None:
+            return
+    if inspect.isasyncgen(result):
+        yield from _iter_async(result)
+    else:
+        yield from result
+
+
+class Deduper:
+    """Dédoublonnage incrémental : ne garde que la clé des événements déjà vus."""
+
+    def __init__(self):
+        self.seen = set()
+
+    def is_new(self, ev) -> bool:
+        key = postprocess.dedupe_key(ev)
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        return True
+
+
+class SortedRuns:
+    """
+    Séries triées (une par source, ou par tranche de SPILL_THRESHOLD événements),
+    gardées en mémoire tant qu'elles sont petites, sinon écrites sur disque.
+    L'itération fusionne les séries dans l'ordre de postprocess.sort_key ;
+    à clé égale, l'ordre d'arrivée est conservé (comme un tri stable).
+    """
+
+    def __init__(self, threshold=SPILL_THRESHOLD):
+        self.threshold = threshold
+        self.buffer = []
+        self.runs = []  # listes triées ou chemins de fichiers
+        self.in_memory = 0
+        self.spilled = 0
+        self._tmp = None
+
+    def add(self, ev):
+        self.buffer.append(ev)
+        if len(self.buffer) >= self.threshold:
+            self._flush(force_spill=True)
+
+    def end_source(self):
+        """Clôt la série de la source courante."""
+        self._flush()
+
+    def _flush(self, force_spill=False):
+        if not self.buffer:
+            return
+        self.buffer.sort(key=postprocess.sort_key)
+        if force_spill or self.in_memory + len(self.buffer) > self.threshold:
+            self.runs.append(self._spill(self.buffer))
+            self.spilled += len(self.buffer)
+        else:
+            self.runs.append(self.buffer)
+            self.in_memory += len(self.buffer)
+        self.buffer = []
+
+    def _spill(self, events):
+        if self._tmp is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix="events-runs-")
+        path = os.path.join(self._tmp.name, f"{len(self.runs)}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for ev in events:
+                f.write(json.dumps(ev, ensure_ascii=False))
+                f.write("\n")
+        return path
+
+    @staticmethod
+    def _read(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def __iter__(self):
+        self._flush()
+        runs = [self._read(run) if isinstance(run, str) else iter(run) for run in self.runs]
+        return heapq.merge(*runs, key=postprocess.sort_key)
+
+    def close(self):
+        if self._tmp is not None:
+            self._tmp.cleanup()
+            self._tmp = None
+
+
+class EventWriter:
+    """
+    Écriture incrémentale d'un fichier d'événements (même format que
+    postprocess.write_output) : add(ev) au fil de l'eau, puis close()
+    (renommage du fichier temporaire) ou discard().
+    """
+
+    def __init__(self, path="events.json", seq=None):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.count = 0
+        self.encoder = json.JSONEncoder(ensure_ascii=False, indent=2)
+        header = {"generated_at": datetime.now(timezone.utc).isoformat(), "seq": seq}
+        self.file = open(self.tmp_path, "w", encoding="utf-8")
+        self.file.write("{\n")
+        for name, value in header.items():
+            self.file.write(f"  {json.dumps(name)}: {self.encoder.encode(value)},\n")
+        self.file.write('  "events": [')
+
+    def add(self, ev):
+        self.file.write(",\n    " if self.count else "\n    ")
+        # Les sauts de ligne de iterencode sont structurels (ceux des chaînes sont échappés)
+        for chunk in self.encoder.iterencode(ev):
+            self.file.write(chunk.replace("\n", "\n    "))
+        self.count += 1
+
+    def close(self) -> int:
+        """Termine le fichier et le met en place ; retourne le nombre d'événements écrits."""
+        self.file.write("\n  ]\n}" if self.count else "]\n}")
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        return self.count
+
+    def discard(self):
+        """Abandonne l'écriture : le fichier existant n'est pas touché."""
+        if not self.file.closed:
+            self.file.close()
+            os.remove(self.tmp_path)
+
+
+def write_events(events, seq=None, path="events.json") -> int:
+    """
+    Écrit events.json au fil de l'eau (fichier temporaire puis renommage) ;
+    retourne le nombre d'événements écrits.
+    """
+    writer = EventWriter(path, seq)
+    try:
+        for ev in events:
+            writer.add(ev)
+    except BaseException:
+        writer.discard()
+        raise
+    return writer.close()
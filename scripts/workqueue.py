@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+File de travaux locale (SQLite) pour répartir le scraping entre plusieurs workers.
+
+Le coordinateur crée un lot : un job par (ville, source) décrit dans
+scripts/cities.json. Les workers (processus ou machines partageant le
+fichier de la file) réclament un job avec un bail, l'exécutent, écrivent
+leur sortie partielle dans partials/<lot>/<ville>/<source>.json puis le
+marquent terminé. Un bail expiré (worker planté) remet le job en jeu,
+jusqu'à MAX_ATTEMPTS tentatives. L'étape de fusion combine les sorties
+partielles d'une ville : publication complète du site (aggregator.publish)
+pour une ville marquée "publish", sinon dédoublonnage, tri et écriture
+de sa sortie (events-<ville>.json par défaut).
+
+    python scripts/workqueue.py enqueue [--city poitiers]
+    python scripts/workqueue.py worker [--lease 900] [--exit-when-empty]
+    python scripts/workqueue.py status [--batch LOT]
+    python scripts/workqueue.py merge [--batch LOT]
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import stream
+
+QUEUE_PATH = os.environ.get("WORK_QUEUE_DB", "work_queue.sqlite")
+CITIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cities.json")
+PARTIALS_DIR = "partials"
+
+LEASE_SECONDS = 900
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch TEXT NOT NULL,
+    city TEXT NOT NULL,
+    source TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    updated_at TEXT NOT NULL,
+    UNIQUE (batch, city, source)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, lease_expires);
+"""
+
+
+def connect(path: str = QUEUE_PATH) -> sqlite3.Connection:
+    # isolation_level=None : transactions explicites (BEGIN IMMEDIATE pour réclamer un job)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def load_cities(path: str = CITIES_PATH) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _batch_started(batch):
+    """Date ISO de création d'un lot (son identifiant par défaut), sinon maintenant."""
+    try:
+        return datetime.strptime(batch, "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc).isoformat()
+    except ValueError:
+        return _now()
+
+
+def latest_batch(conn):
+    row = conn.execute("SELECT batch FROM jobs ORDER BY id DESC LIMIT 1").fetchone()
+    return row["batch"] if row else None
+
+
+# =========================================================
+# 📥 COORDINATEUR
+# =========================================================
+def enqueue(conn, cities, only=None, batch=None) -> str:
+    """Crée un lot de jobs (un par ville et par source) ; retourne son identifiant."""
+    batch = batch or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    with conn:
+        conn.execute("BEGIN")
+        for city, config in cities.items():
+            if only and city not in only:
+                continue
+            for position, source in enumerate(config["sources"]):
+                conn.execute(
+                    "INSERT OR IGNORE INTO jobs (batch, city, source, position, params, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (batch, city, source["key"], position, json.dumps(source.get("params") or {}), _now()),
+                )
+    return batch
+
+
+# =========================================================
+# 🔒 BAUX
+# =========================================================
+def claim(conn, worker, lease=LEASE_SECONDS):
+    """
+    Réclame un job en attente (ou dont le bail a expiré) ; None si rien à faire.
+    BEGIN IMMEDIATE : un seul worker à la fois peut prendre un job donné.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE attempts < ? AND "
+            "(status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+            "ORDER BY id LIMIT 1",
+            (MAX_ATTEMPTS, now),
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'leased', attempts = attempts + 1, worker = ?, lease_expires = ?, "
+            "updated_at = ? WHERE id = ?",
+            (worker, now + lease, _now(), row["id"]),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+
+
+def renew(conn, job_id, worker, lease=LEASE_SECONDS) -> bool:
+    """Prolonge le bail ; False si le job a été repris par un autre worker."""
+    cur = conn.execute(
+        "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+        (time.time() + lease, job_id, worker),
+    )
+    return cur.rowcount == 1
+
+
+def complete(conn, job_id, worker, result) -> bool:
+    cur = conn.execute(
+        "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_expires = NULL, updated_at = ? "
+        "WHERE id = ? AND worker = ? AND status = 'leased'",
+        (result, _now(), job_id, worker),
+    )
+    return cur.rowcount == 1
+
+
+def fail(conn, job_id, worker, error):
+    """Remet le job en attente, ou le marque en échec après MAX_ATTEMPTS tentatives."""
+    conn.execute(
+        "UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+        "error = ?, lease_expires = NULL, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+        (MAX_ATTEMPTS, error, _now(), job_id, worker),
+    )
+
+
+def expire_stale(conn):
+    """Jobs dont le bail a expiré après la dernière tentative : échec définitif."""
+    conn.execute(
+        "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'bail expiré'), updated_at = ? "
+        "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+        (_now(), time.time(), MAX_ATTEMPTS),
+    )
+
+
+# =========================================================
+# 🛠️ WORKER
+# =========================================================
+def partial_path(batch, city, source):
+    return os.path.join(PARTIALS_DIR, batch, city, f"{source}.json")
+
+
+def _write_partial(path, events, stats):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"stats": stats, "events": events}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _heartbeat(path, job_id, worker, lease, stop):
+    conn = connect(path)
+    try:
+        while not stop.wait(lease / 3):
+            if not renew(conn, job_id, worker, lease):
+                break
+    finally:
+        conn.close()
+
+
+def run_job(job):
+    """Exécute le scraper du job ; retourne (événements, statistiques)."""
+    import aggregator  # importe tous les scrapers (Playwright compris)
+
+    source = next((s for s in aggregator.SOURCES if s["key"] == job["source"]), None)
+    if source is None:
+        raise ValueError(f"source inconnue : {job['source']}")
+    params = json.loads(job["params"])
+    events = []
+    stats = aggregator.run_source(dict(source, scrape=lambda: source["scrape"](**params)), events.append)
+    if stats["error"]:
+        raise RuntimeError(stats["error"])
+    return events, stats
+
+
+def work(path=QUEUE_PATH, worker=None, lease=LEASE_SECONDS, exit_when_empty=False):
+    """Boucle du worker : réclame, exécute, publie ; retourne le nombre de jobs terminés."""
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    conn = connect(path)
+    done = 0
+    while True:
+        expire_stale(conn)
+        job = claim(conn, worker, lease)
+        if job is None:
+            if exit_when_empty:
+                break
+            time.sleep(POLL_SECONDS)
+            continue
+
+        print(f"🛠️ [{worker}] {job['city']}/{job['source']} (lot {job['batch']}, tentative {job['attempts']})")
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat, args=(path, job["id"], worker, lease, stop), daemon=True)
+        beat.start()
+        try:
+            events, stats = run_job(job)
+            result = partial_path(job["batch"], job["city"], job["source"])
+            _write_partial(result, events, stats)
+            if complete(conn, job["id"], worker, result):
+                done += 1
+                print(f"✅ [{worker}] {job['city']}/{job['source']} : {len(events)} événements")
+            else:
+                print(f"⚠️ [{worker}] bail perdu pour {job['city']}/{job['source']}")
+        except Exception as e:
+            print(f"❌ [{worker}] {job['city']}/{job['source']} : {e}")
+            fail(conn, job["id"], worker, str(e))
+        finally:
+            stop.set()
+            beat.join()
+    conn.close()
+    return done
+
+
+# =========================================================
+# 🧩 FUSION
+# =========================================================
+def _merge_plain(city_jobs, output):
+    """Ville hors site : dédoublonnage, tri et écriture d'une sortie simple."""
+    deduper = stream.Deduper()
+    runs = stream.SortedRuns()
+    try:
+        for job in city_jobs:
+            if job["status"] != "done":
+                continue
+            with open(job["result"], encoding="utf-8") as f:
+                partial = json.load(f)
+            for ev in partial["events"]:
+                if deduper.is_new(ev):
+                    runs.add(ev)
+            runs.end_source()
+        return stream.write_events(runs, path=output)
+    finally:
+        runs.close()
+
+
+def _merge_publish(city_jobs, started_at):
+    """Ville du site : publication complète par aggregator.publish() (events.json, details/, deltas/...) et historique."""
+    import aggregator
+    import history
+
+    listed, stats = {}, {}
+    for job in city_jobs:
+        if job["status"] != "done":
+            stats[job["source"]] = {"count": 0, "duration": None, "error": job["error"]}
+            continue
+        with open(job["result"], encoding="utf-8") as f:
+            partial = json.load(f)
+        listed[job["source"]] = partial["events"]
+        stats[job["source"]] = partial["stats"]
+
+    recorder = None
+    try:
+        recorder = history.RunRecorder(stats, started_at)
+    except Exception as e:
+        print(f"⚠️ Historique non enregistré : {e}")
+    total = aggregator.publish(listed, sink=recorder.add if recorder else None)
+    if recorder is not None:
+        try:
+            run_id = recorder.finish(sum(s["count"] for s in stats.values()))
+            print(f"🗄️ Run {run_id} enregistré dans {history.DB_PATH}")
+        except Exception as e:
+            print(f"⚠️ Historique non enregistré : {e}")
+    return total
+
+
+def merge(conn, cities, batch):
+    """
+    Fusionne les sorties partielles de chaque ville du lot, dans l'ordre des
+    sources de la configuration ; retourne {ville: nombre d'événements}.
+    Une ville marquée "publish" passe par aggregator.publish() (sortie du
+    site) ; les autres sont écrites dans leur "output" (events-<ville>.json
+    par défaut). Une ville dont des jobs ne sont pas terminés n'est pas fusionnée.
+    """
+    jobs = conn.execute("SELECT * FROM jobs WHERE batch = ? ORDER BY city, position", (batch,)).fetchall()
+    written = {}
+    for city in dict.fromkeys(job["city"] for job in jobs):
+        city_jobs = [job for job in jobs if job["city"] == city]
+        pending = [job["source"] for job in city_jobs if job["status"] not in ("done", "failed")]
+        if pending:
+            print(f"⏳ {city} : en attente de {', '.join(pending)}")
+            continue
+        for job in city_jobs:
+            if job["status"] != "done":
+                print(f"⚠️ {city}/{job['source']} en échec : {job['error']}")
+
+        config = cities.get(city, {})
+        if config.get("publish"):
+            written[city] = _merge_publish(city_jobs, _batch_started(batch))
+            print(f"💾 {city} : {written[city]} événements publiés")
+        else:
+            output = config.get("output") or f"events-{city}.json"
+            written[city] = _merge_plain(city_jobs, output)
+            print(f"💾 {city} : {written[city]} événements dans {output}")
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="File de travaux de scraping multi-villes")
+    parser.add_argument("--db", default=QUEUE_PATH)
+    parser.add_argument("--cities", default=CITIES_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("enqueue", help="crée un lot de jobs")
+    p.add_argument("--city", action="append", help="ville à inclure (répétable, défaut : toutes)")
+
+    p = sub.add_parser("worker", help="exécute des jobs")
+    p.add_argument("--lease", type=int, default=LEASE_SECONDS, help="durée du bail en secondes")
+    p.add_argument("--exit-when-empty", action="store_true")
+    p.add_argument("--workers", type=int, default=None, help="processus de parsing HTML de ce worker")
+
+    p = sub.add_parser("status", help="état d'un lot")
+    p.add_argument("--batch")
+
+    p = sub.add_parser("merge", help="fusionne les sorties partielles d'un lot")
+    p.add_argument("--batch")
+
+    args = parser.parse_args(argv)
+    conn = connect(args.db)
+
+    if args.command == "enqueue":
+        batch = enqueue(conn, load_cities(args.cities), args.city)
+        print(f"📥 Lot {batch} créé")
+
+    elif args.command == "worker":
+        from scrapers import pipeline
+
+        pipeline.configure(args.workers)
+        try:
+            done = work(args.db, lease=args.lease, exit_when_empty=args.exit_when_empty)
+        finally:
+            pipeline.shutdown()
+        print(f"👍 {done} jobs terminés")
+
+    elif args.command == "status":
+        batch = args.batch or latest_batch(conn)
+        for row in conn.execute(
+            "SELECT city, source, status, attempts, worker, error FROM jobs WHERE batch = ? ORDER BY city, position",
+            (batch,),
+        ):
+            error = f" ❌ {row['error']}" if row["error"] else ""
+            print(f"{row['city']:<12} {row['source']:<16} {row['status']:<8} {row['attempts']}  {row['worker'] or ''}{error}")
+
+    elif args.command == "merge":
+        merge(conn, load_cities(args.cities), args.batch or latest_batch(conn))
+
+
+if __name__ == "__main__":
+    main()